@@ -0,0 +1,155 @@
+import asyncio, os, threading, time
+from typing import Any, Dict, Optional
+
+HIGH, NORMAL = 0, 1
+# Model budgets and their defaults. They hold for one process; serve.py splits them among its workers.
+LLM_BUDGETS = {'LLM_RPM': '500', 'LLM_TPM': '200000', 'LLM_MAX_CONCURRENCY': '16', 'LLM_MAX_QUEUE': '64'}
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to `capacity`; reservations may run the balance negative,
+    and the debt is how long the reserving request has to wait."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def reserve(self, amount: float, now: float):
+        if not self.unlimited:
+            self._refill(now)
+            self.tokens -= min(amount, self.capacity)
+
+
+class Ticket:
+    def __init__(self, controller: 'AdmissionController', admitted: bool, wait: float = 0.0, reason: Optional[str] = None):
+        self.controller, self.admitted, self.delay, self.reason = controller, admitted, wait, reason
+        self.started: Optional[float] = None
+        self.queued = admitted and wait > 0
+        self.finished = False
+
+    def _leave_queue(self):
+        if self.queued:
+            self.queued = False
+            self.controller._dequeue()
+
+    def wait(self):
+        if self.delay > 0:
+            try:
+                time.sleep(self.delay)
+            finally:
+                self._leave_queue()
+        self.started = time.monotonic()
+
+    async def wait_async(self):
+        if self.delay > 0:
+            try:
+                await asyncio.sleep(self.delay)
+            finally:
+                self._leave_queue()
+        self.started = time.monotonic()
+
+    def done(self, ok: bool = True):
+        """Ends the ticket, also one that never waited (its client went away first); later calls do nothing."""
+        if self.finished:
+            return
+        self.finished = True
+        self._leave_queue()
+        if ok and self.started is not None:
+            self.controller.record_latency(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    """Decides, before the model is called, whether a request can be answered in time.
+
+    Requests reserve one unit of the requests-per-minute bucket and their estimated token cost
+    of the tokens-per-minute bucket, then wait out any debt. A request is shed to the rule-based
+    fallback straight away when the wait queue is full (normal priority may only use half of it)
+    or when its wait plus the typical model latency would overrun its deadline.
+    """
+
+    def __init__(self, rpm: float = 500, tpm: float = 200000, max_queue: int = 64, deadline: float = 20.0,
+                 expected_latency: float = 3.0, completion_tokens: int = 250):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_queue, self.deadline = max_queue, deadline
+        self.completion_tokens = completion_tokens
+        self.latency = expected_latency  # EWMA of observed model latency, seconds
+        self.queue_depth = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {'queue_full': 0, 'deadline': 0}
+        self._lock = threading.Lock()
+
+    def admit(self, prompt_tokens: int, priority: int = NORMAL, deadline: Optional[float] = None) -> Ticket:
+        deadline = self.deadline if deadline is None else deadline
+        cost = prompt_tokens + self.completion_tokens
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.wait_for(1, now), self.tokens.wait_for(cost, now))
+            limit = self.max_queue if priority == HIGH else self.max_queue // 2
+            reason = None
+            if wait > 0 and self.queue_depth >= limit:
+                reason = 'queue_full'
+            elif wait + self.latency > deadline:
+                reason = 'deadline'
+            if reason:
+                self.shed[reason] += 1
+                return Ticket(self, False, reason=reason)
+            self.requests.reserve(1, now)
+            self.tokens.reserve(cost, now)
+            self.admitted += 1
+            if wait > 0:
+                self.queue_depth += 1
+        return Ticket(self, True, wait)
+
+    def _dequeue(self):
+        with self._lock:
+            self.queue_depth -= 1
+
+    def record_latency(self, seconds: float, alpha: float = 0.2):
+        with self._lock:
+            self.latency += alpha * (seconds - self.latency)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'queue_depth': self.queue_depth, 'max_queue': self.max_queue, 'admitted': self.admitted,
+                'shed': dict(self.shed), 'expected_latency_seconds': round(self.latency, 3),
+                'deadline_seconds': self.deadline, 'rpm': round(self.requests.rate * 60), 'tpm': round(self.tokens.rate * 60)}
+
+
+def worker_budgets(workers: int, environ=os.environ) -> Dict[str, str]:
+    """Each worker's share of the LLM_BUDGETS in `environ`, so `workers` processes together stay within them.
+
+    Rates of 0 (unlimited) stay 0; a worker always keeps at least one concurrent call and queue slot.
+    """
+    shares = {}
+    for name, default in LLM_BUDGETS.items():
+        total = float(environ.get(name, default))
+        if name in ('LLM_RPM', 'LLM_TPM'):
+            shares[name] = repr(total / workers if total > 0 else total)
+        else:
+            shares[name] = str(max(1, int(total) // workers) if total > 0 else int(total))
+    return shares
+
+
+def create_admission_controller() -> AdmissionController:
+    return AdmissionController(rpm=float(os.getenv("LLM_RPM", LLM_BUDGETS['LLM_RPM'])),
+                               tpm=float(os.getenv("LLM_TPM", LLM_BUDGETS['LLM_TPM'])),
+                               max_queue=int(os.getenv("LLM_MAX_QUEUE", LLM_BUDGETS['LLM_MAX_QUEUE'])),
+                               deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "20")),
+                               expected_latency=float(os.getenv("LLM_EXPECTED_LATENCY", "3")),
+                               completion_tokens=int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "250")))
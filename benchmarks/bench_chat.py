@@ -0,0 +1,152 @@
+"""Offline load test for /chat: throughput, latency percentiles per code path and memory growth.
+
+    python -m benchmarks.bench_chat --requests 5000 --concurrency 16 --menu-items 2000 --llm-latency-ms 400
+
+Runs entirely in-process: the menu comes from graphql_stub and the model is benchmarks.fake_llm,
+so no OpenAI key or Node server is needed. Paths are the ones chatbot_service.chat_path reports:
+early (rule-based), menu (answered from the menu data), llm, cached, shed, fallback and error.
+With --locations N the requests are spread over N restaurant locations, each with its own menu.
+"""
+import argparse, contextlib, io, json, os, statistics, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.fake_llm import FakeChatModel
+from graphql_stub import StubGraphQLServer, synthetic_menu
+
+CART = [{'name': 'Margherita Pizza', 'quantity': 2, 'price': 18.99}, {'name': 'Coca Cola', 'quantity': 1, 'price': 2.99}]
+
+# (kind, message, cart)
+CORPUS = [
+    ('greeting', "hi there", []), ('greeting', "Hello, I'm Sam", []), ('greeting', "good morning! I'm so happy today", []),
+    ('add', "add 2 margherita pizza", []), ('add', "can I get two greek salad and a coke", []),
+    ('add', "I'd like a tiramisu", CART), ('add', "i want 3 garlic bread", CART), ('add', "order 2 lasagna", []),
+    ('remove', "remove all pizzas", CART), ('remove', "remove 1 coca cola", CART), ('remove', "decrease pizza by 1", CART),
+    ('cart', "show my cart", CART), ('cart', "view cart please", CART),
+    ('checkout', "place order", CART), ('checkout', "checkout now", CART),
+    ('menu', "what desserts do you have?", []), ('menu', "what's vegetarian on the menu", []),
+    ('menu', "how much is the lasagna", []), ('menu', "what's in the carbonara", CART), ('menu', "is the greek salad vegetarian", []),
+    ('llm', "do you have anything spicy", CART), ('llm', "recommend something light for lunch", []),
+    ('llm', "I had a terrible day, what's comforting", []), ('llm', "how much is the total with tax", CART),
+    ('llm', "which pasta would go well with a salad", []), ('llm', "is the salmon grilled or fried", []),
+]
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        try:
+            import resource  # not on Windows
+        except ImportError:
+            return 0.0
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def replay(app, classify, total: int, concurrency: int, sessions: int, sample_every: int, locations: int = 0) -> Tuple[Dict[str, List[float]], List[Tuple[int, float]], float]:
+    local = threading.local()
+    latencies: Dict[str, List[float]] = {}
+    memory = [(0, rss_mb())]
+
+    def one(i: int) -> Tuple[str, float]:
+        client = getattr(local, 'client', None) or app.test_client()
+        local.client = client
+        _, message, cart = CORPUS[i % len(CORPUS)]
+        start = time.perf_counter()
+        body = {'message': message, 'session_id': f"bench-{i % sessions}", 'cart_items': cart}
+        if locations:
+            body['location_id'] = f"loc-{i % sessions % locations}"  # a session stays at one location
+        response = client.post('/chat', json=body)
+        elapsed = (time.perf_counter() - start) * 1000
+        return classify(response.get_json() or {}, response.status_code), elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for done, future in enumerate(as_completed([pool.submit(one, i) for i in range(total)]), 1):
+            path, elapsed = future.result()
+            latencies.setdefault(path, []).append(elapsed)
+            if done % sample_every == 0:
+                memory.append((done, rss_mb()))
+    return latencies, memory, time.perf_counter() - started
+
+
+def report(latencies: Dict[str, List[float]], memory: List[Tuple[int, float]], elapsed: float, extra: Dict[str, Any]) -> Dict[str, Any]:
+    total = sum(len(v) for v in latencies.values())
+    paths = {path: {'requests': len(values), 'p50_ms': round(percentile(values, 50), 2), 'p95_ms': round(percentile(values, 95), 2),
+                    'p99_ms': round(percentile(values, 99), 2), 'mean_ms': round(statistics.fmean(values), 2)}
+             for path, values in sorted(latencies.items())}
+    growth = memory[-1][1] - memory[0][1]
+    answered = sum(len(latencies.get(path, ())) for path in ('early', 'menu', 'cached', 'llm'))
+    offloaded = answered - len(latencies.get('llm', ()))
+    return {'requests': total, 'llm_offload': round(offloaded / answered, 4) if answered else None, 'seconds': round(elapsed, 2), 'throughput_rps': round(total / elapsed, 1), 'paths': paths,
+            'memory': {'start_mb': round(memory[0][1], 1), 'end_mb': round(memory[-1][1], 1), 'growth_mb': round(growth, 2),
+                       'growth_mb_per_1k_requests': round(growth / total * 1000, 3) if total else 0.0,
+                       'samples': [(n, round(mb, 1)) for n, mb in memory]}, **extra}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--menu-items', type=int, default=2000)
+    parser.add_argument('--llm-latency-ms', type=float, default=400)
+    parser.add_argument('--llm-jitter-ms', type=float, default=100)
+    parser.add_argument('--rpm', type=float, default=0, help="admission requests-per-minute budget (0 = unlimited)")
+    parser.add_argument('--tpm', type=float, default=0, help="admission tokens-per-minute budget (0 = unlimited)")
+    parser.add_argument('--locations', type=int, default=0, help="spread requests over this many locations (0 = the default menu)")
+    parser.add_argument('--location-budget-mb', type=float, default=256, help="memory budget for location menus")
+    parser.add_argument('--no-response-cache', action='store_true')
+    parser.add_argument('--sample-every', type=int, default=250, help="requests between memory samples")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON, for comparing runs")
+    args = parser.parse_args()
+
+    with StubGraphQLServer(synthetic_menu(args.menu_items)) as stub:
+        os.environ.setdefault('MENU_SNAPSHOT_PATH', '')  # always start from the stub, never a saved menu
+        os.environ.setdefault('LOCATION_SNAPSHOT_DIR', '')
+        os.environ.setdefault('LOCATION_GRAPHQL_URL', stub.url + '?location={location}')  # the stub serves a menu per location
+        os.environ.setdefault('ORDER_DIR', tempfile.mkdtemp(prefix='bench-orders-'))
+        os.environ.setdefault('ORDER_FSYNC', '0')
+        os.environ['LOCATION_MEMORY_BUDGET_MB'] = str(args.location_budget_mb)
+        os.environ.update({'GRAPHQL_URL': stub.url, 'LLM_RPM': str(args.rpm), 'LLM_TPM': str(args.tpm), 'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+                           'RESPONSE_CACHE_SIZE': '0' if args.no_response_cache else os.getenv('RESPONSE_CACHE_SIZE', '2048')})
+        with contextlib.redirect_stdout(io.StringIO()):
+            import chatbot_service as cs
+            cs.warm_up()
+        llm = cs.llm = FakeChatModel(latency=args.llm_latency_ms / 1000, jitter=args.llm_jitter_ms / 1000)
+
+        print(f"{args.requests} requests, concurrency {args.concurrency}, {args.sessions} sessions, "
+              f"{args.menu_items}-item menu, fake LLM {args.llm_latency_ms:.0f}±{args.llm_jitter_ms:.0f} ms")
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, memory, elapsed = replay(cs.app, cs.chat_path, args.requests, args.concurrency, args.sessions, args.sample_every, args.locations)
+        results = report(latencies, memory, elapsed, {'llm_calls': llm.calls, 'sessions_stored': len(cs.SESSIONS),
+                                                      'response_cache': cs.RESPONSE_CACHE.stats(), 'locations': cs.LOCATIONS.stats()})
+
+    print(f"throughput {results['throughput_rps']:,.1f} req/s over {results['seconds']}s ({results['llm_calls']} model calls)")
+    print(f"{'path':<8}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for path, row in results['paths'].items():
+        print(f"{path:<8}{row['requests']:>10}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['mean_ms']:>10.2f}")
+    if results['llm_offload'] is not None:
+        print(f"offload  {results['llm_offload']:.1%} of answered turns needed no model call")
+    if args.locations:
+        loc = results['locations']
+        print(f"locations {loc['locations']} held ({loc['bytes_used'] / 2 ** 20:.1f} of {loc['memory_budget'] / 2 ** 20:.0f} MB), "
+              f"{loc['misses']} loads, {loc['evictions']} evictions")
+    mem = results['memory']
+    print(f"memory   {mem['start_mb']} MB -> {mem['end_mb']} MB (+{mem['growth_mb']} MB, "
+          f"{mem['growth_mb_per_1k_requests']} MB per 1k requests, {results['sessions_stored']} sessions stored)")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
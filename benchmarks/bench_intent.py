@@ -0,0 +1,125 @@
+"""Messages per second through the rule-based extractors, before and after the intent engine.
+
+    python -m benchmarks.bench_intent --rounds 200
+"""
+import argparse, contextlib, io, os, re, time
+
+from graphql_stub import StubGraphQLServer, synthetic_menu
+
+MESSAGES = [
+    "hi there", "Hello, I'm Sam", "good morning! I'm so happy today", "show my cart", "view cart please",
+    "clear chat", "remove all pizzas", "remove all of the chicken wings from cart", "remove 2 tiramisu",
+    "delete the 1 coca cola from cart", "place order", "checkout now", "add 2 margherita pizza",
+    "i want 3 garlic bread", "order 2 lasagna", "can I get two greek salad and a coke", "I'd like a tiramisu",
+    "decrease pizza by 1", "increase 2 more garlic bread", "what desserts do you have?",
+    "what's vegetarian on the menu", "do you have anything spicy", "recommend something light",
+    "I had a terrible day, what's comforting", "how much is the lasagna", "thanks!",
+]
+
+
+# The rule-based extractors as they were before intent_engine, kept here as the baseline.
+def legacy_detect(cs, user_message):
+    lower_message = re.sub(r'[.,!?]', '', user_message.lower()).strip()
+    print(f"🔍 Analyzing message: '{user_message}'")
+    if any(greet in lower_message for greet in ['hi', 'hello', 'hey', 'hiya', 'good morning']):
+        name_match = re.search(r'^(?:hi|hello|hey)[,!\s]*(?:i\'m\s+|i am\s+)?([A-Za-z][A-Za-z\-]{0,30})', user_message, re.IGNORECASE)
+        name = name_match.group(1).strip().capitalize() if name_match else None
+        emotional_state = cs.detect_emotional_state(user_message)
+        return {"action": "greeting", "greeting_name": name, "response_text": cs.generate_empathetic_response(emotional_state, name, 'greeting')}
+    if any(phrase in lower_message for phrase in ['clear chat', 'clear conversation', 'reset chat']):
+        return {"action": "clear_chat"}
+    if any(phrase in lower_message for phrase in ['show my cart', 'show cart', 'view cart', 'my cart']):
+        return {"action": "show_cart"}
+    for pattern in [r'\b(?:remove|delete|cancel)\s+all\s+(?:of\s+)?(?:the\s+)?([a-zA-Z0-9\s]+)(?:\s+from\s+cart)?']:
+        match = re.search(pattern, lower_message, re.IGNORECASE)
+        if match:
+            item_details = cs.find_menu_item_fuzzy_with_details(re.sub(r'\b(?:please|plz|now|thanks)\b', '', match.group(1), flags=re.IGNORECASE).strip())
+            if item_details:
+                return {"action": "remove_all", "target_item": item_details['name']}
+    for pattern in [r'\b(?:remove|delete)\s+(?:the\s+)?(\d+)\s+quantity\s+of\s+([a-zA-Z\s]+)',
+                    r'\b(?:remove|delete)\s+the\s+(\d+)\s+(.+?)(?:\s+from\s+cart)?(?:\s|$)',
+                    r'\b(?:remove|delete|cancel)\s+(\d+)\s+(?!quantity\s+of)(.+?)(?:\s*$)']:
+        match = re.search(pattern, lower_message, re.IGNORECASE)
+        if match:
+            item_details = cs.find_menu_item_fuzzy_with_details(match.group(2).strip())
+            if item_details:
+                return {"action": "update", "target_item": item_details['name'], "quantity": int(match.group(1))}
+    if any(phrase in lower_message for phrase in ['place order', 'checkout', 'order now']):
+        return {"action": "place_order"}
+    for pattern in [r'\b(?:add)\s+(?!more\b)(\d+)\s+([a-zA-Z\s]+)', r'\border\s+(\d+)\s+([a-zA-Z\s]+)']:
+        match = re.search(pattern, lower_message, re.IGNORECASE)
+        if match:
+            item_details = cs.find_menu_item_fuzzy_with_details(match.group(2).strip())
+            if item_details:
+                return {"action": "add", "items": [{"name": item_details['name'], "quantity": int(match.group(1))}]}
+    return {"action": "none"}
+
+
+def legacy_extract_items(text):
+    for word, digit in {'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'a': '1', 'an': '1'}.items():
+        text = re.sub(r'\b' + word + r'\b', digit, text, flags=re.I)
+    if any(indicator in text.lower() for indicator in ['remove', 'delete', 'cancel', 'decrease']):
+        return []
+    return [{'name': m.group(2).strip(), 'quantity': int(m.group(1))}
+            for m in re.finditer(r'(\d+)\s+(?:more\s+)?([A-Za-z0-9&\'\-\s]+?)(?=(?:\s+(?:and|,|&)\s+\d|\s*$|[.,!?]))', text, re.I)]
+
+
+def legacy_extract_remove(text):
+    text_lower = text.lower()
+    for word, number in {'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'a': '1', 'an': '1'}.items():
+        text_lower = re.sub(r'\b' + word + r'\b', number, text_lower)
+    if not any(indicator in text_lower for indicator in ['remove', 'delete', 'cancel', 'decrease', 'reduce', 'increase', 'add more']):
+        return []
+    items = []
+    for pattern in [r'(?:remove|delete|decrease|increase)\s+(\d+)\s+(?:more\s+)?(.+?)(?:\s+by\s+\d+)?(?:\s+and|$)',
+                    r'(?:remove|delete|decrease|increase)\s+(?:more\s+)?(.+?)\s+by\s+(\d+)']:
+        for match in re.finditer(pattern, text_lower, re.IGNORECASE):
+            items.append(match.groups())
+            break
+    return items
+
+
+def run(fn, rounds):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for message in MESSAGES:
+                fn(message)
+        elapsed = time.perf_counter() - start
+    return rounds * len(MESSAGES) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--menu-items', type=int, default=2000)
+    args = parser.parse_args()
+
+    with StubGraphQLServer(synthetic_menu(args.menu_items)) as stub:
+        os.environ['GRAPHQL_URL'] = stub.url
+        os.environ.setdefault('MENU_SNAPSHOT_PATH', '')
+        with contextlib.redirect_stdout(io.StringIO()):
+            import chatbot_service as cs
+            cs.warm_up()
+        from intent_engine import parse_message
+
+        def before(message):
+            legacy_detect(cs, message)
+            legacy_extract_items(message)
+            legacy_extract_remove(message)
+
+        def after(message):
+            parse_message.cache_clear()  # measure a cold parse of every message
+            cs.detect_intent_and_create_action(message, "")
+            cs.extract_items_from_text(message)
+            cs.extract_remove_items_from_text(message)
+
+        print(f"{len(MESSAGES)} messages x {args.rounds} rounds, {args.menu_items}-item menu")
+        old, new = run(before, args.rounds), run(after, args.rounds)
+        for label, rate in (('before', old), ('after', new)):
+            print(f"{label:<8} {rate:>10,.0f} msg/s  ({1000 / rate:.3f} ms/msg)")
+        print(f"speedup  {new / old:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Order placement throughput and commit latency through the order log, with and without fsync.
+
+    python -m benchmarks.bench_orders --orders 20000 --concurrency 64 --sink sqlite
+
+Each thread places orders through orders.OrderBook the way a checkout does: a new id, an
+idempotency key claim, a log append, and a wait until the record is durable. The report covers orders per second, p50/p99
+commit latency and the mean group-commit batch. It then checks that every id was unique and
+that the drain delivered every order to the sink. Nothing runs outside this process.
+"""
+import argparse, json, statistics, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from orders import OrderBook, create_order_sink
+
+ITEMS = [{'id': '1', 'name': 'Margherita Pizza', 'price': 18.99, 'quantity': 2}, {'id': '16', 'name': 'Coca Cola', 'price': 2.99, 'quantity': 1}]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(total: int, concurrency: int, fsync: bool, linger_ms: float, sink: str) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        sink_spec = {'file': f"file:{directory}/sink.jsonl", 'sqlite': f"sqlite:{directory}/sink.db"}.get(sink, '')
+        book = OrderBook(f"{directory}/orders", fsync=fsync, linger=linger_ms / 1000,
+                         sink=create_order_sink(sink_spec), drain_interval=0.05)
+        latencies: List[float] = []
+        ids: List[str] = []
+        lock = threading.Lock()
+
+        def place(i: int):
+            started = time.perf_counter()
+            order, _ = book.place(f"bench-{i % 1000}", f"key-{i}", {'items': ITEMS, 'subtotal': 40.97, 'tax': 3.28, 'total': 44.25})
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                ids.append(order['order_id'])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(place, range(total)))
+        elapsed = time.perf_counter() - started
+
+        drained = None
+        if book.drain:
+            deadline = time.time() + 30
+            while book.drain.shipped < total and time.time() < deadline:
+                time.sleep(0.05)
+            drained = book.drain.shipped
+        log = book.log.stats()
+        book.close()
+    return {'fsync': fsync, 'orders': total, 'concurrency': concurrency, 'seconds': round(elapsed, 3),
+            'orders_per_second': round(total / elapsed, 1), 'p50_ms': round(percentile(latencies, 50), 3),
+            'p99_ms': round(percentile(latencies, 99), 3), 'mean_ms': round(statistics.fmean(latencies), 3),
+            'mean_batch': log['mean_batch'], 'batches': log['batches'], 'mean_fsync_ms': log['mean_fsync_ms'],
+            'unique_ids': len(set(ids)) == total, 'drained': drained}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--linger-ms', type=float, default=0.0, help="hold each commit batch open this long to gather more")
+    parser.add_argument('--sink', choices=['none', 'file', 'sqlite'], default='sqlite')
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON, for comparing runs")
+    args = parser.parse_args()
+
+    results = [run(args.orders, args.concurrency, fsync, args.linger_ms, args.sink) for fsync in (True, False)]
+    print(f"{args.orders} orders, concurrency {args.concurrency}, sink {args.sink}")
+    print(f"{'fsync':<7}{'orders/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'batch':>8}{'fsync ms':>10}{'unique':>8}{'drained':>9}")
+    for row in results:
+        print(f"{'on' if row['fsync'] else 'off':<7}{row['orders_per_second']:>11,.1f}{row['p50_ms']:>9.3f}{row['p99_ms']:>9.3f}"
+              f"{row['mean_batch']:>8}{row['mean_fsync_ms']:>10}{str(row['unique_ids']):>8}{str(row['drained']):>9}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Cold-start timings for the chatbot service: import, liveness and readiness, each in a fresh interpreter.
+
+    python -m benchmarks.bench_startup --runs 5 --menu-items 2000 --menu-latency-ms 200
+
+Every run starts a new Python process that serves its own graphql_stub, imports chatbot_service,
+then polls /livez and /readyz through the Flask test client until each answers 200. It also
+counts how many GraphQL requests the import itself made, which should be zero. With
+--saved-menu each run starts from a menu snapshot saved on disk, as after a restart.
+"""
+import argparse, json, os, statistics, subprocess, sys, tempfile, time
+from typing import Any, Dict, List
+
+
+def child(menu_items: int, menu_latency: float, poll: float, timeout: float) -> Dict[str, Any]:
+    started = time.perf_counter()
+    from graphql_stub import StubGraphQLServer, synthetic_menu
+    stub = StubGraphQLServer(synthetic_menu(menu_items), latency=menu_latency).start()
+    os.environ.update({'GRAPHQL_URL': stub.url, 'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING')})
+    before_import = time.perf_counter()
+    import chatbot_service as cs
+    imported = time.perf_counter()
+    requests_at_import = stub.requests
+
+    client = cs.app.test_client()
+    timings = {'import_s': imported - before_import, 'live_s': None, 'ready_s': None}
+    while time.perf_counter() - started < timeout:
+        if timings['live_s'] is None and client.get('/livez').status_code == 200:
+            timings['live_s'] = time.perf_counter() - started
+        if client.get('/readyz').status_code == 200:
+            timings['ready_s'] = time.perf_counter() - started
+            break
+        time.sleep(poll)
+    stub.stop()
+    return {**{k: round(v, 4) if v is not None else None for k, v in timings.items()},
+            'graphql_requests_at_import': requests_at_import, 'warmup_steps': dict(cs.WARMUP_STEPS),
+            'langchain_loaded': 'langchain_openai' in sys.modules, 'llm': type(cs.llm).__name__ if cs.llm else None}
+
+
+def run_once(args, snapshot_path: str) -> Dict[str, Any]:
+    env = dict(os.environ, MENU_SNAPSHOT_PATH=snapshot_path)
+    if args.no_llm:
+        env['OPENAI_API_KEY'] = 'fallback_mode'
+        env.pop('GITHUB_TOKEN', None)
+    else:
+        # Any key makes warm-up build the real client (and import langchain); no request is ever sent
+        env.setdefault('OPENAI_API_KEY', 'sk-startup-benchmark')
+    command = [sys.executable, '-m', 'benchmarks.bench_startup', '--child', '--menu-items', str(args.menu_items),
+               '--menu-latency-ms', str(args.menu_latency_ms), '--timeout', str(args.timeout)]
+    out = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def summarize(runs: List[Dict[str, Any]], key: str) -> str:
+    values = [r[key] for r in runs if r[key] is not None]
+    if not values:
+        return f"{key:<10}{'timed out':>12}"
+    return f"{key:<10}{statistics.median(values) * 1000:>10.1f} ms  (min {min(values) * 1000:.1f}, max {max(values) * 1000:.1f})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--menu-items', type=int, default=2000)
+    parser.add_argument('--menu-latency-ms', type=float, default=0)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--no-llm', action='store_true', help="start in rule-based mode instead of building the model client")
+    parser.add_argument('--saved-menu', action='store_true', help="start from a menu snapshot saved by a previous run")
+    parser.add_argument('--json', metavar='PATH', help="also write the per-run results as JSON")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.menu_items, args.menu_latency_ms / 1000, 0.005, args.timeout)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, 'menu.snap') if args.saved_menu else ''
+        os.environ.setdefault('ORDER_DIR', os.path.join(tmp, 'orders'))  # warm-up opens the order log
+        if args.saved_menu:
+            run_once(args, snapshot_path)  # leaves the snapshot behind for the measured runs
+        runs = [run_once(args, snapshot_path) for _ in range(args.runs)]
+    print(f"{args.runs} cold starts, {args.menu_items}-item menu, GraphQL latency {args.menu_latency_ms:.0f} ms, "
+          f"{'rule-based' if args.no_llm else 'with model client'}, {'saved menu' if args.saved_menu else 'no saved menu'}")
+    for key in ('import_s', 'live_s', 'ready_s'):
+        print(summarize(runs, key))
+    steps = [r['warmup_steps'] for r in runs if r['warmup_steps']]
+    if steps:
+        print("warm-up   " + ', '.join(f"{step} {statistics.median(s.get(step, 0) for s in steps) * 1000:.1f} ms"
+                                       for step in ('menu', 'llm', 'total')))
+    print(f"GraphQL requests during import: {max(r['graphql_requests_at_import'] for r in runs)}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(runs, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
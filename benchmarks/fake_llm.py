@@ -0,0 +1,81 @@
+"""A deterministic stand-in for the chat model, with configurable latency."""
+import asyncio, hashlib, json, random, time
+from typing import Any, Iterator, List, Optional
+
+REPLIES = [
+    "Our desserts are a real treat tonight - the Tiramisu and Chocolate Cake are customer favourites.",
+    "If you'd like something light, the Greek Salad is crisp and fresh, and pairs well with a juice.",
+    "Happy to help! Most guests start with Garlic Bread and then pick a pizza to share.",
+    "The Lasagna is our most comforting dish - warm, cheesy and generous.",
+    "We have several vegetarian options, including the Margherita Pizza and Veggie Burger.",
+]
+
+
+class FakeReply:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """Implements the invoke/ainvoke/stream/astream calls the service makes.
+
+    The reply is chosen from the last human message, so a replayed corpus produces the same
+    completions on every run. `latency` is time to first token; `token_delay` paces streaming.
+    """
+
+    def __init__(self, latency: float = 0.4, jitter: float = 0.1, token_delay: float = 0.005,
+                 action_ratio: float = 0.3, seed: int = 7):
+        self.latency, self.jitter, self.token_delay = latency, jitter, token_delay
+        self.action_ratio = action_ratio
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def reply_for(self, messages: List[Any]) -> str:
+        last = next((m for m in reversed(messages) if _role(m) == 'human'), None)
+        digest = int(hashlib.sha1(_content(last).encode('utf-8')).hexdigest(), 16)
+        text = REPLIES[digest % len(REPLIES)]
+        if (digest >> 8) % 100 < self.action_ratio * 100:
+            text += "\n```json\n" + json.dumps({"action": "none", "message_type": "text", "response_delay": 800}) + "\n```"
+        return text
+
+    def invoke(self, messages: List[Any]) -> FakeReply:
+        self.calls += 1
+        time.sleep(self._delay())
+        return FakeReply(self.reply_for(messages))
+
+    async def ainvoke(self, messages: List[Any]) -> FakeReply:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        return FakeReply(self.reply_for(messages))
+
+    def stream(self, messages: List[Any]) -> Iterator[FakeReply]:
+        self.calls += 1
+        time.sleep(self._delay())
+        for piece in _pieces(self.reply_for(messages)):
+            time.sleep(self.token_delay)
+            yield FakeReply(piece)
+
+    async def astream(self, messages: List[Any]):
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        for piece in _pieces(self.reply_for(messages)):
+            await asyncio.sleep(self.token_delay)
+            yield FakeReply(piece)
+
+
+def _role(message: Any) -> Optional[str]:
+    return message[0] if isinstance(message, (list, tuple)) else getattr(message, 'type', None)
+
+
+def _content(message: Any) -> str:
+    if message is None:
+        return ''
+    return message[1] if isinstance(message, (list, tuple)) else str(getattr(message, 'content', ''))
+
+
+def _pieces(text: str, size: int = 4) -> Iterator[str]:
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
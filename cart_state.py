@@ -0,0 +1,195 @@
+"""Carts kept on the server per session, so clients send deltas or a version instead of the whole cart."""
+import json, os, threading, zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from response_cache import cart_fingerprint
+from session_store import History, SessionStore
+
+CART_TAX_RATE = float(os.getenv("CART_TAX_RATE", "0.08"))  # matches the receipt the frontend renders
+
+
+@dataclass
+class Cart:
+    items: List[Dict[str, Any]] = field(default_factory=list)  # {'id', 'name', 'price', 'quantity'}
+    version: int = 0
+    menu_version: Optional[str] = None  # menu the prices were last checked against
+
+    @property
+    def fingerprint(self) -> str:
+        return cart_fingerprint(self.items)
+
+    def totals(self) -> Dict[str, Any]:
+        subtotal = round(sum(item['price'] * item['quantity'] for item in self.items), 2)
+        tax = round(subtotal * CART_TAX_RATE, 2)
+        return {'item_count': sum(item['quantity'] for item in self.items), 'subtotal': subtotal, 'tax': tax,
+                'total': round(subtotal + tax, 2)}
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {'items': self.items, 'version': self.version, 'fingerprint': self.fingerprint, **self.totals()}
+
+    def _position(self, name: str) -> Optional[int]:
+        name = name.lower()
+        return next((i for i, item in enumerate(self.items) if item['name'].lower() == name), None)
+
+    def add(self, menu_item: Dict[str, Any], quantity: int = 1):
+        i = self._position(menu_item['name'])
+        if i is None:
+            self.items.append({'id': menu_item.get('id'), 'name': menu_item['name'],
+                               'price': float(menu_item.get('price', 0.0) or 0.0), 'quantity': quantity})
+        else:
+            self.items[i]['quantity'] += quantity
+
+    def remove(self, name: str, quantity: Optional[int] = None) -> bool:
+        """Removes `quantity` of the item, or all of it when quantity is None."""
+        i = self._position(name)
+        if i is None:
+            return False
+        if quantity is None or quantity >= self.items[i]['quantity']:
+            del self.items[i]
+        else:
+            self.items[i]['quantity'] -= quantity
+        return True
+
+    def set_quantity(self, menu_item: Dict[str, Any], quantity: int):
+        self.remove(menu_item['name'])
+        if quantity > 0:
+            self.add(menu_item, quantity)
+
+
+def _quantity(value: Any, default: Optional[int] = 1) -> Optional[int]:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+class CartEditor:
+    """Applies client deltas and chat actions to a cart, resolving names and prices against the menu index."""
+
+    def __init__(self, cart: Cart, index):
+        self.cart, self.index = cart, index
+        self.rejected: List[str] = []  # names that are not on the menu
+        self.changed = False
+
+    def _menu_item(self, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        item = self.index.find(name) if name else None
+        if item is None and name:
+            self.rejected.append(name)
+        return item
+
+    def replace(self, client_items: List[Dict[str, Any]]):
+        """Full sync from a client that sent its whole cart; client prices are not trusted."""
+        before = [(item['name'], item['quantity']) for item in self.cart.items]
+        self.cart.items = []
+        for entry in client_items or []:
+            if not isinstance(entry, dict):
+                continue
+            quantity = _quantity(entry.get('quantity'))
+            item = self._menu_item(entry.get('name'))
+            if item and quantity:
+                self.cart.add(item, quantity)
+        self.changed |= before != [(item['name'], item['quantity']) for item in self.cart.items]
+
+    def apply_delta(self, ops: List[Dict[str, Any]]):
+        """ops: [{'op': 'add'|'remove'|'set'|'clear', 'name': ..., 'quantity': ...}]"""
+        for op in ops or []:
+            if not isinstance(op, dict):
+                continue
+            kind = op.get('op', 'add')
+            if kind == 'clear':
+                self.changed |= bool(self.cart.items)
+                self.cart.items = []
+                continue
+            item = self._menu_item(op.get('name'))
+            if item is None:
+                continue
+            if kind == 'add':
+                quantity = _quantity(op.get('quantity'))
+                if quantity:
+                    self.cart.add(item, quantity)
+                    self.changed = True
+            elif kind == 'remove':
+                self.changed |= self.cart.remove(item['name'], _quantity(op.get('quantity'), None))
+            elif kind == 'set':
+                self.cart.set_quantity(item, _quantity(op.get('quantity'), 0))
+                self.changed = True
+
+    def apply_action(self, action_data: Optional[Dict[str, Any]]):
+        """Mirrors what the frontend does with the action it is sent, so both carts stay in step."""
+        action = (action_data or {}).get('action')
+        if action in ('add', 'add_multiple', 'add_multiple_partial', 'alternatives'):
+            self.apply_delta([{'op': 'add', 'name': item.get('name'), 'quantity': item.get('quantity', 1)}
+                              for item in action_data.get('items') or [] if isinstance(item, dict)])
+        elif action == 'remove':
+            self.apply_delta([{'op': 'remove', 'name': item.get('name'), 'quantity': item.get('quantity')}
+                              for item in action_data.get('items') or [] if isinstance(item, dict)])
+        elif action == 'remove_all':
+            self.apply_delta([{'op': 'remove', 'name': action_data.get('target_item')}])
+        elif action == 'update' and action_data.get('target_item'):
+            op = 'add' if action_data.get('operation') == 'increase' else 'remove'
+            self.apply_delta([{'op': op, 'name': action_data['target_item'], 'quantity': action_data.get('quantity', 1)}])
+        elif action == 'place_order':
+            self.apply_delta([{'op': 'clear'}])
+
+    def reprice(self, menu_version: Optional[str]) -> List[str]:
+        """Re-checks prices after a menu change; returns the names whose price moved. Items gone from the menu are dropped."""
+        repriced = []
+        if menu_version == self.cart.menu_version:
+            return repriced
+        kept = []
+        for entry in self.cart.items:
+            item = self.index.get(entry['name'])
+            if item is None:
+                self.rejected.append(entry['name'])
+                continue
+            price = float(item.get('price', 0.0) or 0.0)
+            if price != entry['price']:
+                repriced.append(entry['name'])
+            kept.append({**entry, 'id': item.get('id', entry.get('id')), 'price': price})
+        self.changed |= bool(repriced) or len(kept) != len(self.cart.items)
+        self.cart.items, self.cart.menu_version = kept, menu_version
+        return repriced
+
+
+class CartStore:
+    """Carts ride in a session store of their own as a single ['cart', json] record per session_id,
+    so either backend's TTL, eviction and multi-process sharing apply to them unchanged.
+
+    The striped locks only order threads within one process. Between worker processes a
+    read-modify-write goes through load() and put_if(), which writes only over the record it read.
+    """
+
+    def __init__(self, sessions: SessionStore, stripes: int = 64):
+        self.sessions = sessions
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def lock(self, session_id: str) -> threading.Lock:
+        # crc32 rather than hash() so a session keeps its stripe from run to run
+        return self._locks[zlib.crc32(session_id.encode('utf-8')) % len(self._locks)]
+
+    def load(self, session_id: str) -> Tuple[Cart, Optional[History]]:
+        """The cart and the raw record it came from, to hand back to put_if()."""
+        record = self.sessions.get(session_id)
+        if not record:
+            return Cart(), None
+        data = json.loads(record[0][1])
+        return Cart(items=data['items'], version=data['version'], menu_version=data.get('menu_version')), record
+
+    def get(self, session_id: str) -> Cart:
+        return self.load(session_id)[0]
+
+    @staticmethod
+    def _record(cart: Cart) -> History:
+        return [['cart', json.dumps({'items': cart.items, 'version': cart.version, 'menu_version': cart.menu_version},
+                                    separators=(',', ':'))]]
+
+    def put(self, session_id: str, cart: Cart):
+        self.sessions.put(session_id, self._record(cart))
+
+    def put_if(self, session_id: str, cart: Cart, loaded: Optional[History]) -> bool:
+        """Saves the cart unless another writer changed the record since `loaded` was read; False then."""
+        return self.sessions.compare_and_put(session_id, loaded, self._record(cart))
+
+    def delete(self, session_id: str):
+        self.sessions.delete(session_id)
@@ -0,0 +1,294 @@
+"""Async serving mode for the chatbot.
+
+    uvicorn chatbot_asgi:app --host 0.0.0.0 --port 5000
+
+/chat and /chat/stream are served natively: the rule-based path runs inline and the
+LLM path awaits `llm.ainvoke` / `llm.astream`, so a slow completion no longer pins a
+worker thread. Every other route is delegated to the Flask app.
+"""
+import asyncio, contextvars, functools, json, os, time
+from typing import Any, Dict, Optional, Tuple
+
+from asgiref.wsgi import WsgiToAsgi
+
+import chatbot_service as service
+from admission import LLM_BUDGETS
+from metrics import stage
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", LLM_BUDGETS['LLM_MAX_CONCURRENCY']))
+
+
+class SessionLocks:
+    """One asyncio.Lock per active session_id, dropped once nobody holds or waits on it."""
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    def __len__(self):
+        return len(self._locks)
+
+    def hold(self, session_id: str) -> '_SessionLock':
+        return _SessionLock(self, session_id)
+
+    def _acquire(self, session_id: str) -> asyncio.Lock:
+        lock, users = self._locks.get(session_id) or (asyncio.Lock(), 0)
+        self._locks[session_id] = (lock, users + 1)
+        return lock
+
+    def _release(self, session_id: str):
+        lock, users = self._locks[session_id]
+        if users <= 1:
+            del self._locks[session_id]
+        else:
+            self._locks[session_id] = (lock, users - 1)
+
+
+class _SessionLock:
+    def __init__(self, locks: SessionLocks, session_id: str):
+        self.locks, self.session_id = locks, session_id
+        self.lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self):
+        self.lock = self.locks._acquire(self.session_id)
+        try:
+            await self.lock.acquire()
+        except BaseException:
+            self.locks._release(self.session_id)
+            raise
+
+    async def __aexit__(self, *exc):
+        self.lock.release()
+        self.locks._release(self.session_id)
+
+
+class ChatASGI:
+    def __init__(self, wsgi_app, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.wsgi = WsgiToAsgi(wsgi_app)
+        self.max_concurrency = max_concurrency
+        self.sessions = SessionLocks()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'POST':
+            if scope['path'] == '/chat':
+                return await self.chat(scope, receive, send)
+            if scope['path'] == '/chat/stream':
+                return await self.chat_stream(scope, receive, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                service.start_warmup()  # in the background; /readyz holds traffic until it is done
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def chat(self, scope, receive, send):
+        started = time.perf_counter()
+        data = await read_json(receive)
+        if not data:
+            return await send_json(send, service.error_payload("Invalid request data"), 400)
+        invalid = service.bad_session(data) or service.bad_location(data)
+        if invalid:
+            return await send_json(send, invalid, 400)
+        data = {**data, 'idempotency_key': service.idempotency_key(data, header(scope, b'idempotency-key'))}
+        with service.location_menu(data.get('location_id')):
+            try:
+                cart, notes = await sync_cart(data)
+                data = {**data, 'cart_items': cart.items}
+                payload, status = await self.handle_chat(data)
+                if status < 400:
+                    payload = await settle(data, payload, notes)
+            except Exception as e:
+                payload, status = service.error_payload("I'm sorry, I encountered an error.", error=str(e)), 500
+        service.record_chat('chat', payload, status, started)
+        await send_json(send, payload, status)
+
+    async def handle_chat(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        user_message = data.get('message', '')
+        session_id = data.get('session_id', 'default')
+        cart_items = data.get('cart_items', [])
+
+        early = service.early_chat_response(user_message, cart_items)
+        if early:
+            return early, 200
+
+        # Turns of one session run one at a time so their writes to the conversation never interleave
+        async with self.sessions.hold(session_id):
+            # Both read or write the session store, which may be SQLite, so they run off the event loop
+            context = await in_thread(service.begin_llm_turn, session_id, user_message, cart_items)
+            cached = await in_thread(service.cached_llm_turn, session_id, context)
+            if cached:
+                return cached, 200
+            llm = service.get_llm()
+            if llm is None:
+                return service.error_payload("AI service is not available."), 503
+            ticket = service.admit_llm_turn(context, user_message, cart_items, data.get('deadline_ms'))
+            if not ticket.admitted:
+                return service.shed_payload(ticket, user_message, cart_items), 200
+            try:
+                with stage('admission_wait'):
+                    await ticket.wait_async()
+                async with self.semaphore:
+                    self.in_flight += 1
+                    try:
+                        with stage('llm_call'):
+                            response = await llm.ainvoke(context.messages)
+                    finally:
+                        self.in_flight -= 1
+                ticket.done()
+                text = str(response.content).strip() if hasattr(response, 'content') else ""
+            except Exception as e:
+                ticket.done(ok=False)
+                fallback = service.llm_error_payload(e, user_message, cart_items)
+                if fallback is None:
+                    raise
+                return fallback, 200
+            return await in_thread(service.finish_llm_turn, session_id, context, text, user_message), 200
+
+    async def chat_stream(self, scope, receive, send):
+        started = time.perf_counter()
+        data = await read_json(receive)
+        if not data:
+            return await send_json(send, service.error_payload("Invalid request data"), 400)
+        invalid = service.bad_session(data) or service.bad_location(data)
+        if invalid:
+            return await send_json(send, invalid, 400)
+        data = {**data, 'idempotency_key': service.idempotency_key(data, header(scope, b'idempotency-key'))}
+        with service.location_menu(data.get('location_id')):
+            await self._chat_stream(data, send, started)
+
+    async def _chat_stream(self, data: Dict[str, Any], send, started: float):
+        user_message = data.get('message', '')
+        session_id = data.get('session_id', 'default')
+        cart, notes = await sync_cart(data)
+        cart_items = cart.items
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+
+        def settle_now(payload):
+            return service.settle_cart(data, payload, notes)
+
+        async def settle_async(payload):
+            return await settle(data, payload, notes)
+
+        async def respond(payload, status=200):
+            if status < 400 and payload.get('success'):
+                payload = await settle_async(payload)
+            service.record_chat('stream', payload, status, started)
+            await send_events(send, service.sse_payload_events(payload), final=True)
+
+        early = service.early_chat_response(user_message, cart_items)
+        if early:
+            return await respond(early)
+
+        async with self.sessions.hold(session_id):
+            # Both read or write the session store, which may be SQLite, so they run off the event loop
+            context = await in_thread(service.begin_llm_turn, session_id, user_message, cart_items)
+            cached = await in_thread(service.cached_llm_turn, session_id, context)
+            if cached:
+                return await respond(cached)
+            llm = service.get_llm()
+            if llm is None:
+                return await respond(service.error_payload("AI service is not available."), 503)
+            ticket = service.admit_llm_turn(context, user_message, cart_items, data.get('deadline_ms'))
+            if not ticket.admitted:
+                return await respond(service.shed_payload(ticket, user_message, cart_items))
+            with stage('admission_wait'):
+                await ticket.wait_async()
+            turn = service.StreamingTurn(session_id, context, user_message, settle=settle_now)
+            try:
+                async with self.semaphore:
+                    self.in_flight += 1
+                    try:
+                        async for chunk in llm.astream(context.messages):
+                            event = turn.on_chunk(chunk)
+                            if event:
+                                await send_events(send, [event])
+                    finally:
+                        self.in_flight -= 1
+                ticket.done()
+            except Exception as e:
+                ticket.done(ok=False)
+                return await respond(service.llm_error_payload(e, user_message, cart_items)
+                                     or service.error_payload("I'm sorry, I encountered an error.", error=str(e)))
+            # finish() settles the cart, which places the order (and waits for its fsync) when the model asked for one
+            await send_events(send, await in_thread(turn.finish), final=True)
+            service.record_chat('stream', turn.payload, 200, started)
+
+
+async def in_thread(fn, *args):
+    # asyncio.to_thread without needing 3.9: copy_context carries the request's location and pinned menu along
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(contextvars.copy_context().run, fn, *args))
+
+
+async def sync_cart(data: Dict[str, Any]):
+    # The first look at a location's menu may load it (from disk, or GraphQL for up to LOCATION_LOAD_TIMEOUT),
+    # so it happens off the event loop. The menu is pinned for the request as it loads, and the rest
+    # of the request reads that pinned copy without blocking.
+    return await in_thread(service.sync_cart, data)
+
+
+async def settle(data: Dict[str, Any], payload: Dict[str, Any], notes: Dict[str, Any]) -> Dict[str, Any]:
+    # Always off the event loop: settling takes the session's cart lock, which an order being placed
+    # holds while it waits for the order log's fsync
+    return await in_thread(service.settle_cart, data, payload, notes)
+
+
+def header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get('headers') or ():
+        if key.lower() == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def read_json(receive) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(await read_body(receive) or b'null')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) and data else None
+
+
+SSE_HEADERS = [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+               (b'x-accel-buffering', b'no'), (b'access-control-allow-origin', b'*')]
+
+
+async def send_events(send, events, final: bool = False):
+    await send({'type': 'http.response.body', 'body': ''.join(events).encode('utf-8'), 'more_body': not final})
+
+
+async def send_json(send, payload: Dict[str, Any], status: int = 200):
+    body = json.dumps(payload).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                            (b'access-control-allow-origin', b'*')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+app = ChatASGI(service.app)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv("PORT", "5000")))
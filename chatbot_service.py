@@ -1,150 +1,344 @@
-import os, re, json, time, random, requests
-from flask import Flask, request, jsonify
+import os, re, json, math, time, random, logging, sqlite3, threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from dotenv import load_dotenv
 from typing import List, Dict, Optional, Any
+from urllib.parse import quote
+from graphql_client import GraphQLError, create_graphql_client, pooled_session
+from intent_engine import parse_message
+from menu_index import MenuIndex, EMPTY_INDEX
+from menu_answers import answer_menu_question
+from menu_refresher import MenuRefresher, MenuSnapshot
+from location_catalog import LocationCatalogs, valid_location
+from orders import OrderBook, OrderLogError, create_order_book
+from shared_menu import SharedMenuFollower, load_snapshot, publish_snapshot
+from prompt_context import PromptBuilder, PromptContext
+from response_cache import create_response_cache
+from admission import HIGH, NORMAL, Ticket, create_admission_controller
+from metrics import REGISTRY, CHAT_REQUESTS, CHAT_SECONDS, LLM_ERRORS, MENU_ANSWERS, MENU_REFRESHES, ORDERS, STAGE_SECONDS, stage
+from structured_log import get_logger, log_event, start_logging
+from session_store import create_session_store
+from cart_state import CartEditor, CartStore
+from stream_parser import ActionStreamParser
 
 load_dotenv()
+LOG = get_logger('chatbot')
 
 # Configuration
-GRAPHQL_URL = "http://localhost:4000/graphql"
+GRAPHQL_URL = os.getenv("GRAPHQL_URL", "http://localhost:4000/graphql")
 MENU_ITEMS, MENU_CATEGORIES, MENU_DATA_CACHE = [], [], {}
-LAST_FETCH_TIME, CACHE_DURATION = 0, 300
+MENU_INDEX = EMPTY_INDEX
+LAST_FETCH_TIME, CACHE_DURATION = 0, int(os.getenv("MENU_CACHE_DURATION", "300"))
+FALLBACK_MENU_ITEMS = ["Margherita Pizza", "Pepperoni Pizza", "BBQ Chicken Pizza", "Veggie Supreme Pizza",
+                       "Caesar Salad", "Greek Salad", "Garden Salad", "Chicken Caesar Salad",
+                       "Spaghetti Carbonara", "Penne Arrabbiata", "Fettuccine Alfredo", "Lasagna",
+                       "Grilled Salmon", "Grilled Shrimp", "Fish and Chips", "Seafood Platter",
+                       "Grilled Chicken Breast", "Beef Burger", "Veggie Burger", "Steak",
+                       "Garlic Bread", "Mozzarella Sticks", "Chicken Wings", "Onion Rings", "Bruschetta",
+                       "Chocolate Cake", "Tiramisu", "Ice Cream", "Cheesecake",
+                       "Coca Cola", "Pepsi", "Orange Juice", "Apple Juice", "Water", "Coffee", "Tea"]
+FALLBACK_MENU_CATEGORIES = ["Pizza", "Pasta", "Salads", "Seafood", "Main Courses", "Appetizers", "Desserts", "Beverages"]
+FALLBACK_INDEX = MenuIndex({'name': name, 'price': 12.99, 'available': True} for name in FALLBACK_MENU_ITEMS)
 
 # GraphQL Functions
+GRAPHQL_CLIENT = create_graphql_client(GRAPHQL_URL)
+
+def _fetch_menu_items(client=None):
+    client = client or GRAPHQL_CLIENT
+    try:
+        with stage('menu_refresh'):
+            items = client.fetch_menu()
+    except GraphQLError as e:
+        MENU_REFRESHES.inc(result='error')
+        log_event(LOG, 'menu_fetch_failed', logging.WARNING, error=str(e), circuit=client.breaker.state, url=client.url)
+        raise
+    MENU_REFRESHES.inc(result='ok')
+    return items
+
+def _apply_menu_snapshot(snapshot: MenuSnapshot, persist: bool = True):
+    global LAST_FETCH_TIME, MENU_DATA_CACHE, MENU_INDEX, MENU_ITEMS, MENU_CATEGORIES
+    if MENU_DATA_CACHE.get('version') != snapshot.version:
+        MENU_INDEX = snapshot.index
+        MENU_DATA_CACHE = {'items': snapshot.items, 'categories': snapshot.categories, 'index': snapshot.index, 'version': snapshot.version}
+        MENU_ITEMS, MENU_CATEGORIES = snapshot.index.names, snapshot.categories
+        snapshot.index.warm()  # build the entity automaton and trigram postings here, off the request path
+        RESPONSE_CACHE.clear()  # answers may quote the old menu
+        log_event(LOG, 'menu_updated', items=len(snapshot.items), version=snapshot.version)
+    LAST_FETCH_TIME = snapshot.fetched_at
+    if persist and MENU_SNAPSHOT_PATH and not MENU_SHARED_PATH:
+        _persist_menu_snapshot(snapshot)
+
+# Every successful fetch is saved here and loaded again on startup, so a cold start or an outage
+# serves the last real menu (ids, prices, availability) instead of FALLBACK_MENU_ITEMS
+MENU_SNAPSHOT_PATH = os.getenv("MENU_SNAPSHOT_PATH", "menu_snapshot.snap")
+
+def _persist_menu_snapshot(snapshot: MenuSnapshot):
+    try:
+        publish_snapshot(MENU_SNAPSHOT_PATH, snapshot)
+    except OSError as e:
+        log_event(LOG, 'menu_snapshot_save_failed', logging.WARNING, path=MENU_SNAPSHOT_PATH, error=str(e))
+
+def _load_saved_menu() -> bool:
+    snapshot = load_snapshot(MENU_SNAPSHOT_PATH)
+    if snapshot is None or not MENU_REFRESHER.seed(snapshot):
+        return False
+    _apply_menu_snapshot(snapshot, persist=False)
+    log_event(LOG, 'menu_snapshot_loaded', path=MENU_SNAPSHOT_PATH, version=snapshot.version, age_seconds=round(snapshot.age, 1))
+    return True
+
+# Finished LLM answers to impersonal questions, keyed by normalized message + menu version (+ cart when asked about)
+RESPONSE_CACHE = create_response_cache()
+# Under serve.py the supervisor fetches the menu once and publishes it to MENU_SHARED_PATH; workers attach to that file
+MENU_SHARED_PATH = os.getenv("MENU_SHARED_PATH")
+if MENU_SHARED_PATH:
+    MENU_REFRESHER = SharedMenuFollower(MENU_SHARED_PATH, poll=float(os.getenv("MENU_SHARED_POLL", "1")), on_update=_apply_menu_snapshot)
+else:
+    MENU_REFRESHER = MenuRefresher(_fetch_menu_items, max_age=CACHE_DURATION, on_update=_apply_menu_snapshot)
+
+# Multi-location deployments: a request that names a location_id is answered from that location's own
+# menu, loaded on first use and kept in LOCATIONS while it is in demand; other requests use the menu above.
+# Off unless LOCATION_GRAPHQL_URL names an endpoint that serves per-location menus, e.g.
+# http://menus/graphql?location={location}: server/index.js has no such parameter and would answer every
+# location with the global menu, and orders would be priced against it.
+LOCATION_GRAPHQL_URL = os.getenv("LOCATION_GRAPHQL_URL") or None
+_LOCATION_SESSION = pooled_session(int(os.getenv("LOCATION_POOL_SIZE", "10")))  # one connection pool for every location's client
+
+def _location_fetcher(location_id: str):
+    client = create_graphql_client(LOCATION_GRAPHQL_URL.format(location=quote(location_id, safe='')), session=_LOCATION_SESSION)
+    return lambda: _fetch_menu_items(client)
+
+LOCATIONS = LocationCatalogs(_location_fetcher, memory_budget=int(float(os.getenv("LOCATION_MEMORY_BUDGET_MB", "256")) * 1024 * 1024),
+                             max_locations=int(os.getenv("LOCATION_MAX", "1000")), max_age=CACHE_DURATION,
+                             load_timeout=float(os.getenv("LOCATION_LOAD_TIMEOUT", "10")),
+                             snapshot_dir=os.getenv("LOCATION_SNAPSHOT_DIR", "menu_snapshots") or None,
+                             refresh_concurrency=int(os.getenv("LOCATION_REFRESH_CONCURRENCY", "4")),
+                             missing_ttl=float(os.getenv("LOCATION_MISSING_TTL", "60")))
+
+# The location the current request is for; None for the default menu
+_LOCATION: ContextVar[Optional[str]] = ContextVar('location', default=None)
+# Set while a batch is being answered, so every message in it sees the same snapshot of its location's menu
+_PINNED_MENU: ContextVar[Optional[Dict[Optional[str], Dict[str, Any]]]] = ContextVar('pinned_menu', default=None)
+
+def _current_menu(location_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    if location_id is None:
+        MENU_REFRESHER.get()
+        return MENU_DATA_CACHE or None
+    entry = LOCATIONS.get(location_id)
+    return entry.menu_data if entry else None
+
 def fetch_menu_data_from_graphql() -> Optional[Dict[str, Any]]:
-    global LAST_FETCH_TIME, MENU_DATA_CACHE
-    if time.time() - LAST_FETCH_TIME < CACHE_DURATION and MENU_DATA_CACHE:
-        return MENU_DATA_CACHE
-    
-    query = "query { menuItems { id name description price category available ingredients } }"
+    # Never blocks on a known menu: serves the last good snapshot and revalidates it in the background once
+    # stale. Only the first request for a location that has no saved snapshot waits for its fetch.
+    location_id = _LOCATION.get()
+    pinned = _PINNED_MENU.get()
+    if pinned is None:
+        return _current_menu(location_id)
+    if location_id not in pinned:
+        pinned.setdefault(location_id, _current_menu(location_id) or {})
+    return pinned[location_id] or None
+
+@contextmanager
+def pinned_menu():
+    token = _PINNED_MENU.set({})  # each location is pinned the first time a message in the batch needs it
     try:
-        response = requests.post(GRAPHQL_URL, json={'query': query}, headers={'Content-Type': 'application/json'}, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if 'data' in data and 'menuItems' in data['data']:
-                menu_items = data['data']['menuItems']
-                MENU_DATA_CACHE = {
-                    'items': menu_items,
-                    'categories': list(set(item['category'] for item in menu_items if item['available']))
-                }
-                LAST_FETCH_TIME = time.time()
-                print(f"✅ Fetched {len(menu_items)} menu items from GraphQL")
-                return MENU_DATA_CACHE
-    except Exception as e:
-        print(f"❌ GraphQL error: {e}")
-    return None
+        yield
+    finally:
+        _PINNED_MENU.reset(token)
+
+@contextmanager
+def location_menu(location_id: Optional[str]):
+    # A location's menu is also pinned for the request, so it is looked up once and stays the same
+    # snapshot even if the location is evicted or refreshed while the request runs
+    token = _LOCATION.set(location_id or None)
+    pin = _PINNED_MENU.set({}) if location_id and _PINNED_MENU.get() is None else None
+    try:
+        yield
+    finally:
+        if pin is not None:
+            _PINNED_MENU.reset(pin)
+        _LOCATION.reset(token)
+
+def bad_session(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """An error payload when the request's session_id is not a string, or contains ':' (reserved for store keys)."""
+    session_id = data.get('session_id', 'default')
+    if isinstance(session_id, str) and session_id and ':' not in session_id:
+        return None
+    return error_payload("'session_id' must be a non-empty string without ':'")
+
+def bad_location(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """An error payload when the request names a location_id that cannot be one, or locations are off."""
+    location_id = data.get('location_id')
+    if not location_id:
+        return None
+    if not LOCATION_GRAPHQL_URL:
+        return error_payload("This server has no per-location menus; send requests without 'location_id'")
+    if valid_location(location_id):
+        return None
+    return error_payload("'location_id' must be 1-64 letters, digits, '.', '_' or '-'")
 
 def update_menu_items_from_graphql():
     global MENU_ITEMS, MENU_CATEGORIES
-    menu_data = fetch_menu_data_from_graphql()
-    if menu_data:
-        MENU_ITEMS = [item['name'] for item in menu_data['items'] if item['available']]
-        MENU_CATEGORIES = menu_data['categories']
-        print(f"🔄 Updated menu: {len(MENU_ITEMS)} items across {len(MENU_CATEGORIES)} categories")
+    if fetch_menu_data_from_graphql():
         return True
-    else:
-        MENU_ITEMS = ["Margherita Pizza", "Pepperoni Pizza", "BBQ Chicken Pizza", "Veggie Supreme Pizza",
-                      "Caesar Salad", "Greek Salad", "Garden Salad", "Chicken Caesar Salad",
-                      "Spaghetti Carbonara", "Penne Arrabbiata", "Fettuccine Alfredo", "Lasagna",
-                      "Grilled Salmon", "Grilled Shrimp", "Fish and Chips", "Seafood Platter",
-                      "Grilled Chicken Breast", "Beef Burger", "Veggie Burger", "Steak",
-                      "Garlic Bread", "Mozzarella Sticks", "Chicken Wings", "Onion Rings", "Bruschetta",
-                      "Chocolate Cake", "Tiramisu", "Ice Cream", "Cheesecake",
-                      "Coca Cola", "Pepsi", "Orange Juice", "Apple Juice", "Water", "Coffee", "Tea"]
-        MENU_CATEGORIES = ["Pizza", "Pasta", "Salads", "Seafood", "Main Courses", "Appetizers", "Desserts", "Beverages"]
-        return False
+    MENU_ITEMS, MENU_CATEGORIES = list(FALLBACK_MENU_ITEMS), list(FALLBACK_MENU_CATEGORIES)
+    return False
+
+def get_menu_index() -> MenuIndex:
+    menu_data = fetch_menu_data_from_graphql()
+    return menu_data['index'] if menu_data else FALLBACK_INDEX
 
 def get_menu_item_details(item_name: str) -> Optional[Dict]:
     menu_data = fetch_menu_data_from_graphql()
-    if menu_data:
-        for item in menu_data['items']:
-            if item['name'].lower() == item_name.lower() and item['available']:
-                return item
-    return None
+    return menu_data['index'].get(item_name) if menu_data else None
 
 def find_menu_item_fuzzy_with_details(search_term: str) -> Optional[Dict]:
-    search_term = search_term.lower().strip()
-    menu_data = fetch_menu_data_from_graphql()
-    
-    if not menu_data:
-        matched_name = find_menu_item_fuzzy(search_term)
-        return {'name': matched_name, 'price': 12.99} if matched_name else None
-    
-    # Exact match
-    for item in menu_data['items']:
-        if item['available'] and item['name'].lower() == search_term:
-            return item
-    
-    # Partial match
-    for item in menu_data['items']:
-        if item['available'] and (search_term in item['name'].lower() or item['name'].lower() in search_term):
-            return item
-    
-    # Space-normalized match
-    search_normalized = search_term.replace(' ', '')
-    for item in menu_data['items']:
-        if item['available'] and item['name'].lower().replace(' ', '') == search_normalized:
-            return item
-    
-    # Synonyms
-    synonyms = {'apple juice can': 'Apple Juice Can', 'fresh orange juice': 'Fresh Orange Juice',
-                'water bottle': 'Water Bottle', 'coke': 'Coca Cola', 'pepsi cola': 'Pepsi',
-                'orange': 'Fresh Orange Juice', 'apple': 'Apple Juice Can'}
-    
-    if search_term in synonyms:
-        for item in menu_data['items']:
-            if item['available'] and item['name'].lower() == synonyms[search_term].lower():
-                return item
-    return None
+    return get_menu_index().find(search_term)
 
 def find_menu_item_fuzzy(search_term):
     result = find_menu_item_fuzzy_with_details(search_term)
     return result['name'] if result else None
 
-# Flask App Setup
-app = Flask(__name__)
-CORS(app)
-
-print("Initializing menu data from GraphQL...")
-update_menu_items_from_graphql()
+# OpenAI Setup: the client (and the langchain stack behind it) is built on first use or during warm-up,
+# never at import, so importing this module is cheap and touches no network
+llm = None
+_LLM_LOCK = threading.Lock()
+_llm_initialized = False
 
-# OpenAI Setup
-try:
+def _create_llm():
     base_url = os.getenv("OPENAI_BASE_URL")
     api_key = os.getenv("GITHUB_TOKEN") or os.getenv("OPENAI_API_KEY")
-    use_fallback = api_key in ["fallback_mode", "your-openai-api-key-here", None, ""]
-    
-    if not use_fallback:
+    if api_key in ["fallback_mode", "your-openai-api-key-here", None, ""]:
+        log_event(LOG, 'llm_fallback_mode', reason='no API key configured')
+        return None
+    try:
+        from langchain_openai import ChatOpenAI
         model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini").replace("openai/", "")
-        print(f"[INIT] Initializing AI model: {model_name}")
-        llm = ChatOpenAI(model=model_name, temperature=float(os.getenv("OPENAI_TEMPERATURE", "0.2")),
-                        base_url=base_url, api_key=api_key, request_timeout=15.0)
-        print("[INIT] ✅ AI model initialized successfully")
-    else:
-        llm = None
-        print("[INIT] Running in FALLBACK MODE (rule-based responses, no AI API)")
-except Exception as e:
-    print(f"[INIT] Error: {e}")
-    llm = None
-
-conversations = {}
+        client = ChatOpenAI(model=model_name, temperature=float(os.getenv("OPENAI_TEMPERATURE", "0.2")),
+                            base_url=base_url, api_key=api_key, request_timeout=15.0)
+    except Exception as e:
+        log_event(LOG, 'llm_init_failed', logging.ERROR, error=str(e))
+        return None
+    log_event(LOG, 'llm_initialized', model=model_name)
+    return client
+
+def get_llm():
+    """The chat model, or None in rule-based fallback mode. A model assigned to `llm` beforehand is kept."""
+    global llm, _llm_initialized
+    if not _llm_initialized:
+        with _LLM_LOCK:
+            if not _llm_initialized:
+                if llm is None:
+                    llm = _create_llm()
+                _llm_initialized = True
+    return llm
+
+# Warm-up: fetch the menu, build its indexes and the system prompt, and create the model client,
+# all on a background thread. /readyz reports ready once it has finished.
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_DONE = threading.Event()
+_warmup_thread: Optional[threading.Thread] = None
+WARMUP_STEPS: Dict[str, float] = {}  # step -> seconds it took
+PROCESS_STARTED = time.time()
+
+def _warm():
+    started = time.perf_counter()
+    try:
+        log_event(LOG, 'menu_initializing', graphql_url=GRAPHQL_URL)
+        step = time.perf_counter()
+        if not MENU_SHARED_PATH and _load_saved_menu():
+            MENU_REFRESHER.refresh_async()  # revalidate the saved menu without holding up readiness
+        else:
+            MENU_REFRESHER.refresh(timeout=float(os.getenv("WARMUP_MENU_TIMEOUT", "15")))
+        update_menu_items_from_graphql()
+        cached_system_prompt()
+        WARMUP_STEPS['menu'] = round(time.perf_counter() - step, 4)
+        step = time.perf_counter()
+        get_llm()
+        WARMUP_STEPS['llm'] = round(time.perf_counter() - step, 4)
+        step = time.perf_counter()
+        try:
+            get_order_book()  # claim a worker slot and recover the order log before the first checkout
+        except (OrderLogError, OSError) as e:
+            log_event(LOG, 'order_log_unavailable', logging.ERROR, error=str(e))
+        WARMUP_STEPS['orders'] = round(time.perf_counter() - step, 4)
+    except Exception as e:
+        log_event(LOG, 'warmup_failed', logging.ERROR, error=str(e))
+    finally:
+        WARMUP_STEPS['total'] = round(time.perf_counter() - started, 4)
+        _WARMUP_DONE.set()
+        log_event(LOG, 'warmup_finished', **WARMUP_STEPS)
+
+def start_warmup() -> threading.Event:
+    """Starts the warm-up once per process; returns an event that is set when it has finished."""
+    global _warmup_thread
+    with _WARMUP_LOCK:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm, name='warmup', daemon=True)
+            _warmup_thread.start()
+    return _WARMUP_DONE
+
+def warm_up(timeout: Optional[float] = None) -> bool:
+    """Blocking form of start_warmup, for scripts and benchmarks."""
+    return start_warmup().wait(timeout)
+
+# Conversation turns per session_id; the system prompt is not stored, it is prepended on every turn
+SESSIONS = create_session_store('sessions')
+CARTS = CartStore(create_session_store('carts'))  # a store of its own, so carts don't count against conversation limits
+CART_WRITE_ATTEMPTS = 5  # cart writes that lost a race with another worker are redone this many times
+MAX_HISTORY_MESSAGES = 20
+PROMPTS = PromptBuilder()
+ADMISSION = create_admission_controller()
+CLIENT_DEADLINE_MS = (50.0, 120000.0)  # range a request's deadline_ms is clamped to
+ORDERING_CUES = frozenset(['add', 'order_request', 'remove', 'decrease', 'increase', 'place_order', 'show_cart'])
+MENU_MAX_STALENESS = float(os.getenv("MENU_MAX_STALENESS", str(CACHE_DURATION * 3)))
+
+REGISTRY.gauge('chatbot_menu_age_seconds', "Age of the menu snapshot being served.", lambda: MENU_REFRESHER.age)
+REGISTRY.gauge('chatbot_menu_items', "Available items in the menu being served.", lambda: len(get_menu_index()))
+REGISTRY.gauge('chatbot_llm_available', "1 when a model is configured, 0 in rule-based fallback mode.", lambda: int(llm is not None))
+REGISTRY.gauge('chatbot_warmup_seconds', "Time each warm-up step took.", lambda: {(('step', step),): seconds for step, seconds in WARMUP_STEPS.items()})
+REGISTRY.gauge('chatbot_graphql_circuit_open', "1 while the GraphQL circuit breaker is open.", lambda: int(GRAPHQL_CLIENT.breaker.state == 'open'))
+REGISTRY.gauge('chatbot_sessions', "Conversations held by the session store.", lambda: len(SESSIONS))
+REGISTRY.gauge('chatbot_admission_queue_depth', "Model calls waiting for rate-limit budget.", lambda: ADMISSION.queue_depth)
+REGISTRY.gauge('chatbot_admission_shed', "Requests shed to the rule-based fallback, by reason.",
+               lambda: {(('reason', reason),): count for reason, count in ADMISSION.shed.items()})
+REGISTRY.gauge('chatbot_llm_offload_ratio', "Share of answered chat turns that needed no model call (rules, menu answers, cache).",
+               lambda: answer_paths()['llm_offload'])
+REGISTRY.gauge('chatbot_locations', "Location menus held in memory.", lambda: len(LOCATIONS))
+REGISTRY.gauge('chatbot_location_menu_bytes', "Estimated memory held by location menus.", lambda: LOCATIONS.bytes_used)
+REGISTRY.gauge('chatbot_order_log_backlog_bytes', "Durable order records not yet shipped to the order sink.",
+               lambda: ORDER_BOOK.drain.stats()['backlog_bytes'] if ORDER_BOOK and ORDER_BOOK.drain else None)
+REGISTRY.gauge('chatbot_response_cache_lookups', "Response cache lookups, by result.",
+               lambda: {(('result', 'hit'),): RESPONSE_CACHE.hits, (('result', 'miss'),): RESPONSE_CACHE.misses})
+
+# Orders: opened on first use (or during warm-up), since opening claims a worker slot and recovers the log
+ORDER_BOOK: Optional[OrderBook] = None
+_ORDER_LOCK = threading.Lock()
+
+def get_order_book() -> OrderBook:
+    global ORDER_BOOK
+    if ORDER_BOOK is None:
+        with _ORDER_LOCK:
+            if ORDER_BOOK is None:
+                ORDER_BOOK = create_order_book()
+    return ORDER_BOOK
 
 # Utility Functions
+# (marker, pattern, replacement): a pass only runs when its marker character occurs in the text
+_FORMATTING_PASSES = [(marker, re.compile(pattern), repl) for marker, pattern, repl in [
+    ('*', r'\*\*(.*?)\*\*', r'\1'), ('*', r'\*(.*?)\*', r'\1'), ('#', r'(?m)^[ \t]*#{1,6}[ \t]+', ''),
+    ('`', r'```[^`]*```', ''), ('`', r'`([^`]*)`', r'\1'), ('[', r'\[([^\]]+)\]\([^)]+\)', r'\1'), ('*', r'\*{2,}', ''),
+]]
+
 def clean_response_formatting(text):
     if not text: return text
-    cleaned = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    cleaned = re.sub(r'\*(.*?)\*', r'\1', cleaned)
-    cleaned = re.sub(r'#{1,6}\s*', '', cleaned)
-    cleaned = re.sub(r'```[^`]*```', '', cleaned)
-    cleaned = re.sub(r'`([^`]*)`', r'\1', cleaned)
-    cleaned = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', cleaned)
-    cleaned = re.sub(r'\*{2,}', '', cleaned)
-    cleaned = re.sub(r'\n\s*\n\s*\n', '\n\n', cleaned)
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    return cleaned.strip()
+    cleaned = text
+    for marker, pattern, repl in _FORMATTING_PASSES:
+        if marker in cleaned:
+            cleaned = pattern.sub(repl, cleaned)
+    return ' '.join(cleaned.split())
 
 def _make_human_comment_for_item(item: Dict[str, Any], emotional_state: Dict = None) -> str:
     if not item: return "A great choice — many customers love this!"
@@ -173,27 +367,13 @@ def _make_human_comment_for_item(item: Dict[str, Any], emotional_state: Dict = N
     return comments.get(category, "A tasty choice — many customers enjoy this!")
 
 def detect_emotional_state(user_message):
-    lower_message = user_message.lower()
-    emotional_indicators = {
-        'very_negative': {'keywords': ['devastated', 'destroyed', 'ruined', 'hopeless', 'suicide', 'kill myself'], 'intensity': 'very_high', 'emotion': 'crisis'},
-        'negative_high': {'keywords': ['worst day ever', 'horrible', 'terrible', 'awful', 'miserable', 'depressed'], 'intensity': 'high', 'emotion': 'very_negative'},
-        'negative_medium': {'keywords': ['sad', 'upset', 'angry', 'frustrated', 'disappointed', 'stressed'], 'intensity': 'medium', 'emotion': 'negative'},
-        'positive': {'keywords': ['happy', 'great', 'awesome', 'fantastic', 'wonderful', 'excited'], 'intensity': 'high', 'emotion': 'positive'},
-        'celebratory': {'keywords': ['celebrating', 'birthday', 'anniversary', 'promotion'], 'intensity': 'high', 'emotion': 'celebratory'},
-        'lonely': {'keywords': ['alone', 'lonely', 'no one cares', 'by myself'], 'intensity': 'medium', 'emotion': 'lonely'},
-    }
-    
-    detected_emotions = []
-    for category, data in emotional_indicators.items():
-        for keyword in data['keywords']:
-            if keyword in lower_message:
-                detected_emotions.append({'category': category, 'keyword': keyword, 'intensity': data['intensity'], 'emotion': data['emotion']})
-    
-    if detected_emotions:
-        intensity_order = {'very_high': 4, 'high': 3, 'medium': 2, 'low': 1}
-        detected_emotions.sort(key=lambda x: intensity_order.get(x['intensity'], 0), reverse=True)
-        return detected_emotions[0]
-    return {'emotion': 'neutral', 'intensity': 'none', 'category': 'neutral'}
+    return get_menu_index().scanner.scan(user_message).emotional_state
+
+def extract_menu_mentions(user_message) -> List[Dict[str, Any]]:
+    parsed = parse_message(user_message)
+    if not parsed.cues & {'add', 'order_request'} or parsed.cues & {'remove', 'decrease', 'increase'}:
+        return []
+    return [{'name': m.item['name'], 'quantity': m.quantity, 'details': m.item} for m in get_menu_index().scanner.scan(user_message).items]
 
 def generate_empathetic_response(emotional_state, user_name=None, context='greeting'):
     emotion = emotional_state.get('emotion', 'neutral')
@@ -211,77 +391,42 @@ def generate_empathetic_response(emotional_state, user_name=None, context='greet
     return responses.get(emotion, f"Hello, {user_name}! I'm here to help you find something delicious." if user_name else "Hello! How can I help you today?")
 
 def detect_intent_and_create_action(user_message, response_text):
-    lower_message = re.sub(r'[.,!?]', '', user_message.lower()).strip()
-    print(f"🔍 Analyzing message: '{user_message}'")
-    
-    # Greeting
-    if any(greet in lower_message for greet in ['hi', 'hello', 'hey', 'hiya', 'good morning']):
-        name_match = re.search(r'^(?:hi|hello|hey)[,!\s]*(?:i\'m\s+|i am\s+)?([A-Za-z][A-Za-z\-]{0,30})', user_message, re.IGNORECASE)
-        name = name_match.group(1).strip().capitalize() if name_match else None
-        emotional_state = detect_emotional_state(user_message)
-        response_text = generate_empathetic_response(emotional_state, name, 'greeting')
-        return {"action": "greeting", "message_type": "text", "greeting_name": name, "emotional_state": emotional_state, "response_text": response_text, "response_delay": 800}
-    
-    # Clear chat
-    if any(phrase in lower_message for phrase in ['clear chat', 'clear conversation', 'reset chat']):
-        return {"action": "clear_chat", "message_type": "text", "response_delay": 500}
-    
-    # Show cart
-    if any(phrase in lower_message for phrase in ['show my cart', 'show cart', 'view cart', 'my cart']):
-        return {"action": "show_cart", "message_type": "text", "response_delay": 1000}
-    
-    # Remove all
-    remove_all_patterns = [r'\b(?:remove|delete|cancel)\s+all\s+(?:of\s+)?(?:the\s+)?([a-zA-Z0-9\s]+)(?:\s+from\s+cart)?']
-    for pattern in remove_all_patterns:
-        match = re.search(pattern, lower_message, re.IGNORECASE)
-        if match:
-            item_name = re.sub(r'\b(?:please|plz|now|thanks)\b', '', match.group(1), flags=re.IGNORECASE).strip()
-            item_details = find_menu_item_fuzzy_with_details(item_name)
-            if item_details:
-                return {"action": "remove_all", "message_type": "text", "target_item": item_details['name'], "response_delay": 1000}
-    
-    # Remove with quantity
-    remove_patterns = [
-        r'\b(?:remove|delete)\s+(?:the\s+)?(\d+)\s+quantity\s+of\s+([a-zA-Z\s]+)',
-        r'\b(?:remove|delete)\s+the\s+(\d+)\s+(.+?)(?:\s+from\s+cart)?(?:\s|$)',
-        r'\b(?:remove|delete|cancel)\s+(\d+)\s+(?!quantity\s+of)(.+?)(?:\s*$)',
-    ]
-    for pattern in remove_patterns:
-        match = re.search(pattern, lower_message, re.IGNORECASE)
-        if match:
-            quantity = int(match.group(1))
-            item_name = match.group(2).strip()
-            item_details = find_menu_item_fuzzy_with_details(item_name)
-            if item_details:
-                return {"action": "update", "message_type": "text", "operation": "decrease", "target_item": item_details['name'], "quantity": quantity, "response_delay": 1000}
-    
-    # Place order
-    if any(phrase in lower_message for phrase in ['place order', 'checkout', 'order now']):
-        return {"action": "place_order", "message_type": "text", "order_id": f"ORD-{int(time.time())}", "response_delay": 1500}
-    
-    # Add items
-    direct_item_patterns = [
-        r'\b(?:add)\s+(?!more\b)(\d+)\s+([a-zA-Z\s]+)',
-        r'\bi\s+want\s+(?!(to\s+order\s*$))(\d+)\s+(?:of\s+)?([a-zA-Z\s]+)',
-        r'\border\s+(\d+)\s+([a-zA-Z\s]+)',
-    ]
-    for pattern in direct_item_patterns:
-        match = re.search(pattern, lower_message, re.IGNORECASE)
-        if match:
-            quantity = int(match.group(1))
-            item_name = match.group(2).strip()
-            item_details = find_menu_item_fuzzy_with_details(item_name)
-            if item_details:
-                emotional_state = detect_emotional_state(user_message)
-                return {"action": "add", "message_type": "text", "items": [{"name": item_details['name'], "quantity": quantity, "price": item_details.get('price', 12.99), "id": item_details.get('id', f"item-{quantity}"), "human_comment": _make_human_comment_for_item(item_details, emotional_state)}], "emotional_context": emotional_state, "response_delay": 1000}
+    with stage('intent_detection'):
+        return _intent_action(user_message, response_text)
+
+def _intent_action(user_message, response_text):
+    parsed = parse_message(user_message)
+    log_event(LOG, 'analyze_message', logging.DEBUG, sample=True, chars=len(user_message), cues=sorted(parsed.cues))
+
+    for intent in parsed.intents:
+        if intent.kind == 'greeting':
+            emotional_state = detect_emotional_state(user_message)
+            response_text = generate_empathetic_response(emotional_state, intent.name, 'greeting')
+            return {"action": "greeting", "message_type": "text", "greeting_name": intent.name, "emotional_state": emotional_state, "response_text": response_text, "response_delay": 800}
+        if intent.kind == 'clear_chat':
+            return {"action": "clear_chat", "message_type": "text", "response_delay": 500}
+        if intent.kind == 'show_cart':
+            return {"action": "show_cart", "message_type": "text", "response_delay": 1000}
+        if intent.kind == 'place_order':
+            return {"action": "place_order", "message_type": "text", "response_delay": 1500}  # settle_cart places it
+        
+        item_details = find_menu_item_fuzzy_with_details(intent.item_query)
+        if not item_details:
+            continue
+        if intent.kind == 'remove_all':
+            return {"action": "remove_all", "message_type": "text", "target_item": item_details['name'], "response_delay": 1000}
+        if intent.kind == 'decrease':
+            return {"action": "update", "message_type": "text", "operation": "decrease", "target_item": item_details['name'], "quantity": intent.quantity, "response_delay": 1000}
+        if intent.kind == 'add':
+            emotional_state = detect_emotional_state(user_message)
+            return {"action": "add", "message_type": "text", "items": [{"name": item_details['name'], "quantity": intent.quantity, "price": item_details.get('price', 12.99), "id": item_details.get('id', f"item-{intent.quantity}"), "human_comment": _make_human_comment_for_item(item_details, emotional_state)}], "emotional_context": emotional_state, "response_delay": 1000}
     
     return {"action": "none", "message_type": "text"}
 
-def handle_rate_limit_fallback(user_message, cart_items):
-    lower_message = user_message.lower()
+def rate_limit_fallback_payload(user_message, cart_items) -> Dict[str, Any]:
     response = "I'm currently experiencing high demand, but I can still help you! What would you like to order?"
     
-    if any(greeting in lower_message for greeting in ['hi', 'hello', 'hey']):
+    if parse_message(user_message).has('greeting'):
         emotional_state = detect_emotional_state(user_message)
         response = generate_empathetic_response(emotional_state, None, 'greeting')
     
@@ -292,12 +437,33 @@ def handle_rate_limit_fallback(user_message, cart_items):
     elif action_data['action'] == 'place_order':
         response = "Your cart is empty." if not cart_items else "Perfect! I'll process your order."
     
-    return jsonify({'response': response, 'action_data': action_data, 'success': True, 'fallback_mode': True})
+    return {'response': response, 'action_data': action_data, 'success': True, 'fallback_mode': True}
+
+def handle_rate_limit_fallback(user_message, cart_items):
+    return jsonify(rate_limit_fallback_payload(user_message, cart_items))
 
 def get_system_prompt():
-    update_menu_items_from_graphql()
-    menu_items_str = ', '.join(MENU_ITEMS) if MENU_ITEMS else 'Loading menu items...'
-    categories_str = ', '.join(MENU_CATEGORIES) if MENU_CATEGORIES else 'Loading categories...'
+    return cached_system_prompt()[0]
+
+def cached_system_prompt():
+    # (prompt, tokens), rendered once per menu version; the fallback menu is cached under None.
+    # A location's prompt is kept with its menu, so it leaves memory when the location is evicted.
+    location_id = _LOCATION.get()
+    if location_id is None:
+        update_menu_items_from_graphql()
+        return PROMPTS.system_prompt(MENU_DATA_CACHE.get('version'), render_system_prompt)
+    menu_data = fetch_menu_data_from_graphql()
+    entry = LOCATIONS.peek(location_id)
+    if not menu_data:
+        return PROMPTS.system_prompt('fallback', lambda: render_system_prompt(FALLBACK_MENU_ITEMS, FALLBACK_MENU_CATEGORIES))
+    render = lambda data: PROMPTS.measure(render_system_prompt(data['index'].names, data['categories']))
+    return entry.system_prompt(menu_data, render) if entry else render(menu_data)
+
+def render_system_prompt(menu_items: Optional[List[str]] = None, categories: Optional[List[str]] = None):
+    menu_items = MENU_ITEMS if menu_items is None else menu_items
+    categories = MENU_CATEGORIES if categories is None else categories
+    menu_items_str = ', '.join(menu_items) if menu_items else 'Loading menu items...'
+    categories_str = ', '.join(categories) if categories else 'Loading categories...'
     
     return (
         f"You are a friendly restaurant ordering assistant.\n"
@@ -347,174 +513,650 @@ def extract_json_from_text(text: str):
 
 def extract_items_from_text(text):
     if not text: return []
-    
-    word_to_number = {'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'a': '1', 'an': '1'}
-    for word, digit in word_to_number.items():
-        text = re.sub(r'\b' + word + r'\b', digit, text, flags=re.I)
-    
-    if any(indicator in text.lower() for indicator in ['remove', 'delete', 'cancel', 'decrease']):
-        return []
-    
-    items = []
-    for m in re.finditer(r'(\d+)\s+(?:more\s+)?([A-Za-z0-9&\'\-\s]+?)(?=(?:\s+(?:and|,|&)\s+\d|\s*$|[.,!?]))', text, re.I):
-        qty = int(m.group(1))
-        name = m.group(2).strip().rstrip('.,!?')
-        if name: items.append({'name': name, 'quantity': qty})
-    
-    return items
+    return [dict(item) for item in parse_message(text).add_items]
 
 def extract_remove_items_from_text(text):
     if not text: return []
-    
-    word_to_number = {'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'a': '1', 'an': '1'}
-    text_lower = text.lower()
-    for word, number in word_to_number.items():
-        text_lower = re.sub(r'\b' + word + r'\b', number, text_lower)
-    
-    operation = None
-    if any(indicator in text_lower for indicator in ['remove', 'delete', 'cancel']): operation = 'remove'
-    elif any(indicator in text_lower for indicator in ['decrease', 'reduce']): operation = 'decrease'
-    elif any(indicator in text_lower for indicator in ['increase', 'add more']): operation = 'increase'
-    else: return []
-    
-    extracted_items = []
-    patterns = [
-        r'(?:remove|delete|decrease|increase)\s+(\d+)\s+(?:more\s+)?(.+?)(?:\s+by\s+\d+)?(?:\s+and|$)',
-        r'(?:remove|delete|decrease|increase)\s+(?:more\s+)?(.+?)\s+by\s+(\d+)',
-    ]
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, text_lower, re.IGNORECASE)
-        for match in matches:
-            groups = match.groups()
-            if len(groups) == 2 and groups[0].isdigit():
-                quantity, item_name = int(groups[0]), groups[1].strip()
-            elif len(groups) == 2 and groups[1].isdigit():
-                item_name, quantity = groups[0].strip(), int(groups[1])
-            else:
-                quantity, item_name = 1, groups[0].strip() if groups else ''
-            
-            if item_name:
-                extracted_items.append({'name': item_name, 'quantity': quantity, 'operation': operation})
-                break
-    
-    return extracted_items
-
-# Routes
-@app.route('/chat', methods=['POST'])
-def chat():
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'response': "Invalid request data", 'action_data': {"action": "none", "message_type": "text"}, 'success': False}), 400
+    return [dict(item) for item in parse_message(text).remove_items]
 
-        user_message = data.get('message', '')
-        session_id = data.get('session_id', 'default')
-        cart_items = data.get('cart_items', [])
+# Chat pipeline, shared by the Flask views and the async server in chatbot_asgi.py
+def error_payload(message, **extra) -> Dict[str, Any]:
+    return {'response': message, 'action_data': {"action": "none", "message_type": "text"}, 'success': False, **extra}
 
-        update_menu_items_from_graphql()
+def early_chat_response(user_message, cart_items) -> Optional[Dict[str, Any]]:
+    # Catalog questions come first, so "how much is a lasagna" is answered rather than read as "1 lasagna" to add.
+    # Only a fetched menu is used: the fallback list has no real prices, categories or ingredients.
+    menu_data = fetch_menu_data_from_graphql()
+    if menu_data:
+        with stage('menu_answer'):
+            answer = answer_menu_question(parse_message(user_message), menu_data['index'])
+        if answer:
+            MENU_ANSWERS.inc(kind=answer.kind)
+            return answer.payload()
 
-        # Early intent detection
-        local_items = extract_items_from_text(user_message)
-        if local_items:
-            items_out = []
-            for it in local_items:
-                details = find_menu_item_fuzzy_with_details(it['name']) or {'name': it['name'], 'price': 0.0}
-                items_out.append({'name': details.get('name', it['name']), 'quantity': int(it.get('quantity', 1)), 'price': details.get('price', 0.0), 'id': details.get('id', f"item-{int(time.time())}"), 'human_comment': _make_human_comment_for_item(details)})
+    with stage('item_extraction'):
+        local_items = extract_menu_mentions(user_message) or extract_items_from_text(user_message)
+    if local_items:
+        items_out, unresolved = [], None
+        for it in local_items:
+            details = it.get('details')
+            if details is None:
+                # Names pulled out of free text may be misspelled or not on the menu at all
+                details, alternatives = get_menu_index().resolve(it['name'])
+                if details is None:
+                    if alternatives and unresolved is None:
+                        unresolved = (it, alternatives)
+                    continue
+            items_out.append({'name': details.get('name', it['name']), 'quantity': int(it.get('quantity', 1)), 'price': details.get('price', 0.0), 'id': details.get('id', f"item-{int(time.time())}"), 'human_comment': _make_human_comment_for_item(details)})
 
+        if unresolved:
+            it, alternatives = unresolved
+            resp_text = f"I couldn't find \"{it['name']}\" on the menu. Did you mean one of these?"
+            if items_out:
+                item_list = ', '.join([f"{i['quantity']} {i['name']}" for i in items_out])
+                resp_text = f"Adding {item_list} to your cart. " + resp_text
+            return {'response': resp_text, 'action_data': {'action': 'alternatives', 'unavailable_item': it['name'], 'quantity': int(it.get('quantity', 1)), 'alternatives': [c.as_alternative() for c in alternatives], 'items': items_out, 'message_type': 'text', 'response_delay': 800}, 'success': True}
+        if items_out:
             action = 'add_multiple' if len(items_out) > 1 else 'add'
             if action == 'add_multiple':
                 item_list = ', '.join([f"{i['quantity']} {i['name']}" for i in items_out])
                 resp_text = f"Great - adding {item_list} to your cart."
             else:
                 resp_text = f"Great - adding {items_out[0]['quantity']} {items_out[0]['name']} to your cart."
-            return jsonify({'response': resp_text, 'action_data': {'action': action, 'items': items_out, 'message_type': 'text', 'response_delay': 800}, 'success': True})
-
-        early_action = detect_intent_and_create_action(user_message, "")
-        if early_action and early_action.get('action') != 'none':
-            if early_action.get('action') == 'greeting':
-                return jsonify({'response': early_action.get('response_text', 'Hello!'), 'action_data': {**early_action, 'message_type': 'text'}, 'success': True})
-            
-            response_text = ''
-            action_type = early_action.get('action')
-            if action_type == 'remove_all': response_text = f"Sure - removing all {early_action.get('target_item', 'items')} from your cart."
-            elif action_type == 'show_cart': response_text = "Here's what's in your cart."
-            elif action_type == 'place_order': response_text = "Let me prepare your order."
-            
-            return jsonify({'response': response_text, 'action_data': {**early_action, 'message_type': 'text'}, 'success': True})
-
-        # Initialize conversation
-        if session_id not in conversations:
-            conversations[session_id] = [SystemMessage(content=get_system_prompt())]
-
-        messages = conversations[session_id]
-        cart_context = f"\nCurrent cart: {json.dumps(cart_items)}" if cart_items else "\nCart is empty."
-        messages.append(HumanMessage(content=user_message + cart_context))
-
-        if llm is None:
-            return jsonify({'response': "AI service is not available.", 'action_data': {"action": "none", "message_type": "text"}, 'success': False}), 503
-
-        # Get AI response from OpenAI
-        try:
-            print(f"[AI] Invoking OpenAI LLM for session {session_id}...")
-            response = llm.invoke(messages)
-            text = str(response.content).strip() if hasattr(response, 'content') else ""
-            print(f"[AI] ✅ Response received from OpenAI successfully")
-        except Exception as e:
-            print(f"❌ OpenAI API Error: {e}")
-            if any(err in str(e).lower() for err in ["timeout", "rate_limit", "429"]):
-                return handle_rate_limit_fallback(user_message, cart_items)
-
-        # Extract JSON from response
-        extracted_json, cleaned_text = extract_json_from_text(text)
-        action_data = extracted_json if extracted_json else detect_intent_and_create_action(user_message, text)
-        if action_data: action_data['message_type'] = 'text'
+            return {'response': resp_text, 'action_data': {'action': action, 'items': items_out, 'message_type': 'text', 'response_delay': 800}, 'success': True}
+        # Nothing on the menu matched: let intent detection or the model answer instead of adding a $0.00 item
+
+    early_action = detect_intent_and_create_action(user_message, "")
+    if early_action and early_action.get('action') != 'none':
+        if early_action.get('action') == 'greeting':
+            return {'response': early_action.get('response_text', 'Hello!'), 'action_data': {**early_action, 'message_type': 'text'}, 'success': True}
+        
+        response_text = ''
+        action_type = early_action.get('action')
+        if action_type == 'remove_all': response_text = f"Sure - removing all {early_action.get('target_item', 'items')} from your cart."
+        elif action_type == 'show_cart': response_text = "Here's what's in your cart."
+        elif action_type == 'place_order': response_text = "Let me prepare your order."
+        
+        return {'response': response_text, 'action_data': {**early_action, 'message_type': 'text'}, 'success': True}
+    return None
+
+def _cart_menu():
+    menu_data = fetch_menu_data_from_graphql()
+    return (menu_data['index'], menu_data.get('version')) if menu_data else (FALLBACK_INDEX, None)
+
+def _mark_fallback_prices(cart, menu_version):
+    # Items priced from FALLBACK_INDEX carry made-up prices; with no menu version on the cart the next
+    # real menu reprices all of them. Carts are never repriced against the fallback itself.
+    if menu_version is None:
+        cart.menu_version = None
+
+def sync_cart(data: Dict[str, Any]):
+    """Brings the session's server-side cart up to date with the request; returns (cart, notes for the client).
+
+    A client sends its whole `cart_items` (older clients, or to resync), a `cart_delta` made against
+    `cart_version`, or nothing at all. A delta against a version the server no longer has is not
+    applied; the response flags the conflict so the client can resync.
+    """
+    session_id = data.get('session_id', 'default')
+    index, menu_version = _cart_menu()
+    with CARTS.lock(session_id):
+        for _ in range(CART_WRITE_ATTEMPTS):
+            notes: Dict[str, Any] = {}
+            cart, loaded = CARTS.load(session_id)
+            editor = CartEditor(cart, index)
+            stored_menu = cart.menu_version
+            repriced = editor.reprice(menu_version) if menu_version is not None else []
+            if repriced:
+                notes['repriced'] = repriced
+            if isinstance(data.get('cart_items'), list):
+                editor.replace(data['cart_items'])
+            elif data.get('cart_version') is not None and data['cart_version'] != cart.version:
+                notes['conflict'] = True
+            elif isinstance(data.get('cart_delta'), list):
+                editor.apply_delta(data['cart_delta'])
+            if editor.rejected:
+                notes['rejected'] = editor.rejected
+            if editor.changed:
+                cart.version += 1
+                _mark_fallback_prices(cart, menu_version)
+            restamp = cart.items and menu_version is not None and stored_menu != menu_version
+            if not (editor.changed or restamp) or CARTS.put_if(session_id, cart, loaded):
+                return cart, notes
+            # another worker wrote the cart since it was loaded: redo the edit on top of its version
+    cart, _ = CARTS.load(session_id)
+    return cart, {'conflict': True}
+
+def places_order(payload: Dict[str, Any]) -> bool:
+    return bool(payload.get('success')) and (payload.get('action_data') or {}).get('action') == 'place_order'
+
+def idempotency_key(data: Dict[str, Any], header: Optional[str] = None) -> Optional[str]:
+    """The request's idempotency key: an `idempotency_key` body field or the Idempotency-Key header."""
+    key = data.get('idempotency_key') or header
+    return str(key)[:128] if key else None
+
+def order_receipt(order: Dict[str, Any], replayed: bool = False) -> Dict[str, Any]:
+    # The shape the frontend's receipt renders
+    items = [{**item, 'total': round(item['price'] * item['quantity'], 2)} for item in order['items']]
+    return {'order_id': order['order_id'], 'placed_at': order['placed_at'], 'items': items, 'subtotal': order['subtotal'],
+            'tax': order['tax'], 'total': order['total'], 'order_total': order['total'], 'replayed': replayed}
+
+def _checkout(data: Dict[str, Any], cart, payload: Dict[str, Any], menu_version: Optional[str]):
+    """Places the order a place_order answer asks for, before the cart is cleared; called under the cart lock.
+
+    No new order is placed while the menu is the fallback one (no menu_version): its prices are made up.
+    A retry with an idempotency key that already placed an order gets that order back, and True
+    is returned so the cart (which may hold new items by now) is left alone. When the order
+    cannot be saved the answer becomes an apology and the cart is kept.
+    """
+    session_id = data.get('session_id', 'default')
+    key = idempotency_key(data)
+    try:
+        book = get_order_book()
+        order = book.replay(session_id, key)
+        replayed = order is not None
+        if not replayed:
+            if menu_version is None:
+                ORDERS.inc(result='no_menu')
+                payload.update(response="I'm sorry, I can't place orders while our menu is unavailable. Your cart is saved - please try again in a moment.",
+                               action_data={"action": "none", "message_type": "text"})
+                return False
+            if not cart.items:
+                ORDERS.inc(result='empty')
+                payload.update(response="Your cart is empty - add something first and I'll place your order.",
+                               action_data={"action": "none", "message_type": "text"})
+                return False
+            with stage('order_commit'):
+                # place() claims the key itself, so a retry racing this one on another worker gets this order back
+                order, replayed = book.place(session_id, key, {'location_id': _LOCATION.get(), 'items': cart.items, **cart.totals()})
+    except (OrderLogError, OSError, sqlite3.Error) as e:
+        ORDERS.inc(result='failed')
+        log_event(LOG, 'order_failed', logging.ERROR, error=str(e))
+        payload.update(response="I'm sorry, I couldn't place your order just now. Your cart is saved - please try again.",
+                       action_data={"action": "none", "message_type": "text"}, order_error=str(e))
+        return False
+    ORDERS.inc(result='replayed' if replayed else 'placed')
+    payload['action_data'].update(order_id=order['order_id'], order=order_receipt(order, replayed))
+    if 'prompt' not in payload:  # rule-based wording; the model's own text is left as it is
+        payload['response'] = f"Your order {order['order_id']} is placed - ${order['total']:.2f} in total. Thank you!"
+    return replayed
+
+def settle_cart(data: Dict[str, Any], payload: Dict[str, Any], notes: Dict[str, Any]) -> Dict[str, Any]:
+    """Applies the answer's action to the server-side cart and attaches the authoritative cart and totals.
+    A place_order answer places the order first (see _checkout)."""
+    session_id = data.get('session_id', 'default')
+    index, menu_version = _cart_menu()
+    ordered = None  # the cart items the order was placed from, once _checkout has run
+    with CARTS.lock(session_id):
+        for _ in range(CART_WRITE_ATTEMPTS):
+            cart, loaded = CARTS.load(session_id)
+            editor = CartEditor(cart, index)
+            if ordered is None:  # an order is placed once, however many times the write below is retried
+                replayed = places_order(payload) and _checkout(data, cart, payload, menu_version)
+                ordered = [dict(item) for item in cart.items]
+            if payload.get('success') and not replayed:
+                if places_order(payload) and cart.items != ordered:
+                    # the cart changed on another worker after the order was placed: take out only what was ordered
+                    editor.apply_delta([{'op': 'remove', 'name': item['name'], 'quantity': item['quantity']} for item in ordered])
+                else:
+                    editor.apply_action(payload.get('action_data'))
+            if editor.changed:
+                cart.version += 1
+                _mark_fallback_prices(cart, menu_version)
+            if not editor.changed or CARTS.put_if(session_id, cart, loaded):
+                break
+        else:
+            cart, _ = CARTS.load(session_id)
+            notes = {**notes, 'conflict': True}
+    rejected = notes.get('rejected', []) + editor.rejected
+    payload['cart'] = {**cart.to_payload(), **notes, **({'rejected': rejected} if rejected else {})}
+    return payload
+
+def begin_llm_turn(session_id, user_message, cart_items) -> PromptContext:
+    # context.messages are [role, content] pairs, which the chat model accepts as-is
+    context = PROMPTS.build(cached_system_prompt(), SESSIONS.get(session_id) or [], user_message, cart_items)
+    menu_data = fetch_menu_data_from_graphql()
+    context.cache_key = RESPONSE_CACHE.key_for(parse_message(user_message), detect_emotional_state(user_message),
+                                               menu_data['version'] if menu_data else None, cart_items)
+    # Only answers the model gave from the system prompt and this message alone are shared, and only
+    # if it saw no cart or the cart is part of the key
+    context.cache_store = bool(context.cache_key) and len(context.messages) == 2 and (not cart_items or context.cache_key[2] is not None)
+    log_event(LOG, 'llm_prompt', sample=True, prompt_tokens=context.tokens, dropped_messages=context.dropped_messages)
+    return context
+
+def cached_llm_turn(session_id, context: PromptContext) -> Optional[Dict[str, Any]]:
+    payload = RESPONSE_CACHE.get(context.cache_key)
+    if payload is None:
+        return None
+    SESSIONS.put(session_id, (context.history + [['ai', payload['response']]])[-MAX_HISTORY_MESSAGES:])
+    payload.update(prompt={**context.report(), 'prompt_tokens': 0}, cached=True)
+    return payload
+
+def client_deadline(deadline_ms) -> Optional[float]:
+    """A client's deadline_ms as seconds, clamped to CLIENT_DEADLINE_MS; None (the server's deadline) when it is not a number."""
+    if deadline_ms is None or isinstance(deadline_ms, bool):
+        return None
+    try:
+        value = float(deadline_ms)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(value) or value <= 0:
+        return None
+    low, high = CLIENT_DEADLINE_MS
+    return min(max(value, low), high) / 1000.0
+
+def admit_llm_turn(context: PromptContext, user_message, cart_items, deadline_ms=None) -> Ticket:
+    # Customers in the middle of an order get the whole wait queue; browsing questions only half of it
+    priority = HIGH if cart_items or parse_message(user_message).cues & ORDERING_CUES else NORMAL
+    ticket = ADMISSION.admit(context.tokens, priority, client_deadline(deadline_ms))
+    if not ticket.admitted:
+        log_event(LOG, 'llm_shed', logging.WARNING, reason=ticket.reason, queue_depth=ADMISSION.queue_depth)
+    return ticket
+
+def shed_payload(ticket: Ticket, user_message, cart_items) -> Dict[str, Any]:
+    return {**rate_limit_fallback_payload(user_message, cart_items), 'shed': ticket.reason}
+
+def is_overload_error(error: Exception) -> bool:
+    return any(err in str(error).lower() for err in ["timeout", "rate_limit", "429"])
+
+def llm_error_payload(error: Exception, user_message, cart_items) -> Optional[Dict[str, Any]]:
+    # Overload errors get the rule-based reply; None means the caller should treat it as a failure
+    overload = is_overload_error(error)
+    LLM_ERRORS.inc(overload=str(overload).lower())
+    log_event(LOG, 'llm_error', logging.ERROR, error=str(error), overload=overload)
+    return {**rate_limit_fallback_payload(user_message, cart_items), 'fallback': 'llm_overload'} if overload else None
+
+def finish_llm_turn(session_id, context: PromptContext, text, user_message, extracted=None) -> Dict[str, Any]:
+    # `extracted` is an (action, visible text) pair when the caller already split the completion
+    if extracted is None:
+        with stage('json_extraction'):
+            extracted = extract_json_from_text(text)
+    extracted_json, cleaned_text = extracted
+    action_data = extracted_json if extracted_json else detect_intent_and_create_action(user_message, text)
+    if action_data: action_data['message_type'] = 'text'
+    with stage('formatting'):
         natural_response = clean_response_formatting(cleaned_text)
 
-        messages.append(AIMessage(content=natural_response))
-        if len(messages) > 21: messages = [messages[0]] + messages[-20:]
-        conversations[session_id] = messages
+    SESSIONS.put(session_id, (context.history + [['ai', natural_response]])[-MAX_HISTORY_MESSAGES:])
+
+    payload = {'response': natural_response, 'action_data': action_data or {"action": "none", "message_type": "text"}, 'success': True, 'prompt': context.report()}
+    if context.cache_store:
+        RESPONSE_CACHE.put(context.cache_key, payload)
+    return payload
+
+def chat_path(payload: Dict[str, Any], status: int) -> str:
+    if status >= 400 or not payload.get('success', True):
+        return 'error'
+    for path in ('shed', 'fallback', 'cached'):
+        if payload.get(path):
+            return path
+    if payload.get('menu_answer'):
+        return 'menu'
+    return 'llm' if 'prompt' in payload else 'early'
+
+# Paths that answer a turn without calling the model: the ordering/cart rules, menu-grounded answers and the response cache
+MODEL_FREE_PATHS = ('early', 'menu', 'cached')
+
+def answer_paths() -> Dict[str, Any]:
+    """Answered turns by path since start-up, and the share that never reached the model."""
+    paths = CHAT_REQUESTS.totals('path')
+    answered = sum(paths.get(path, 0) for path in MODEL_FREE_PATHS + ('llm',))
+    offloaded = sum(paths.get(path, 0) for path in MODEL_FREE_PATHS)
+    return {'requests': paths, 'menu_answers': MENU_ANSWERS.totals('kind'),
+            'rule_share': round((paths.get('early', 0) + paths.get('menu', 0)) / answered, 4) if answered else None,
+            'llm_offload': round(offloaded / answered, 4) if answered else None}
+
+def record_chat(endpoint: str, payload: Dict[str, Any], status: int, started: float):
+    path = chat_path(payload, status)
+    CHAT_REQUESTS.inc(endpoint=endpoint, path=path)
+    CHAT_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, path=path)
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_payload_events(payload: Dict[str, Any]) -> List[str]:
+    events = [sse_event('token', {'text': payload['response']})] if payload.get('response') else []
+    return events + [sse_event('action', payload['action_data']), sse_event('done', payload)]
 
-        return jsonify({'response': natural_response, 'action_data': action_data or {"action": "none", "message_type": "text"}, 'success': True})
+class StreamingTurn:
+    """Turns streamed LLM chunks into SSE events: text tokens first, the parsed action at the end."""
 
+    def __init__(self, session_id, context: PromptContext, user_message, settle=None):
+        self.session_id, self.context, self.user_message = session_id, context, user_message
+        self.settle = settle  # called on the final payload before it is sent, e.g. to attach the cart
+        self.parser = ActionStreamParser()
+        self.started = time.perf_counter()
+        self.first_token_ms = None
+        self.payload: Optional[Dict[str, Any]] = None
+
+    def on_chunk(self, chunk) -> Optional[str]:
+        delta = self.parser.feed(str(getattr(chunk, 'content', chunk) or ''))
+        if not delta:
+            return None
+        if self.first_token_ms is None:
+            self.first_token_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        return sse_event('token', {'text': delta})
+
+    def finish(self) -> List[str]:
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, stage='llm_call')
+        action, tail = self.parser.finish()
+        events = [sse_event('token', {'text': tail})] if tail else []
+        payload = self.payload = finish_llm_turn(self.session_id, self.context, self.parser.text, self.user_message, extracted=(action, self.parser.text))
+        payload['time_to_first_token_ms'] = self.first_token_ms
+        if self.settle:
+            payload = self.payload = self.settle(payload)
+        return events + [sse_event('action', payload['action_data']), sse_event('done', payload)]
+
+def handle_chat(data: Dict[str, Any]):
+    """Answers one /chat request body, against its location's menu; returns (payload, HTTP status)."""
+    invalid = bad_session(data) or bad_location(data)
+    if invalid:
+        return invalid, 400
+    with location_menu(data.get('location_id')):
+        cart, notes = sync_cart(data)
+        data = {**data, 'cart_items': cart.items}
+        early = early_chat_response(data.get('message', ''), cart.items)
+        payload, status = (early, 200) if early else handle_llm_chat(data)
+        return (settle_cart(data, payload, notes) if status < 400 else payload), status
+
+def handle_llm_chat(data: Dict[str, Any]):
+    user_message = data.get('message', '')
+    session_id = data.get('session_id', 'default')
+    cart_items = data.get('cart_items', [])
+
+    context = begin_llm_turn(session_id, user_message, cart_items)
+    cached = cached_llm_turn(session_id, context)
+    if cached:
+        return cached, 200
+    llm = get_llm()
+    if llm is None:
+        return error_payload("AI service is not available."), 503
+    ticket = admit_llm_turn(context, user_message, cart_items, data.get('deadline_ms'))
+    if not ticket.admitted:
+        return shed_payload(ticket, user_message, cart_items), 200
+
+    try:
+        with stage('admission_wait'):
+            ticket.wait()
+        with stage('llm_call'):
+            response = llm.invoke(context.messages)
+        ticket.done()
+        text = str(response.content).strip() if hasattr(response, 'content') else ""
     except Exception as e:
-        return jsonify({'response': "I'm sorry, I encountered an error.", 'action_data': {"action": "none", "message_type": "text"}, 'success': False, 'error': str(e)}), 500
+        ticket.done(ok=False)
+        fallback = llm_error_payload(e, user_message, cart_items)
+        if fallback is None:
+            raise
+        return fallback, 200
+
+    return finish_llm_turn(session_id, context, text, user_message), 200
+
+BATCH_MAX_MESSAGES = int(os.getenv("BATCH_MAX_MESSAGES", "100"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+_BATCH_POOL = ThreadPoolExecutor(max_workers=BATCH_LLM_CONCURRENCY, thread_name_prefix='chat-batch')
+
+def handle_chat_batch(entries: List[Any], location_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Answers many /chat bodies against one snapshot of each location's menu; results come back in input order.
+
+    An entry without a location_id of its own uses `location_id`. Entries are grouped by session
+    and each session runs as one task on a thread pool: its turns are answered (by the rules or
+    the model) and settled against the cart strictly in input order, each before the next starts.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(entries)
+    by_session: Dict[str, List[int]] = {}
+
+    def settle(i, payload, status, started, notes):
+        if status < 400:
+            payload = settle_cart(entries[i], payload, notes)
+        record_chat('batch', payload, status, started)
+        results[i] = {'index': i, 'session_id': entries[i].get('session_id', 'default'), 'status': status, **payload}
+
+    def run_turn(i):
+        started, notes = time.perf_counter(), {}
+        with location_menu(entries[i].get('location_id')):
+            try:
+                cart, notes = sync_cart(entries[i])
+                entry = entries[i] = {**entries[i], 'cart_items': cart.items}
+                early = early_chat_response(entry['message'], cart.items)
+                payload, status = (early, 200) if early else handle_llm_chat(entry)
+            except Exception as e:
+                payload, status = error_payload("I'm sorry, I encountered an error.", error=str(e)), 500
+            settle(i, payload, status, started, notes)
+
+    def run_session(indices):
+        for i in indices:
+            run_turn(i)
+
+    with pinned_menu():
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not isinstance(entry.get('message'), str):
+                results[i] = {'index': i, 'status': 400, **error_payload("Each entry needs a 'message' string")}
+                continue
+            entry = entries[i] = {'location_id': location_id, **entry}
+            invalid = bad_session(entry) or bad_location(entry)
+            if invalid:
+                results[i] = {'index': i, 'status': 400, **invalid}
+                continue
+            by_session.setdefault(entry.get('session_id', 'default'), []).append(i)
+        # copy_context carries the pinned snapshot into the worker threads
+        futures = [_BATCH_POOL.submit(copy_context().run, run_session, indices) for indices in by_session.values()]
+        for future in futures:
+            future.result()
+    return results
+
+# Routes, registered on each app by create_app()
+bp = Blueprint('chatbot', __name__)
+
+@bp.route('/chat', methods=['POST'])
+def chat():
+    started = time.perf_counter()
+    try:
+        data = request.get_json()
+        if data:
+            data = {**data, 'idempotency_key': idempotency_key(data, request.headers.get('Idempotency-Key'))}
+        payload, status = handle_chat(data) if data else (error_payload("Invalid request data"), 400)
+    except Exception as e:
+        payload, status = error_payload("I'm sorry, I encountered an error.", error=str(e)), 500
+    record_chat('chat', payload, status, started)
+    return jsonify(payload), status
+
+@bp.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    data = request.get_json(silent=True)
+    entries = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        return jsonify(error_payload("Expected a non-empty 'requests' list")), 400
+    if len(entries) > BATCH_MAX_MESSAGES:
+        return jsonify(error_payload(f"At most {BATCH_MAX_MESSAGES} messages per batch")), 413
+    location_id = data.get('location_id') if isinstance(data, dict) else None
+    invalid = bad_location({'location_id': location_id})
+    if invalid:
+        return jsonify(invalid), 400
+    started = time.perf_counter()
+    results = handle_chat_batch(entries, location_id)
+    return jsonify({'success': all(r['status'] < 400 for r in results), 'results': results, 'count': len(results),
+                    'llm_messages': sum('prompt' in r for r in results), 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)})
+
+@bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify(error_payload("Invalid request data")), 400
+    invalid = bad_session(data) or bad_location(data)
+    if invalid:
+        return jsonify(invalid), 400
+    data = {**data, 'idempotency_key': idempotency_key(data, request.headers.get('Idempotency-Key'))}
+    with location_menu(data.get('location_id')):
+        return _chat_stream(data, started)
 
-@app.route('/clear_session', methods=['POST'])
+def _chat_stream(data: Dict[str, Any], started: float):
+    user_message = data.get('message', '')
+    session_id = data.get('session_id', 'default')
+    cart, notes = sync_cart(data)
+    cart_items = cart.items
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+    def settle(payload):
+        return settle_cart(data, payload, notes)
+
+    def respond(payload, status=200):
+        if status < 400:
+            payload = settle(payload)
+        record_chat('stream', payload, status, started)
+        return Response(sse_payload_events(payload), mimetype='text/event-stream', headers=headers)
+
+    early = early_chat_response(user_message, cart_items)
+    if early:
+        return respond(early)
+
+    context = begin_llm_turn(session_id, user_message, cart_items)
+    cached = cached_llm_turn(session_id, context)
+    if cached:
+        return respond(cached)
+    llm = get_llm()
+    if llm is None:
+        return respond(error_payload("AI service is not available."), 503)
+    ticket = admit_llm_turn(context, user_message, cart_items, data.get('deadline_ms'))
+    if not ticket.admitted:
+        return respond(shed_payload(ticket, user_message, cart_items))
+
+    def generate():
+        with location_menu(data.get('location_id')):  # runs after the view has returned, outside its context
+            yield from stream_turn()
+
+    def stream_turn():
+        with stage('admission_wait'):
+            ticket.wait()
+        turn = StreamingTurn(session_id, context, user_message, settle=settle)
+        try:
+            for chunk in llm.stream(context.messages):
+                event = turn.on_chunk(chunk)
+                if event: yield event
+            ticket.done()
+        except Exception as e:
+            ticket.done(ok=False)
+            payload = llm_error_payload(e, user_message, cart_items)
+            payload = settle(payload) if payload else error_payload("I'm sorry, I encountered an error.", error=str(e))
+            record_chat('stream', payload, 200, started)
+            yield from sse_payload_events(payload)
+            return
+        yield from turn.finish()
+        record_chat('stream', turn.payload, 200, started)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+    # A client that disconnects before (or while) the body is sent never finishes the generator; release its ticket here
+    response.call_on_close(lambda: ticket.done(ok=False))
+    return response
+
+@bp.route('/clear_session', methods=['POST'])
 def clear_session():
     try:
         data = request.get_json()
-        session_id = data.get('session_id', 'default') if data else 'default'
-        if session_id in conversations:
-            conversations[session_id] = [SystemMessage(content=get_system_prompt())]
+        data = data or {}
+        invalid = bad_session(data)
+        if invalid:
+            return jsonify(invalid), 400
+        session_id = data.get('session_id', 'default')
+        SESSIONS.delete(session_id)
+        if data.get('clear_cart'):
+            CARTS.delete(session_id)
         return jsonify({'success': True, 'message': 'Chat cleared! How can I help you today?'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/health', methods=['GET'])
+def readiness() -> Dict[str, Any]:
+    menu_age = MENU_REFRESHER.age
+    menu_ok = bool(MENU_DATA_CACHE) and menu_age is not None and menu_age <= MENU_MAX_STALENESS
+    checks = {'warmup': {'ok': _WARMUP_DONE.is_set(), 'steps': WARMUP_STEPS},
+              'menu': {'ok': menu_ok, 'source': ('shared' if MENU_SHARED_PATH else 'graphql') if MENU_DATA_CACHE else 'fallback',
+                       'age_seconds': round(menu_age, 1) if menu_age is not None else None, 'max_age_seconds': MENU_MAX_STALENESS},
+              'llm': {'ok': llm is not None, 'mode': 'ai' if llm is not None else 'rule_based'}}
+    return {'ready': all(check['ok'] for check in checks.values()), 'checks': checks}
+
+@bp.route('/livez', methods=['GET'])
+def livez():
+    # Liveness only: the process is up and serving. Never depends on the menu or the model.
+    return jsonify({'alive': True, 'uptime_seconds': round(time.time() - PROCESS_STARTED, 1)})
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    # Traffic gate: 503 until warm-up has finished and a fresh menu is loaded. A missing model
+    # does not hold traffic back, since the rule-based fallback can still answer.
+    ready = readiness()
+    gate = ready['checks']['warmup']['ok'] and ready['checks']['menu']['ok']
+    return jsonify({**ready, 'ready': gate}), 200 if gate else 503
+
+@bp.route('/health', methods=['GET'])
 def health():
     ai_status = "ready" if llm is not None else "api_key_required"
-    return jsonify({'status': 'healthy', 'service': 'chatbot', 'ai_status': ai_status, 'message': 'AI service ready' if llm else 'Please configure OpenAI API key', 'fallback_available': True})
+    menu_age = MENU_REFRESHER.age
+    ready = readiness()
+    return jsonify({'status': 'healthy' if ready['ready'] else 'degraded', **ready, 'service': 'chatbot', 'ai_status': ai_status, 'message': 'AI service ready' if llm else 'Please configure OpenAI API key', 'fallback_available': True,
+                    'menu': {'version': MENU_REFRESHER.version, 'age_seconds': round(menu_age, 1) if menu_age is not None else None, 'refreshing': MENU_REFRESHER.refreshing, 'last_error': MENU_REFRESHER.last_error, 'graphql_circuit': GRAPHQL_CLIENT.breaker.state, 'shared_path': MENU_SHARED_PATH},
+                    'sessions': SESSIONS.stats(), 'carts': CARTS.sessions.stats(), 'response_cache': RESPONSE_CACHE.stats(),
+                    'admission': ADMISSION.stats(), 'answer_paths': answer_paths(), 'locations': LOCATIONS.stats(detail=10),
+                    'orders': ORDER_BOOK.stats() if ORDER_BOOK else None})
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
-@app.route('/menu', methods=['GET'])
+@bp.route('/menu', methods=['GET'])
 def get_menu_info():
+    location_id = request.args.get('location_id')
+    if location_id is not None:
+        return location_menu_info(location_id)
     try:
         success = update_menu_items_from_graphql()
-        return jsonify({'success': True, 'items': MENU_ITEMS, 'categories': MENU_CATEGORIES, 'total_items': len(MENU_ITEMS), 'total_categories': len(MENU_CATEGORIES), 'data_source': 'GraphQL' if success else 'Fallback', 'last_updated': LAST_FETCH_TIME})
+        return jsonify({'success': True, 'items': MENU_ITEMS, 'categories': MENU_CATEGORIES, 'total_items': len(MENU_ITEMS), 'total_categories': len(MENU_CATEGORIES), 'data_source': 'GraphQL' if success else 'Fallback', 'last_updated': LAST_FETCH_TIME, 'version': MENU_REFRESHER.version, 'age_seconds': round(MENU_REFRESHER.age, 1) if success else None, 'refreshing': MENU_REFRESHER.refreshing})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e), 'items': [], 'categories': []}), 500
 
-@app.route('/menu/refresh', methods=['POST'])
+def location_menu_info(location_id: str):
+    invalid = bad_location({'location_id': location_id})
+    if invalid:
+        return jsonify({**invalid, 'items': [], 'categories': []}), 400
+    try:
+        with location_menu(location_id):
+            menu_data = fetch_menu_data_from_graphql()
+        items = menu_data['index'].names if menu_data else FALLBACK_MENU_ITEMS
+        categories = menu_data['categories'] if menu_data else FALLBACK_MENU_CATEGORIES
+        entry = LOCATIONS.peek(location_id)
+        menu = entry.stats() if entry else {}
+        return jsonify({'success': True, 'location_id': location_id, 'items': items, 'categories': categories, 'total_items': len(items), 'total_categories': len(categories), 'data_source': 'GraphQL' if menu_data else 'Fallback', 'version': menu.get('version'), 'age_seconds': menu.get('age_seconds'), 'refreshing': menu.get('refreshing', False)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e), 'items': [], 'categories': []}), 500
+
+@bp.route('/menu/refresh', methods=['POST'])
 def refresh_menu_data():
     try:
-        global LAST_FETCH_TIME
-        LAST_FETCH_TIME = 0
-        success = update_menu_items_from_graphql()
-        return jsonify({'success': success, 'message': 'Menu data refreshed successfully' if success else 'Failed to refresh', 'items_count': len(MENU_ITEMS), 'categories_count': len(MENU_CATEGORIES), 'data_source': 'GraphQL' if success else 'Fallback'})
+        success = MENU_REFRESHER.refresh(timeout=15)
+        has_menu = update_menu_items_from_graphql()
+        return jsonify({'success': success, 'message': 'Menu data refreshed successfully' if success else 'Failed to refresh', 'items_count': len(MENU_ITEMS), 'categories_count': len(MENU_CATEGORIES), 'data_source': 'GraphQL' if has_menu else 'Fallback', 'version': MENU_REFRESHER.version})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _warmup_on_first_request():
+    if _warmup_thread is None:
+        start_warmup()
+
+def create_app(warm: bool = True) -> Flask:
+    """Builds the Flask app. With warm=True the menu and model warm up in the background right away;
+    otherwise the first request (typically a readiness probe) starts it."""
+    start_logging()
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(bp)
+    app.before_request(_warmup_on_first_request)
+    if warm:
+        start_warmup()
+    return app
+
+# For `flask run`, gunicorn `chatbot_service:app` and chatbot_asgi; building it does no I/O
+app = create_app(warm=False)
+
 if __name__ == '__main__':
     print("[CHATBOT] Starting Restaurant Chatbot Service...")
     print("📡 Service available at http://localhost:5000")
+    start_warmup()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,154 @@
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from intent_engine import WORD_TO_NUMBER
+
+EMOTIONAL_INDICATORS = {
+    'very_negative': {'keywords': ['devastated', 'destroyed', 'ruined', 'hopeless', 'suicide', 'kill myself'], 'intensity': 'very_high', 'emotion': 'crisis'},
+    'negative_high': {'keywords': ['worst day ever', 'horrible', 'terrible', 'awful', 'miserable', 'depressed'], 'intensity': 'high', 'emotion': 'very_negative'},
+    'negative_medium': {'keywords': ['sad', 'upset', 'angry', 'frustrated', 'disappointed', 'stressed'], 'intensity': 'medium', 'emotion': 'negative'},
+    'positive': {'keywords': ['happy', 'great', 'awesome', 'fantastic', 'wonderful', 'excited'], 'intensity': 'high', 'emotion': 'positive'},
+    'celebratory': {'keywords': ['celebrating', 'birthday', 'anniversary', 'promotion'], 'intensity': 'high', 'emotion': 'celebratory'},
+    'lonely': {'keywords': ['alone', 'lonely', 'no one cares', 'by myself'], 'intensity': 'medium', 'emotion': 'lonely'},
+}
+INTENSITY_ORDER = {'very_high': 4, 'high': 3, 'medium': 2, 'low': 1}
+_QUANTITY_RE = re.compile(r'\b(\d+|' + '|'.join(WORD_TO_NUMBER) + r')\s+(?:more\s+)?$')
+
+
+class AhoCorasick:
+    """Multi-pattern automaton: one pass over the text reports every (start, end, payload) occurrence."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        for word, payload in patterns:
+            if word:
+                self._add(word, payload)
+        self._link()
+
+    def _add(self, word: str, payload: Any):
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(word), payload))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, payload in out[node]:
+                yield i - length + 1, i + 1, payload
+
+
+@dataclass(frozen=True)
+class EmotionHit:
+    category: str
+    keyword: str
+    intensity: str
+    emotion: str
+    rank: int
+    span: Tuple[int, int]
+
+    def as_state(self) -> Dict[str, str]:
+        return {'category': self.category, 'keyword': self.keyword, 'intensity': self.intensity, 'emotion': self.emotion}
+
+
+@dataclass(frozen=True)
+class ItemMention:
+    item: Dict[str, Any]
+    alias: str
+    span: Tuple[int, int]
+    quantity: int = 1
+
+
+@dataclass(frozen=True)
+class ScanResult:
+    emotions: Tuple[EmotionHit, ...]
+    items: Tuple[ItemMention, ...]
+
+    @property
+    def emotional_state(self) -> Dict[str, str]:
+        if not self.emotions:
+            return {'emotion': 'neutral', 'intensity': 'none', 'category': 'neutral'}
+        return min(self.emotions, key=lambda hit: (-INTENSITY_ORDER.get(hit.intensity, 0), hit.rank)).as_state()
+
+
+def _is_word(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+class EntityScanner:
+    """Finds emotion keywords and menu-item mentions (names, plurals, synonyms) in a single pass."""
+
+    def __init__(self, items: Iterable[Dict[str, Any]] = (), synonyms: Optional[Dict[str, Dict[str, Any]]] = None):
+        patterns: List[Tuple[str, Any]] = []
+        rank = 0
+        for category, data in EMOTIONAL_INDICATORS.items():
+            for keyword in data['keywords']:
+                patterns.append((keyword, ('emotion', (category, keyword, data['intensity'], data['emotion'], rank))))
+                rank += 1
+        aliases: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            name = item['name'].lower()
+            aliases.setdefault(name, item)
+            aliases.setdefault(name + 's', item)
+        for term, item in (synonyms or {}).items():
+            aliases.setdefault(term, item)
+        patterns.extend((alias, ('item', item)) for alias, item in aliases.items())
+        self._automaton = AhoCorasick(patterns)
+        self._memo: Dict[str, ScanResult] = {}
+
+    def scan(self, text: str) -> ScanResult:
+        lower = (text or '').lower()
+        result = self._memo.get(lower)
+        if result is None:
+            result = self._scan(lower)
+            if len(self._memo) < 4096:
+                self._memo[lower] = result
+        return result
+
+    def _scan(self, lower: str) -> ScanResult:
+        emotions, candidates = [], []
+        for start, end, (kind, payload) in self._automaton.iter_matches(lower):
+            if not _is_word(lower, start, end):
+                continue
+            if kind == 'emotion':
+                emotions.append(EmotionHit(*payload, span=(start, end)))
+            else:
+                candidates.append((start, end, payload))
+        # Leftmost-longest, non-overlapping item mentions
+        candidates.sort(key=lambda c: (c[0], -(c[1] - c[0])))
+        items, last_end = [], -1
+        for start, end, item in candidates:
+            if start < last_end:
+                continue
+            qty = _QUANTITY_RE.search(lower, 0, start)
+            quantity = int(WORD_TO_NUMBER.get(qty.group(1), qty.group(1))) if qty else 1
+            items.append(ItemMention(item, lower[start:end], (start, end), quantity))
+            last_end = end
+        return ScanResult(tuple(emotions), tuple(items))
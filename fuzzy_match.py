@@ -0,0 +1,120 @@
+import heapq
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CONFIDENT_SCORE = 0.7    # resolve locally at or above this...
+CONFIDENT_MARGIN = 0.1   # ...when the runner-up trails by at least this much
+PARTIAL_PENALTY = 0.9    # a query matching only some of an alias's words scores a little lower
+SUGGEST_SCORE = 0.5      # below this a candidate is not worth offering
+
+
+@dataclass(frozen=True)
+class Candidate:
+    item: Dict[str, Any]
+    alias: str
+    score: float
+
+    def as_alternative(self) -> Dict[str, Any]:
+        item = self.item
+        return {'id': item.get('id'), 'name': item['name'], 'price': item.get('price', 0.0), 'description': item.get('description', ''),
+                'ingredients': item.get('ingredients', []), 'category': item.get('category'), 'score': round(self.score, 3)}
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+@lru_cache(maxsize=1 << 15)  # aliases on big menus share most of their windows ("margherita pizza")
+def edit_similarity(a: str, b: str) -> float:
+    """1 - Levenshtein(a, b) / max(len(a), len(b))."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return 1.0 - previous[-1] / len(a)
+
+
+def best_similarity(query: str, alias: str) -> float:
+    """Edit similarity to the whole alias, or to its best run of as many words as the query has."""
+    score = edit_similarity(query, alias)
+    words, width = alias.split(), len(query.split())
+    for i in range(len(words) - width + 1) if width < len(words) else ():
+        window = ' '.join(words[i:i + width])
+        # Skip windows whose length difference alone rules out beating the current score
+        if PARTIAL_PENALTY * (1 - abs(len(window) - len(query)) / max(len(window), len(query))) > score:
+            score = max(score, PARTIAL_PENALTY * edit_similarity(query, window))
+    return score
+
+
+class TrigramMatcher:
+    """Approximate lookup over menu names and aliases.
+
+    Trigram posting lists shortlist aliases sharing the most trigrams with the query (Dice
+    coefficient); the shortlist is then re-scored with edit distance, which is what tells
+    "margarita piza" from "marinara pizza". One candidate per item, best first.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Dict[str, Any]]], shortlist: int = 8):
+        self.shortlist = shortlist
+        self._aliases: List[Tuple[str, Dict[str, Any], int]] = []  # (alias, item, trigram count)
+        self._postings: Dict[str, List[int]] = {}
+        seen = set()
+        for alias, item in entries:
+            alias = ' '.join(alias.lower().split())
+            if not alias or alias in seen:
+                continue
+            seen.add(alias)
+            grams = set(trigrams(alias))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(len(self._aliases))
+            self._aliases.append((alias, item, len(grams)))
+
+    @classmethod
+    def from_tables(cls, aliases: List[Tuple[str, Dict[str, Any], int]], postings, shortlist: int = 8) -> 'TrigramMatcher':
+        """A matcher over tables built elsewhere; `postings` only needs .get(gram, default) returning alias ids."""
+        matcher = cls((), shortlist)
+        matcher._aliases, matcher._postings = aliases, postings
+        return matcher
+
+    def tables(self) -> Tuple[List[Tuple[str, Dict[str, Any], int]], Dict[str, List[int]]]:
+        return self._aliases, self._postings
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def search(self, query: str, limit: int = 3) -> List[Candidate]:
+        query = ' '.join(query.lower().split())
+        grams = set(trigrams(query))
+        if not query or not grams:
+            return []
+        shared = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in grams))
+        aliases, size = self._aliases, len(grams)
+        dice = heapq.nlargest(self.shortlist, ((2 * count / (size + aliases[alias_id][2]), alias_id) for alias_id, count in shared.items()))
+        best: Dict[int, Candidate] = {}
+        for dice_score, alias_id in dice:
+            alias, item, _ = self._aliases[alias_id]
+            score = (dice_score + best_similarity(query, alias)) / 2
+            key = id(item)
+            if key not in best or score > best[key].score:
+                best[key] = Candidate(item, alias, score)
+        return sorted(best.values(), key=lambda c: c.score, reverse=True)[:limit]
+
+    def resolve(self, query: str) -> Tuple[Optional[Candidate], List[Candidate]]:
+        """(confident match or None, candidates worth suggesting)."""
+        candidates = [c for c in self.search(query, limit=4) if c.score >= SUGGEST_SCORE]
+        if candidates and candidates[0].score >= CONFIDENT_SCORE and (
+                len(candidates) == 1 or candidates[0].score - candidates[1].score >= CONFIDENT_MARGIN):
+            return candidates[0], candidates
+        return None, candidates[:3]
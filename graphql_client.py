@@ -0,0 +1,148 @@
+import os, random, threading, time
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MENU_FIELDS = "id name description price category available ingredients"
+NOT_MODIFIED = object()
+
+
+class GraphQLError(Exception):
+    pass
+
+
+class CircuitOpenError(GraphQLError):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; lets one probe through after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold, self.reset_timeout = failure_threshold, reset_timeout
+        self.failures, self.opened_at = 0, 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return 'closed'
+        return 'half_open' if time.time() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures, self._probing = 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+
+
+def pooled_session(pool_size: int = 10, hosts: int = 1) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+
+class GraphQLClient:
+    """Pooled GraphQL client with timeouts, jittered retries and a circuit breaker.
+
+    Clients for many endpoints (one per restaurant location) can share one `session` and its
+    connection pool; a shared session is left open by close().
+    """
+
+    def __init__(self, url: str, connect_timeout: float = 2.0, read_timeout: float = 8.0, retries: int = 2,
+                 backoff: float = 0.25, max_backoff: float = 2.0, pool_size: int = 10,
+                 breaker: Optional[CircuitBreaker] = None, session: Optional[requests.Session] = None):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries, self.backoff, self.max_backoff = retries, backoff, max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._owns_session = session is None
+        self.session = session or pooled_session(pool_size)
+        self.menu_version: Optional[str] = None
+        self.supports_menu_version = True
+
+    def execute(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"circuit open for {self.url}")
+        try:
+            response, body = self._post({'query': query, 'variables': variables or {}})
+        except Exception:
+            # Whatever went wrong counts, or a half-open probe that raised something unexpected would never finish
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        if body.get('errors'):
+            raise GraphQLError('; '.join(err.get('message', '') for err in body['errors']))
+        if response.status_code != 200 or 'data' not in body:
+            raise GraphQLError(f"HTTP {response.status_code}")
+        return body['data']
+
+    def _post(self, payload: Dict[str, Any]):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if response.status_code >= 500:
+                    raise GraphQLError(f"HTTP {response.status_code}")
+                body = response.json()
+                if not isinstance(body, dict):
+                    raise GraphQLError("response is not a JSON object")
+                return response, body
+            except (requests.RequestException, ValueError, GraphQLError) as e:
+                if attempt < self.retries:
+                    time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+                    continue
+                raise GraphQLError(f"request to {self.url} failed: {e}") from e
+        raise GraphQLError("unreachable")
+
+    def fetch_menu(self):
+        """Returns the menu items, or NOT_MODIFIED when the server's menuVersion is unchanged."""
+        if self.supports_menu_version:
+            try:
+                if self.menu_version is not None:
+                    if self.execute("query { menuVersion }").get('menuVersion') == self.menu_version:
+                        return NOT_MODIFIED
+                data = self.execute(f"query {{ menuVersion menuItems {{ {MENU_FIELDS} }} }}")
+                self.menu_version = data.get('menuVersion')
+                return self._menu_items(data)
+            except GraphQLError as e:
+                if 'menuVersion' not in str(e):
+                    raise
+                self.supports_menu_version, self.menu_version = False, None
+        return self._menu_items(self.execute(f"query {{ menuItems {{ {MENU_FIELDS} }} }}"))
+
+    @staticmethod
+    def _menu_items(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        items = data.get('menuItems')
+        if not isinstance(items, list):
+            raise GraphQLError("response has no menuItems")
+        return items
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
+
+
+def create_graphql_client(url: str, session: Optional[requests.Session] = None) -> GraphQLClient:
+    return GraphQLClient(url, session=session, connect_timeout=float(os.getenv("GRAPHQL_CONNECT_TIMEOUT", "2")),
+                         read_timeout=float(os.getenv("GRAPHQL_READ_TIMEOUT", "8")), retries=int(os.getenv("GRAPHQL_RETRIES", "2")),
+                         breaker=CircuitBreaker(int(os.getenv("GRAPHQL_BREAKER_THRESHOLD", "5")), float(os.getenv("GRAPHQL_BREAKER_RESET", "30"))))
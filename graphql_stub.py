@@ -0,0 +1,159 @@
+"""Local stand-in for server/index.js that serves the menu queries the chatbot uses.
+
+    python graphql_stub.py --port 4000 --items 5000 --latency-ms 20 --fail-rate 0.05
+
+POST /graphql?location=<id> serves that location's menu: the same items with prices and
+availability varied per location, so multi-location deployments can be exercised locally.
+"""
+import argparse, hashlib, json, random, threading, time, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+BASE_MENU = [
+    ('Margherita Pizza', 'Pizza', 18.99, ['Mozzarella', 'Tomato Sauce', 'Fresh Basil', 'Olive Oil']),
+    ('Pepperoni Pizza', 'Pizza', 20.99, ['Mozzarella', 'Tomato Sauce', 'Pepperoni']),
+    ('Veggie Supreme Pizza', 'Pizza', 19.99, ['Mozzarella', 'Bell Peppers', 'Mushrooms', 'Olives', 'Onions']),
+    ('Spaghetti Carbonara', 'Pasta', 16.99, ['Spaghetti', 'Eggs', 'Pecorino', 'Pancetta', 'Black Pepper']),
+    ('Penne Arrabbiata', 'Pasta', 14.99, ['Penne', 'Tomato Sauce', 'Garlic', 'Chili']),
+    ('Lasagna', 'Pasta', 17.99, ['Pasta Sheets', 'Beef Ragu', 'Bechamel', 'Parmesan']),
+    ('Caesar Salad', 'Salads', 11.99, ['Romaine', 'Parmesan', 'Croutons', 'Caesar Dressing']),
+    ('Greek Salad', 'Salads', 12.99, ['Tomato', 'Cucumber', 'Feta', 'Olives', 'Red Onion']),
+    ('Grilled Salmon', 'Seafood', 24.99, ['Salmon', 'Lemon', 'Herbs']),
+    ('Fish and Chips', 'Seafood', 18.99, ['Cod', 'Fries', 'Tartar Sauce']),
+    ('Beef Burger', 'Main Courses', 15.99, ['Beef Patty', 'Cheddar', 'Lettuce', 'Tomato']),
+    ('Garlic Bread', 'Appetizers', 6.99, ['Bread', 'Garlic', 'Butter', 'Parsley']),
+    ('Chicken Wings', 'Appetizers', 12.99, ['Chicken', 'Buffalo Sauce']),
+    ('Tiramisu', 'Desserts', 8.99, ['Mascarpone', 'Espresso', 'Ladyfingers', 'Cocoa']),
+    ('Chocolate Cake', 'Desserts', 7.99, ['Chocolate', 'Flour', 'Eggs', 'Butter']),
+    ('Coca Cola', 'Beverages', 2.99, []),
+    ('Fresh Orange Juice', 'Beverages', 4.99, ['Orange']),
+    ('Apple Juice Can', 'Beverages', 3.49, ['Apple']),
+    ('Water Bottle', 'Beverages', 1.99, []),
+]
+_ADJECTIVES = ['Rustic', 'Smoky', 'Spicy', 'Creamy', 'Roasted', 'Tuscan', 'Sicilian', 'Herbed', 'Crispy', 'Golden']
+
+
+def synthetic_menu(count: int = len(BASE_MENU), seed: int = 7, unavailable_ratio: float = 0.05) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        name, category, price, ingredients = BASE_MENU[i % len(BASE_MENU)]
+        if i >= len(BASE_MENU):
+            name = f"{_ADJECTIVES[(i // len(BASE_MENU)) % len(_ADJECTIVES)]} {name} {i // (len(BASE_MENU) * len(_ADJECTIVES)) + 1}"
+            price = round(price * rng.uniform(0.8, 1.3), 2)
+        items.append({'id': str(i + 1), 'name': name, 'description': f"House {name.lower()} made fresh daily.",
+                      'price': price, 'category': category, 'available': i < len(BASE_MENU) or rng.random() >= unavailable_ratio,
+                      'ingredients': list(ingredients)})
+    return items
+
+
+class StubGraphQLServer:
+    """Threaded HTTP server answering `menuItems` and `menuVersion` queries, with injectable latency and failures."""
+
+    def __init__(self, items: Optional[List[Dict[str, Any]]] = None, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, fail_rate: float = 0.0, supports_version: bool = True):
+        self.latency, self.fail_rate, self.supports_version = latency, fail_rate, supports_version
+        self.requests = 0
+        self.location_requests: Dict[str, int] = {}
+        self.set_items(items if items is not None else synthetic_menu())
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def set_items(self, items: List[Dict[str, Any]]):
+        self.items = items
+        self.version = hashlib.sha1(json.dumps(items, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        self._locations: Dict[str, Tuple[List[Dict[str, Any]], str]] = {}
+
+    def location_menu(self, location: str) -> Tuple[List[Dict[str, Any]], str]:
+        """(items, version) for one location: prices within -10%..+20% and about 1 in 10 items off, fixed per location."""
+        menu = self._locations.get(location)
+        if menu is None:
+            rng = random.Random(zlib.crc32(location.encode('utf-8')))
+            items = [{**item, 'price': round(item['price'] * rng.uniform(0.9, 1.2), 2), 'available': item['available'] and rng.random() >= 0.1}
+                     for item in self.items]
+            menu = self._locations[location] = (items, hashlib.sha1(json.dumps(items, sort_keys=True).encode('utf-8')).hexdigest()[:12])
+        return menu
+
+    def respond(self, query: str, location: Optional[str] = None):
+        self.requests += 1
+        if location is not None:
+            self.location_requests[location] = self.location_requests.get(location, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            return 503, {'errors': [{'message': 'injected failure'}]}
+        data = {}
+        items, version = self.location_menu(location) if location is not None else (self.items, self.version)
+        if 'menuVersion' in query:
+            if not self.supports_version:
+                return 400, {'errors': [{'message': 'Cannot query field "menuVersion" on type "Query".'}]}
+            data['menuVersion'] = version
+        if 'menuItems' in query:
+            data['menuItems'] = items
+        return 200, {'data': data}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                try:
+                    query = json.loads(body or b'{}').get('query', '')
+                except ValueError:
+                    query = ''
+                location = parse_qs(urlsplit(self.path).query).get('location')
+                status, payload = stub.respond(query, location[0] if location else None)
+                out = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'StubGraphQLServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='graphql-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4000)
+    parser.add_argument('--items', type=int, default=len(BASE_MENU))
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--no-version', action='store_true', help="behave like a server without the menuVersion field")
+    args = parser.parse_args()
+    server = StubGraphQLServer(synthetic_menu(args.items), args.host, args.port, args.latency_ms / 1000.0,
+                               args.fail_rate, not args.no_version)
+    print(f"GraphQL stub with {len(server.items)} items at {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
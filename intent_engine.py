@@ -0,0 +1,141 @@
+import re
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from typing import Dict, FrozenSet, List, Optional, Pattern, Tuple
+
+WORD_TO_NUMBER = {'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'a': '1', 'an': '1'}
+
+# Keyword rules: cue -> phrases. All of them are matched by one combined pattern.
+CUE_PHRASES = {
+    'greeting': ['hi', 'hello', 'hey', 'hiya', 'good morning'],
+    'clear_chat': ['clear chat', 'clear conversation', 'reset chat'],
+    'show_cart': ['show my cart', 'show cart', 'view cart', 'my cart'],
+    'place_order': ['place order', 'checkout', 'order now'],
+    'remove': ['remove', 'delete', 'cancel'],
+    'decrease': ['decrease', 'reduce'],
+    'increase': ['increase', 'add more'],
+    'add': ['add', 'want', 'order'],
+    'order_request': ["i'd like", 'i would like', "i'll have", "i'll take", 'i will have', 'can i get', 'can i have',
+                      'could i get', 'could i have', 'get me', 'give me'],
+}
+
+# Structured rules: (intent kind, cue that gates them, pattern). Run in order on the cleaned message.
+STRUCTURED_RULES = [
+    ('remove_all', 'remove', r'\b(?:remove|delete|cancel)\s+all\s+(?:of\s+)?(?:the\s+)?([a-zA-Z0-9\s]+)(?:\s+from\s+cart)?'),
+    ('decrease', 'remove', r'\b(?:remove|delete)\s+(?:the\s+)?(\d+)\s+quantity\s+of\s+([a-zA-Z\s]+)'),
+    ('decrease', 'remove', r'\b(?:remove|delete)\s+the\s+(\d+)\s+(.+?)(?:\s+from\s+cart)?(?:\s|$)'),
+    ('decrease', 'remove', r'\b(?:remove|delete|cancel)\s+(\d+)\s+(?!quantity\s+of)(.+?)(?:\s*$)'),
+    ('add', 'add', r'\b(?:add)\s+(?!more\b)(\d+)\s+([a-zA-Z\s]+)'),
+    ('add', 'add', r'\bi\s+want\s+(?!(?:to\s+order\s*$))(\d+)\s+(?:of\s+)?([a-zA-Z\s]+)'),
+    ('add', 'add', r'\border\s+(\d+)\s+([a-zA-Z\s]+)'),
+]
+# Intent priority; 'remove_all', 'decrease' and 'add' only win when their item resolves against the menu
+INTENT_ORDER = ['greeting', 'clear_chat', 'show_cart', 'remove_all', 'decrease', 'place_order', 'add']
+
+
+def _compile_cues(cue_phrases: Dict[str, List[str]]) -> Tuple[Pattern, Dict[str, str]]:
+    phrase_to_cue = {phrase: cue for cue, phrases in cue_phrases.items() for phrase in phrases}
+    alternation = '|'.join(re.escape(p) for p in sorted(phrase_to_cue, key=len, reverse=True))
+    return re.compile(r'\b(?:' + alternation + r')\b'), phrase_to_cue
+
+
+_CUE_RE, _PHRASE_TO_CUE = _compile_cues(CUE_PHRASES)
+_RULES = [(kind, cue, re.compile(pattern, re.IGNORECASE)) for kind, cue, pattern in STRUCTURED_RULES]
+_NUMBER_WORD_RE = re.compile(r'\b(?:' + '|'.join(WORD_TO_NUMBER) + r')\b', re.IGNORECASE)
+_PUNCT_RE = re.compile(r'[.,!?]')
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_FILLER_RE = re.compile(r'\b(?:please|plz|now|thanks)\b', re.IGNORECASE)
+_NAME_RE = re.compile(r'^(?:hi|hello|hey)[,!\s]*(?:i\'m\s+|i am\s+)?([A-Za-z][A-Za-z\-]{0,30})', re.IGNORECASE)
+_ADD_ITEMS_RE = re.compile(r'(\d+)\s+(?:more\s+)?([A-Za-z0-9&\'\-\s]+?)(?=(?:\s+(?:and|,|&)\s+\d|\s*$|[.,!?]))', re.IGNORECASE)
+_REMOVE_ITEMS_RES = [re.compile(r'(?:remove|delete|decrease|increase)\s+(\d+)\s+(?:more\s+)?(.+?)(?:\s+by\s+\d+)?(?:\s+and|$)'),
+                     re.compile(r'(?:remove|delete|decrease|increase)\s+(?:more\s+)?(.+?)\s+by\s+(\d+)')]
+
+
+@dataclass(frozen=True)
+class Intent:
+    kind: str
+    item_query: Optional[str] = None
+    quantity: int = 1
+    name: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ParsedMessage:
+    """A message normalized and matched once; every rule-based extractor reads from this."""
+    text: str
+    clean: str
+    numbered: str
+    tokens: Tuple[str, ...]
+    cues: FrozenSet[str]
+    intents: Tuple[Intent, ...] = field(default=())
+
+    def has(self, cue: str) -> bool:
+        return cue in self.cues
+
+    @cached_property
+    def add_items(self) -> List[Dict]:
+        if self.cues & {'remove', 'decrease'}:
+            return []
+        items = []
+        for m in _ADD_ITEMS_RE.finditer(self.numbered):
+            name = m.group(2).strip().rstrip('.,!?')
+            if name:
+                items.append({'name': name, 'quantity': int(m.group(1))})
+        return items
+
+    @cached_property
+    def remove_items(self) -> List[Dict]:
+        if self.has('remove'):
+            operation = 'remove'
+        elif self.has('decrease'):
+            operation = 'decrease'
+        elif self.has('increase'):
+            operation = 'increase'
+        else:
+            return []
+        text = self.numbered.lower()
+        extracted = []
+        for pattern in _REMOVE_ITEMS_RES:
+            for match in pattern.finditer(text):
+                first, second = match.groups()
+                if first.isdigit():
+                    quantity, item_name = int(first), second.strip()
+                elif second.isdigit():
+                    item_name, quantity = first.strip(), int(second)
+                else:
+                    quantity, item_name = 1, first.strip()
+                if item_name:
+                    extracted.append({'name': item_name, 'quantity': quantity, 'operation': operation})
+                    break
+        return extracted
+
+
+def _match_intents(text: str, clean: str, cues: FrozenSet[str]) -> Tuple[Intent, ...]:
+    found = {}
+    if 'greeting' in cues:
+        name_match = _NAME_RE.search(text)
+        found['greeting'] = [Intent('greeting', name=name_match.group(1).strip().capitalize() if name_match else None)]
+    for cue in ('clear_chat', 'show_cart', 'place_order'):
+        if cue in cues:
+            found[cue] = [Intent(cue)]
+    for kind, cue, pattern in _RULES:
+        if cue not in cues:
+            continue
+        match = pattern.search(clean)
+        if not match:
+            continue
+        if kind == 'remove_all':
+            intent = Intent(kind, _FILLER_RE.sub('', match.group(1)).strip())
+        else:
+            intent = Intent(kind, match.groups()[-1].strip(), int(match.groups()[-2]))
+        found.setdefault(kind, []).append(intent)
+    return tuple(intent for kind in INTENT_ORDER for intent in found.get(kind, ()))
+
+
+@lru_cache(maxsize=1024)
+def parse_message(text: str) -> ParsedMessage:
+    text = text or ''
+    clean = _PUNCT_RE.sub('', text.lower()).strip()
+    cues = frozenset(_PHRASE_TO_CUE[m.group(0)] for m in _CUE_RE.finditer(clean))
+    numbered = _NUMBER_WORD_RE.sub(lambda m: WORD_TO_NUMBER[m.group(0).lower()], text)
+    return ParsedMessage(text, clean, numbered, tuple(_TOKEN_RE.findall(clean)), cues, _match_intents(text, clean, cues))
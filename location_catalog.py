@@ -0,0 +1,239 @@
+"""Per-location menus for multi-location deployments, held in an LRU bounded by an estimated memory budget.
+
+Each location gets its own MenuRefresher, snapshot, indexes and system prompt. A location is
+loaded the first time a request names it: from the snapshot saved for it on disk when there is
+one, otherwise by a fetch the request waits for. From then on it refreshes on its own,
+stale-while-revalidate, only while requests keep asking for it. Locations nobody asks for are
+evicted, least recently used first, and come back from disk when they are next needed. Only
+non-empty menus are saved, and at most `max_locations` of them are kept on disk.
+
+A location only takes a place in the LRU once it has a menu. An id whose load finds none is
+dropped and remembered as missing for `missing_ttl` seconds, so made-up ids can neither evict
+real locations nor hold a request up on every retry.
+"""
+import json, os, re, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from menu_refresher import MenuRefresher, MenuSnapshot
+from shared_menu import load_snapshot, publish_snapshot
+
+# Measured with tracemalloc once a location has served requests: items, MenuIndex, entity scanner,
+# trigram matcher, system prompt and cached menu answers come to about 19 bytes per byte of the
+# items' JSON, plus a fixed ~150 KB per menu
+MENU_BYTES_PER_JSON_BYTE = 19
+MENU_FIXED_BYTES = 150 * 1024
+
+_LOCATION_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')  # also a safe file name
+
+
+def valid_location(location_id: Any) -> bool:
+    return isinstance(location_id, str) and bool(_LOCATION_RE.match(location_id))
+
+
+def estimate_menu_bytes(snapshot: MenuSnapshot) -> int:
+    items_json = len(json.dumps(snapshot.items, separators=(',', ':'), ensure_ascii=False))
+    return MENU_FIXED_BYTES + items_json * MENU_BYTES_PER_JSON_BYTE
+
+
+class LocationMenu:
+    """One location: its refresher, the menu data requests read, and the system prompt rendered from it."""
+
+    def __init__(self, location_id: str, catalogs: 'LocationCatalogs'):
+        self.location_id = location_id
+        self.catalogs = catalogs
+        self.refresher = MenuRefresher(catalogs.fetcher(location_id), max_age=catalogs.max_age,
+                                       retry_after=catalogs.retry_after, on_update=self._apply)
+        self.menu_data: Optional[Dict[str, Any]] = None  # same shape as chatbot_service.MENU_DATA_CACHE
+        self.size = 0
+        self.accounted = 0  # bytes of this entry counted in catalogs.bytes_used
+        self.loaded = threading.Event()
+        self._prompt: Optional[Tuple[str, Any]] = None  # (menu version, prompt)
+
+    def _apply(self, snapshot: MenuSnapshot, persist: bool = True):
+        if self.menu_data is None or self.menu_data['version'] != snapshot.version:
+            snapshot.index.warm()  # off the request path
+            self.menu_data = {'items': snapshot.items, 'categories': snapshot.categories, 'index': snapshot.index,
+                              'version': snapshot.version}
+            self.size = estimate_menu_bytes(snapshot)
+            if snapshot.items:  # an empty menu is no location (see LocationCatalogs.get) and evicts none
+                self.catalogs.resized(self)
+        if persist:
+            self.catalogs.persist(self.location_id, snapshot)
+
+    def load(self, timeout: float):
+        try:
+            saved = load_snapshot(self.catalogs.snapshot_path(self.location_id))
+            if saved is not None and self.refresher.seed(saved):
+                self.catalogs.disk_loads += 1
+                self.catalogs.touch(self.location_id)
+                self._apply(saved, persist=False)  # get() revalidates it once it is stale
+            else:
+                self.refresher.refresh_async()
+                self.refresher.wait(timeout)  # at most `timeout` seconds; refresh() would fetch again had it finished
+        finally:
+            self.loaded.set()
+
+    def system_prompt(self, menu_data: Dict[str, Any], build: Callable[[Dict[str, Any]], Any]):
+        """build(menu_data), kept for the latest menu version this location was asked about."""
+        cached = self._prompt
+        if cached is None or cached[0] != menu_data['version']:
+            cached = self._prompt = (menu_data['version'], build(menu_data))
+        return cached[1]
+
+    def stats(self) -> Dict[str, Any]:
+        refresher = self.refresher
+        return {'version': refresher.version, 'age_seconds': round(refresher.age, 1) if refresher.age is not None else None,
+                'items': len(self.menu_data['index']) if self.menu_data else 0, 'bytes': self.size,
+                'refreshing': refresher.refreshing, 'last_error': refresher.last_error}
+
+
+class LocationCatalogs:
+    """location_id -> LocationMenu, least recently used first, within `memory_budget` bytes and `max_locations`.
+
+    `fetch_for(location_id)` returns the fetch function for that location's MenuRefresher. At
+    most `refresh_concurrency` fetches run at once, however many locations go stale together.
+    """
+
+    def __init__(self, fetch_for: Callable[[str], Callable[[], Any]], memory_budget: int = 256 * 1024 * 1024,
+                 max_locations: int = 1000, max_age: float = 300, retry_after: float = 15, load_timeout: float = 10,
+                 snapshot_dir: Optional[str] = None, refresh_concurrency: int = 4, missing_ttl: float = 60):
+        self.fetch_for = fetch_for
+        self.memory_budget, self.max_locations = memory_budget, max_locations
+        self.max_age, self.retry_after, self.load_timeout = max_age, retry_after, load_timeout
+        self.snapshot_dir, self.missing_ttl = snapshot_dir, missing_ttl
+        self.bytes_used = 0
+        self.hits = self.misses = self.evictions = self.disk_loads = self.snapshots_pruned = self.missing_hits = 0
+        self.persist_error: Optional[str] = None
+        self._entries: 'OrderedDict[str, LocationMenu]' = OrderedDict()
+        self._missing: 'OrderedDict[str, float]' = OrderedDict()  # location_id -> when to try loading it again
+        self._lock = threading.Lock()
+        self._fetch_slots = threading.BoundedSemaphore(refresh_concurrency)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def fetcher(self, location_id: str) -> Callable[[], Any]:
+        fetch = self.fetch_for(location_id)
+
+        def limited():
+            with self._fetch_slots:
+                return fetch()
+        return limited
+
+    def snapshot_path(self, location_id: str) -> Optional[str]:
+        return os.path.join(self.snapshot_dir, f"{location_id}.snap") if self.snapshot_dir else None
+
+    def get(self, location_id: str) -> Optional[LocationMenu]:
+        """The location's menu, loading it on first use; None while it has never loaded."""
+        with self._lock:
+            if self._missing.get(location_id, 0) > time.time():
+                self.missing_hits += 1
+                return None
+            entry = self._entries.get(location_id)
+            created = entry is None
+            if created:
+                # Nothing is evicted for it until its menu arrives (see resized)
+                entry = self._entries[location_id] = LocationMenu(location_id, self)
+                self.misses += 1
+            else:
+                self._entries.move_to_end(location_id)
+                self.hits += 1
+        if created:
+            entry.load(self.load_timeout)
+            if not (entry.menu_data and entry.menu_data['items']):
+                self._forget(entry)
+                return None
+        elif not entry.loaded.is_set():
+            entry.loaded.wait(self.load_timeout)  # another request is loading it
+        entry.refresher.get()
+        return entry if entry.menu_data is not None else None
+
+    def _forget(self, entry: LocationMenu):
+        # The load found no menu: drop the entry and skip the id for missing_ttl seconds
+        with self._lock:
+            if self._entries.get(entry.location_id) is entry:
+                del self._entries[entry.location_id]
+                self.bytes_used -= entry.accounted
+            self._missing.pop(entry.location_id, None)
+            self._missing[entry.location_id] = time.time() + self.missing_ttl
+            while len(self._missing) > self.max_locations:
+                self._missing.popitem(last=False)
+
+    def peek(self, location_id: str) -> Optional[LocationMenu]:
+        """The location's entry if it is held, without loading it or marking it used."""
+        return self._entries.get(location_id)
+
+    def resized(self, entry: LocationMenu):
+        with self._lock:
+            if self._entries.get(entry.location_id) is not entry:
+                return  # evicted while its fetch was in flight
+            self.bytes_used += entry.size - entry.accounted
+            entry.accounted = entry.size
+            self._evict(keep=entry)
+
+    def _evict(self, keep: LocationMenu):
+        for location_id in list(self._entries):
+            if self.bytes_used <= self.memory_budget and len(self._entries) <= self.max_locations:
+                return
+            entry = self._entries[location_id]
+            if entry is keep:
+                continue
+            del self._entries[location_id]
+            self.bytes_used -= entry.accounted
+            self.evictions += 1
+
+    def persist(self, location_id: str, snapshot: MenuSnapshot):
+        path = self.snapshot_path(location_id)
+        if not path or not snapshot.items:
+            return  # nothing worth reloading, and any well-formed id that is not a real location fetches this
+        try:
+            new = not os.path.exists(path)
+            publish_snapshot(path, snapshot)
+            if new:
+                self._prune_snapshots()
+            self.persist_error = None
+        except OSError as e:
+            self.persist_error = str(e)
+
+    def touch(self, location_id: str):
+        """Marks the location's snapshot as just used, so pruning keeps it."""
+        try:
+            os.utime(self.snapshot_path(location_id))
+        except (OSError, TypeError):
+            pass
+
+    def _prune_snapshots(self):
+        # Keeps at most max_locations snapshots: the least recently saved or loaded go first,
+        # never one for a location held in memory
+        snapshots = []
+        for name in os.listdir(self.snapshot_dir):
+            if name.endswith('.snap'):
+                try:
+                    snapshots.append((os.path.getmtime(os.path.join(self.snapshot_dir, name)), name[:-len('.snap')]))
+                except OSError:
+                    pass  # pruned by another worker meanwhile
+        excess = len(snapshots) - self.max_locations
+        for _, location_id in sorted(snapshots):
+            if excess <= 0:
+                return
+            if location_id in self._entries:
+                continue
+            try:
+                os.remove(self.snapshot_path(location_id))
+                self.snapshots_pruned += 1
+            except FileNotFoundError:
+                pass
+            excess -= 1
+
+    def stats(self, detail: int = 0) -> Dict[str, Any]:
+        """Totals, plus per-location detail for the `detail` most recently used locations."""
+        with self._lock:
+            recent = list(self._entries.values())[-detail:] if detail else []
+        stats = {'locations': len(self._entries), 'max_locations': self.max_locations, 'bytes_used': self.bytes_used,
+                 'memory_budget': self.memory_budget, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                 'disk_loads': self.disk_loads, 'missing': len(self._missing), 'missing_hits': self.missing_hits, 'snapshot_dir': self.snapshot_dir, 'snapshots_pruned': self.snapshots_pruned,
+                 'persist_error': self.persist_error}
+        if recent:
+            stats['recent'] = {entry.location_id: entry.stats() for entry in reversed(recent)}
+        return stats
@@ -0,0 +1,247 @@
+"""Answers catalog questions (prices, ingredients, vegetarian/vegan, availability, what is in a category)
+straight from the menu index, so they never reach the model.
+
+Only questions are answered here: anything with an ordering or cart cue, or asking for advice
+("what do you recommend"), is left to the other paths. A question whose subject does not resolve
+to a menu item or category, or whose answer the menu data does not hold (no ingredients listed),
+returns None and goes to the model as before.
+"""
+import re, weakref
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from intent_engine import ParsedMessage
+from menu_index import MenuIndex, tokenize
+
+# Question kinds, in the order they are answered when a message matches several
+QUESTION_PATTERNS = [
+    ('diet', r"\b(?:vegetarian|vegan)\b"),
+    ('ingredients', r"\b(?:what'?s in|what is in|what goes in|ingredients?|made (?:with|of|from)|contains?)\b"),
+    ('price', r"\b(?:how much|prices?|costs?|pricing)\b"),
+    ('availability', r"\b(?:available|in stock|sold out|do you (?:still )?(?:have|serve|sell)|have you got|is there|are there)\b"),
+    ('browse', r"\b(?:what|which|show|list|see|options|kinds?|types?|menu)\b"),
+]
+# Messages that ask for judgement rather than facts
+ADVICE_PATTERN = r"\b(?:recommend|suggest|best|favou?rite|popular|should i|go(?:es)? well|pair|good with|healthy|light|comfort\w*)\b"
+# Cues owned by the ordering and cart rules
+NOT_A_QUESTION = frozenset(['greeting', 'clear_chat', 'show_cart', 'place_order', 'remove', 'decrease', 'increase', 'add', 'order_request'])
+# Open-ended descriptions ("anything spicy") are not item names; they stay with the model unless a category or dish is named
+VAGUE_WORDS = frozenset(['anything', 'something', 'any', 'some', 'stuff', 'options'])
+
+QUESTION_WORDS = frozenset("""
+    a an the is are was it its it's this that these those of for in on at to with from and or do does you your we our
+    have has got there here me i my what what's whats which how much many price prices cost costs pricing
+    ingredients ingredient in made contain contains goes go available today tonight still left in stock sold out serve sell
+    vegetarian vegan show list see tell about please can could would kinds kind types type options menu right now
+    anything something any some stuff
+""".split())
+
+CATEGORY_SYNONYMS = {'drink': 'beverages', 'drinks': 'beverages', 'sodas': 'beverages', 'starter': 'appetizers',
+                     'starters': 'appetizers', 'sides': 'appetizers', 'mains': 'main courses', 'entrees': 'main courses',
+                     'sweets': 'desserts', 'fish': 'seafood'}
+
+# Ingredient words that rule an item out; matched against the words of each listed ingredient
+MEAT_AND_FISH = frozenset("""
+    beef chicken pepperoni pancetta bacon ham prosciutto salami sausage chorizo pork lamb turkey veal duck ragu meat
+    meatballs anchovy anchovies caesar salmon cod tuna shrimp prawn prawns fish crab lobster clams mussels calamari squid
+""".split())  # caesar: the dressing is made with anchovies
+ANIMAL_PRODUCTS = MEAT_AND_FISH | frozenset("""
+    mozzarella cheese cheddar parmesan pecorino feta ricotta mascarpone gorgonzola burrata butter cream milk egg eggs
+    bechamel honey yogurt mayonnaise ladyfingers tartar
+""".split())
+DIETS = {'vegetarian': MEAT_AND_FISH, 'vegan': ANIMAL_PRODUCTS}
+
+MAX_LISTED = 8  # items named in a category listing; the menu panel shows the rest
+
+_QUESTION_RES = [(kind, re.compile(pattern)) for kind, pattern in QUESTION_PATTERNS]
+_ADVICE_RE = re.compile(ADVICE_PATTERN)
+
+
+@dataclass(frozen=True)
+class MenuAnswer:
+    kind: str  # 'price' | 'ingredients' | 'diet' | 'availability' | 'browse'
+    response: str
+    action_data: Dict[str, Any]
+
+    def payload(self) -> Dict[str, Any]:
+        return {'response': self.response, 'action_data': {**self.action_data, 'message_type': 'text', 'response_delay': 800},
+                'success': True, 'menu_answer': self.kind}
+
+
+def _price(item: Dict[str, Any]) -> str:
+    return f"${float(item.get('price', 0.0) or 0.0):.2f}"
+
+
+def _join(words: List[str]) -> str:
+    return words[0] if len(words) == 1 else ', '.join(words[:-1]) + ' and ' + words[-1]
+
+
+def _ingredients(item: Dict[str, Any]) -> List[str]:
+    return [str(i).lower() for i in item.get('ingredients') or []]
+
+
+# Per-index results that depend only on the menu (category terms, diet listings), dropped with the index
+_DERIVED: 'weakref.WeakKeyDictionary[MenuIndex, Dict[Any, Any]]' = weakref.WeakKeyDictionary()
+
+
+def _derived(index: MenuIndex, key: Any, build):
+    table = _DERIVED.get(index)
+    if table is None:
+        table = _DERIVED.setdefault(index, {})
+    if key not in table:
+        table[key] = build()
+    return table[key]
+
+
+def _category_terms(index: MenuIndex) -> List[Tuple[str, str]]:
+    return _derived(index, 'category_terms', lambda: sorted(_build_category_terms(index).items(), key=lambda kv: -len(kv[0])))
+
+
+def _build_category_terms(index: MenuIndex) -> Dict[str, str]:
+    """Phrase -> category for every category on the menu, with singular/plural forms and common synonyms."""
+    terms = {}
+    for category in index.categories:
+        lower = category.lower()
+        for term in (lower, lower[:-1] if lower.endswith('s') else lower + 's'):
+            terms.setdefault(term, category)
+    by_lower = {category.lower(): category for category in index.categories}
+    for term, target in CATEGORY_SYNONYMS.items():
+        if target in by_lower:
+            terms.setdefault(term, by_lower[target])
+    return terms
+
+
+def _category(tokens: Tuple[str, ...], index: MenuIndex) -> Tuple[Optional[str], FrozenSet[str]]:
+    """The category the message names, and the words that named it."""
+    padded = f" {' '.join(tokens)} "
+    for term, category in _category_terms(index):  # longest first, so "main courses" is tried before "main course"
+        if f" {term} " in padded:
+            return category, frozenset(term.split())
+    return None, frozenset()
+
+
+def _subject(tokens: Tuple[str, ...]) -> List[str]:
+    return [t for t in tokens if t not in QUESTION_WORDS and not t.isdigit()]
+
+
+def _items(text: str, subject: List[str], index: MenuIndex) -> List[Dict[str, Any]]:
+    mentioned = list({id(m.item): m.item for m in index.scanner.scan(text).items}.values())
+    if mentioned:
+        return mentioned[:4]
+    if not subject:
+        return []
+    item, _ = index.resolve(' '.join(subject))
+    return [item] if item else []
+
+
+def _unavailable(subject: List[str], index: MenuIndex) -> Optional[Dict[str, Any]]:
+    if not subject or len(index.items) == len(index.available):
+        return None
+    phrase = ' '.join(subject)
+    return next((item for item in index.items if not item.get('available', True) and ' '.join(tokenize(item['name'])) == phrase), None)
+
+
+def _item_action(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    category = items[0].get('category')
+    return {'action': 'show_category', 'category': category} if category else {'action': 'show_menu'}
+
+
+def _listing(items: List[Dict[str, Any]], with_prices: bool = True) -> str:
+    names = [f"{item['name']} ({_price(item)})" if with_prices else item['name'] for item in items[:MAX_LISTED]]
+    if len(items) > MAX_LISTED:
+        names.append(f"{len(items) - MAX_LISTED} more in the menu")
+    return _join(names)
+
+
+def _in_category(index: MenuIndex, category: str) -> List[Dict[str, Any]]:
+    return _derived(index, ('category', category), lambda: [item for item in index.available if item.get('category') == category])
+
+
+def _browse(category: Optional[str], index: MenuIndex) -> MenuAnswer:
+    if category is None:
+        return MenuAnswer('browse', f"Here's our menu - we have {_join(index.categories)}.", {'action': 'show_menu'})
+    items = _in_category(index, category)
+    return MenuAnswer('browse', f"Our {category}: {_listing(items)}.", {'action': 'show_category', 'category': category})
+
+
+def _diet_of(item: Dict[str, Any], diet: str) -> Optional[List[str]]:
+    """The listed ingredients that rule the item out for `diet`; None when no ingredients are listed."""
+    ingredients = _ingredients(item)
+    if not ingredients:
+        return None
+    excluded = DIETS[diet]
+    return [i for i in ingredients if excluded.intersection(tokenize(i))]
+
+
+def _answer_diet(diet: str, items: List[Dict[str, Any]], category: Optional[str], index: MenuIndex) -> Optional[MenuAnswer]:
+    if items:
+        lines = []
+        for item in items:
+            offending = _diet_of(item, diet)
+            if offending is None:
+                return None  # nothing to go on; the model can at least say so
+            if offending:
+                lines.append(f"No - the {item['name']} isn't {diet}: it has {_join(offending)}.")
+            else:
+                lines.append(f"Yes - the {item['name']} is {diet} ({_join(_ingredients(item))}).")
+        return MenuAnswer('diet', ' '.join(lines), _item_action(items))
+    pool = _in_category(index, category) if category else index.available
+    fitting = _derived(index, (diet, category), lambda: [item for item in pool if _diet_of(item, diet) == []])
+    action = {'action': 'show_category', 'category': category} if category else {'action': 'show_menu'}
+    if not fitting:
+        where = f"in our {category}" if category else "on our menu"
+        return MenuAnswer('diet', f"I'm afraid nothing {where} is {diet}, going by the listed ingredients.", action)
+    return MenuAnswer('diet', f"Our {diet}{' ' + category if category else ''} options: {_listing(fitting)}.", action)
+
+
+def _answer_item(kind: str, items: List[Dict[str, Any]]) -> Optional[MenuAnswer]:
+    if kind == 'price':
+        prices = [f"{item['name']} is {_price(item)}" for item in items]
+        return MenuAnswer('price', f"The {_join(prices)}.", _item_action(items))
+    if kind == 'ingredients':
+        if not all(_ingredients(item) for item in items):
+            return None
+        lines = [f"The {item['name']} is made with {_join(_ingredients(item))}." for item in items]
+        return MenuAnswer('ingredients', ' '.join(lines), _item_action(items))
+    if kind == 'availability':
+        lines = [f"Yes, the {item['name']} is available - {_price(item)}." for item in items]
+        return MenuAnswer('availability', ' '.join(lines), _item_action(items))
+    return None
+
+
+def answer_menu_question(parsed: ParsedMessage, index: MenuIndex) -> Optional[MenuAnswer]:
+    """A MenuAnswer when the message is a catalog question the menu data can answer, else None."""
+    if parsed.cues & NOT_A_QUESTION or not len(index) or _ADVICE_RE.search(parsed.clean):
+        return None
+    kinds = [kind for kind, pattern in _QUESTION_RES if pattern.search(parsed.clean)]
+    if not kinds:
+        return None
+    category, category_words = _category(parsed.tokens, index)
+    subject = _subject(parsed.tokens)
+    if category is None and VAGUE_WORDS.intersection(parsed.tokens):
+        subject = []  # only items named in full count; "anything spicy" is not a dish
+    about_category = category is not None and set(subject) <= category_words
+    items = [] if about_category else _items(parsed.text, subject, index)
+
+    for kind in kinds:
+        if kind == 'diet':
+            diet = 'vegan' if 'vegan' in parsed.tokens else 'vegetarian'
+            if items or about_category or not subject:
+                return _answer_diet(diet, items, category if about_category else None, index)
+        elif items:
+            answer = _answer_item(kind, items)
+            if answer:
+                return answer
+        elif kind == 'availability' and not about_category:
+            gone = _unavailable(subject, index)
+            if gone:
+                alternatives = _in_category(index, gone.get('category'))[:3]
+                text = f"Sorry, the {gone['name']} isn't available right now."
+                if alternatives:
+                    text += f" You could try the {_join([item['name'] for item in alternatives])}."
+                return MenuAnswer('availability', text, _item_action([gone]))
+        elif about_category and kind in ('price', 'availability', 'browse'):
+            return _browse(category, index)
+        elif kind == 'browse' and not subject and 'menu' in parsed.tokens and index.categories:
+            return _browse(None, index)
+    return None
@@ -0,0 +1,127 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MENU_SYNONYMS = {'apple juice can': 'Apple Juice Can', 'fresh orange juice': 'Fresh Orange Juice',
+                 'water bottle': 'Water Bottle', 'coke': 'Coca Cola', 'pepsi cola': 'Pepsi',
+                 'orange': 'Fresh Orange Juice', 'apple': 'Apple Juice Can'}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_key(text: str) -> str:
+    return text.lower().replace(' ', '')
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class MenuIndex:
+    """Read-only lookup tables over one menu fetch. Built once, then swapped in whole."""
+
+    def __init__(self, items: Iterable[Dict[str, Any]], synonyms: Optional[Dict[str, str]] = None, matcher=None):
+        self.items = list(items)
+        self.available = [item for item in self.items if item.get('available', True)]
+        self.categories = list(dict.fromkeys(item['category'] for item in self.available if item.get('category')))
+        self.by_name: Dict[str, Dict] = {}
+        self.by_key: Dict[str, Dict] = {}
+        self.by_token: Dict[str, List[int]] = {}  # word -> positions in _names of the names containing it
+        self._names = []  # (lowercased name, item) for available items, in menu order
+        for position, item in enumerate(self.available):
+            lower = item['name'].lower()
+            self.by_name.setdefault(lower, item)
+            self.by_key.setdefault(normalize_key(lower), item)
+            self._names.append((lower, item))
+            for token in set(tokenize(lower)):
+                self.by_token.setdefault(token, []).append(position)
+        self.synonyms = {term: self.by_name[target.lower()] for term, target in (synonyms or MENU_SYNONYMS).items()
+                         if target.lower() in self.by_name}
+        self._scanner = None
+        self._matcher = matcher  # may come prebuilt, e.g. attached from a shared snapshot file
+        self._resolved: Dict[str, tuple] = {}
+
+    def __len__(self):
+        return len(self.available)
+
+    @property
+    def names(self) -> List[str]:
+        return [item['name'] for item in self.available]
+
+    @property
+    def scanner(self):
+        # Built on first use; a new snapshot gets a new index and therefore a new automaton
+        if self._scanner is None:
+            from entity_scanner import EntityScanner
+            self._scanner = EntityScanner(self.available, self.synonyms)
+        return self._scanner
+
+    @property
+    def matcher(self):
+        if self._matcher is None:
+            from fuzzy_match import TrigramMatcher
+            self._matcher = TrigramMatcher([(lower, item) for lower, item in self._names] + list(self.synonyms.items()))
+        return self._matcher
+
+    def warm(self) -> 'MenuIndex':
+        """Builds the entity scanner and trigram matcher now, so the first request does not pay for them."""
+        self._scanner, self._matcher = self.scanner, self.matcher
+        return self
+
+    def resolve(self, search_term: str) -> tuple:
+        """(item or None, alternatives): exact passes first, then typo-tolerant matching."""
+        search_term = search_term.lower().strip()
+        result = self._resolved.get(search_term)
+        if result is None:
+            item, ambiguous = self._find(search_term)
+            if item:
+                result = (item, [])
+            elif ambiguous:
+                # Several menu names fit the words given ("pizza"): offer them rather than pick one
+                from fuzzy_match import Candidate, best_similarity
+                candidates = [Candidate(hit, hit['name'].lower(), best_similarity(search_term, hit['name'].lower())) for hit in ambiguous]
+                result = (None, sorted(candidates, key=lambda c: c.score, reverse=True)[:3])
+            else:
+                match, candidates = self.matcher.resolve(search_term) if search_term else (None, [])
+                result = (match.item if match else None, [] if match else candidates)
+            if len(self._resolved) < 4096:
+                self._resolved[search_term] = result
+        return result
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self.by_name.get(name.lower().strip())
+
+    def with_token(self, token: str) -> List[Dict]:
+        return [self._names[position][1] for position in self.by_token.get(token.lower(), ())]
+
+    def find(self, search_term: str) -> Optional[Dict]:
+        return self.resolve(search_term)[0]  # memoized there
+
+    def _find(self, search_term: str) -> Tuple[Optional[Dict], List[Dict]]:
+        """(item, []) for a single match, else (None, the names the words fit when there are several)."""
+        if not search_term:
+            return None, []
+        # Exact match
+        item = self.by_name.get(search_term)
+        if item:
+            return item, []
+        # Partial match on whole words ("cola" is not in "chocolate"); fragments go to the fuzzy pass
+        # Either way round the two share a word, so only names sharing one of the term's words are checked.
+        padded = f" {search_term} "
+        shortlist = set().union(*(self.by_token.get(token, ()) for token in set(tokenize(search_term))))
+        within, around = [], []  # names inside the term ("2 margherita pizza"), names containing it ("pizza")
+        for position in sorted(shortlist):
+            lower, item = self._names[position]
+            if f" {lower} " in padded:
+                within.append((lower, item))
+            elif padded in f" {lower} ":
+                around.append(item)
+        # Of the names inside the term, "caesar salad" gives way to "chicken caesar salad"
+        hits = [item for lower, item in within if not any(lower != other and f" {lower} " in f" {other} " for other, _ in within)] or around
+        if len(hits) == 1:
+            return hits[0], []
+        # Space-normalized match, then synonyms
+        item = self.by_key.get(search_term.replace(' ', '')) or self.synonyms.get(search_term)
+        return (item, []) if item else (None, hits)
+
+
+EMPTY_INDEX = MenuIndex([])
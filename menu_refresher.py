@@ -0,0 +1,135 @@
+import hashlib, json, threading, time
+from typing import Any, Callable, Dict, List, Optional
+
+from graphql_client import NOT_MODIFIED
+from menu_index import MenuIndex
+
+
+def menu_version(items: List[Dict[str, Any]]) -> str:
+    payload = json.dumps(items, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+
+class MenuSnapshot:
+    """One immutable menu fetch together with its index."""
+    __slots__ = ('items', 'index', 'version', 'fetched_at')
+
+    def __init__(self, items: List[Dict[str, Any]], version: Optional[str] = None,
+                 index: Optional[MenuIndex] = None, fetched_at: Optional[float] = None):
+        self.items = items
+        self.index = index or MenuIndex(items)
+        self.version = version or menu_version(items)
+        self.fetched_at = fetched_at or time.time()
+
+    @property
+    def categories(self) -> List[str]:
+        return self.index.categories
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def revalidated(self) -> 'MenuSnapshot':
+        return MenuSnapshot(self.items, self.version, self.index)
+
+
+class MenuRefresher:
+    """Serves the last good snapshot and revalidates it in the background, one fetch at a time.
+
+    `fetch` returns the menu items, NOT_MODIFIED, or None when the fetch failed.
+    """
+
+    def __init__(self, fetch: Callable[[], Any], max_age: float = 300,
+                 retry_after: float = 15, on_update: Optional[Callable[[MenuSnapshot], None]] = None):
+        self.fetch, self.max_age, self.retry_after, self.on_update = fetch, max_age, retry_after, on_update
+        self.snapshot: Optional[MenuSnapshot] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._inflight: Optional[threading.Event] = None
+        self._next_attempt = 0.0
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.snapshot.version if self.snapshot else None
+
+    @property
+    def age(self) -> Optional[float]:
+        return self.snapshot.age if self.snapshot else None
+
+    @property
+    def refreshing(self) -> bool:
+        return self._inflight is not None
+
+    def is_stale(self) -> bool:
+        return self.snapshot is None or self.snapshot.age >= self.max_age
+
+    def seed(self, snapshot: MenuSnapshot) -> bool:
+        """Serves `snapshot`, e.g. one loaded from disk, until a fetch replaces or revalidates it."""
+        with self._lock:
+            if self.snapshot is not None:
+                return False
+            self.snapshot = snapshot
+        return True
+
+    def get(self) -> Optional[MenuSnapshot]:
+        snapshot = self.snapshot
+        if (snapshot is None or snapshot.age >= self.max_age) and time.time() >= self._next_attempt:
+            self.refresh_async()
+        return snapshot
+
+    def refresh_async(self) -> bool:
+        event = self._claim()
+        if event is None:
+            return False
+        threading.Thread(target=self._run, args=(event,), name='menu-refresh', daemon=True).start()
+        return True
+
+    def refresh(self, timeout: Optional[float] = None) -> bool:
+        event = self._claim()
+        if event is None:
+            inflight = self._inflight
+            if inflight is not None:
+                inflight.wait(timeout)
+        else:
+            self._run(event)
+        return self.last_error is None and self.snapshot is not None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the fetch in flight, if any, without starting one."""
+        inflight = self._inflight
+        if inflight is not None:
+            inflight.wait(timeout)
+        return self.last_error is None and self.snapshot is not None
+
+    def _claim(self) -> Optional[threading.Event]:
+        with self._lock:
+            if self._inflight is not None:
+                return None
+            self._inflight = threading.Event()
+            return self._inflight
+
+    def _run(self, event: threading.Event):
+        try:
+            items = self.fetch()
+            if items is None:
+                self.last_error = 'fetch failed'
+                self._next_attempt = time.time() + self.retry_after
+                return
+            current = self.snapshot
+            if items is NOT_MODIFIED and current is None:
+                raise ValueError('server reported an unchanged menu but no snapshot is loaded')
+            version = None if items is NOT_MODIFIED else menu_version(items)
+            if current is not None and (items is NOT_MODIFIED or current.version == version):
+                self.snapshot = current.revalidated()
+            else:
+                self.snapshot = MenuSnapshot(items, version)
+            self.last_error = None
+            if self.on_update:
+                self.on_update(self.snapshot)
+        except Exception as e:
+            self.last_error = str(e)
+            self._next_attempt = time.time() + self.retry_after
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
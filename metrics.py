@@ -0,0 +1,155 @@
+"""Counters, histograms and callback gauges rendered in the Prometheus text exposition format."""
+import bisect, threading, time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in key]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def totals(self, label: str) -> Dict[str, float]:
+        """Values summed over every other label, by the value of `label`."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for key, value in self._values.items():
+                name = dict(key).get(label)
+                if name is not None:
+                    totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.buckets = name, help, tuple(sorted(buckets))
+        self._values: Dict[LabelKey, List] = {}  # key -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[bisect.bisect_left(self.buckets, value)] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        row = self._values.get(_key(labels))
+        return sum(row[:-1]) if row else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, row in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), row[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Reads its value(s) when scraped; `read` returns a number or a {label dict as tuple: number} mapping."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, read: Callable[[], object]):
+        self.name, self.help, self.read = name, help, read
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [f"{self.name}{_format_labels(key)} {_format_value(v)}" for key, v in sorted(value.items())]
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _add(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._add(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        return self._add(Histogram(name, help, buckets or DEFAULT_BUCKETS))
+
+    def gauge(self, name: str, help: str, read: Callable[[], object]) -> Gauge:
+        return self._add(Gauge(name, help, read))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('chatbot_stage_seconds', "Time spent in each /chat pipeline stage.")
+CHAT_REQUESTS = REGISTRY.counter('chatbot_chat_requests_total', "Chat requests by the path that answered them.")
+CHAT_SECONDS = REGISTRY.histogram('chatbot_chat_request_seconds', "End-to-end chat request latency by path.")
+MENU_REFRESHES = REGISTRY.counter('chatbot_menu_refresh_total', "Menu fetches by result.")
+MENU_ANSWERS = REGISTRY.counter('chatbot_menu_answers_total', "Catalog questions answered from the menu data instead of the model, by kind.")
+ORDERS = REGISTRY.counter('chatbot_orders_total', "Checkouts by result: placed, replayed (a retried idempotency key), failed (not saved), empty or no_menu (menu unavailable).")
+LLM_ERRORS = REGISTRY.counter('chatbot_llm_errors_total', "Model calls that raised, by whether they looked like overload.")
+
+
+def stage(name: str):
+    """`with stage('intent_detection'): ...` records the block under chatbot_stage_seconds{stage=...}."""
+    return STAGE_SECONDS.time(stage=name)
@@ -0,0 +1,613 @@
+"""Order placement: collision-free ids, idempotency keys, and a local write-ahead log drained to a downstream sink.
+
+Each process claims a worker slot (a locked file in ORDER_DIR) that goes into every order id it
+issues and names the log segment it alone appends to. Idempotency keys are claimed in a SQLite
+table in the same directory, shared by every worker. A checkout is acknowledged only once its
+record is on disk. Appends are group-committed, so every order that arrives during one fsync
+is made durable by the next one. A drain thread then ships durable records to the sink, at
+least once, and remembers how far it got.
+"""
+import json, os, random, sqlite3, threading, time, zlib
+from datetime import datetime, timezone
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+ORDER_EPOCH_MS = 1_704_067_200_000  # 2024-01-01T00:00:00Z; ids count milliseconds from here
+
+
+class OrderLogError(Exception):
+    pass
+
+
+def format_order_id(value: int) -> str:
+    return f"ORD-{value:016X}"  # fixed width, so ids sort by time as text too
+
+
+def parse_order_id(order_id: str) -> Optional[int]:
+    try:
+        return int(order_id[4:], 16) if order_id.startswith('ORD-') else None
+    except ValueError:
+        return None
+
+
+class OrderIdGenerator:
+    """64-bit ids: milliseconds since ORDER_EPOCH_MS, then the worker slot, then a sequence within the millisecond.
+
+    Ids from one generator never repeat and never go backwards, even when the clock steps back or
+    more than 4096 orders arrive in one millisecond (the next millisecond is borrowed). Processes
+    differ in the slot bits, and claim_worker_slot gives each live process its own slot.
+    """
+    SLOT_BITS, SEQUENCE_BITS = 10, 12
+
+    def __init__(self, slot: int, clock=time.time):
+        if not 0 <= slot < 1 << self.SLOT_BITS:
+            raise ValueError(f"slot must be in [0, {1 << self.SLOT_BITS})")
+        self.slot, self.clock = slot, clock
+        self._last_ms, self._sequence = 0, 0
+        self._lock = threading.Lock()
+
+    def advance_past(self, order_id: str):
+        """Never issue `order_id` or anything before it again, e.g. the last id a previous process wrote to this slot's log."""
+        value = parse_order_id(order_id)
+        if value is not None:
+            with self._lock:
+                last = (value >> (self.SLOT_BITS + self.SEQUENCE_BITS), value & ((1 << self.SEQUENCE_BITS) - 1))
+                self._last_ms, self._sequence = max((self._last_ms, self._sequence), last)
+
+    def next_int(self) -> int:
+        with self._lock:
+            now = int(self.clock() * 1000) - ORDER_EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms, self._sequence = now, 0
+            else:
+                self._sequence += 1
+                if self._sequence >> self.SEQUENCE_BITS:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+            return (self._last_ms << (self.SLOT_BITS + self.SEQUENCE_BITS)) | (self.slot << self.SEQUENCE_BITS) | self._sequence
+
+    def next(self) -> str:
+        return format_order_id(self.next_int())
+
+
+def _slot_lock_path(directory: str, slot: int) -> str:
+    return os.path.join(directory, f"slot-{slot:04d}.lock")
+
+
+def _slot_log_path(directory: str, slot: int) -> str:
+    return os.path.join(directory, f"orders-{slot:04d}.wal")
+
+
+def slot_is_held(directory: str, slot: int) -> bool:
+    """Whether a live process holds `slot`; True when that cannot be told (no advisory locks)."""
+    try:
+        import fcntl
+        handle = open(_slot_lock_path(directory, slot), 'a+', encoding='utf-8')
+    except (ImportError, OSError):
+        return True
+    with handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        return False
+
+
+def claim_worker_slot(directory: str, slots: int = 1 << OrderIdGenerator.SLOT_BITS) -> Tuple[int, Optional[IO]]:
+    """Locks the lowest free slot-NNNN.lock in `directory` for as long as the returned file stays open.
+
+    The lock goes away with the process, however it exits, so a restarted worker takes over its
+    predecessor's slot (and log segment) instead of leaking one.
+    """
+    os.makedirs(directory, exist_ok=True)
+    try:
+        import fcntl
+    except ImportError:  # no advisory locks (Windows): a random slot makes a clash unlikely, not impossible
+        return random.randrange(slots), None
+    for slot in range(slots):
+        handle = open(_slot_lock_path(directory, slot), 'a+', encoding='utf-8')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        return slot, handle
+    raise OrderLogError(f"all {slots} worker slots in {directory} are taken")
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    body = json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return b'%08x ' % zlib.crc32(body) + body + b'\n'
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    if len(line) < 10 or not line.endswith(b'\n') or line[8:9] != b' ':
+        return None
+    body = line[9:-1]
+    try:
+        return json.loads(body) if int(line[:8], 16) == zlib.crc32(body) else None
+    except ValueError:
+        return None
+
+
+def read_records(path: str, start: int = 0, end: Optional[int] = None, limit: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(offset after the record, record) for each intact record from `start`, stopping at `end`, `limit` or the first bad line."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        offset, count = start, 0
+        while (end is None or offset < end) and (limit is None or count < limit):
+            line = f.readline()
+            record = _decode(line)
+            if record is None:
+                return
+            offset += len(line)
+            count += 1
+            yield offset, record
+
+
+class Commit:
+    """Handle for one append; wait() returns once the record is durable and raises if it could not be made so."""
+    __slots__ = ('_event', 'error')
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.error: Optional[BaseException] = None
+
+    def _done(self, error: Optional[BaseException] = None):
+        self.error = error
+        self._event.set()
+
+    def wait(self, timeout: Optional[float] = None):
+        if not self._event.wait(timeout):
+            raise OrderLogError(f"order log commit timed out after {timeout}s")
+        if self.error is not None:
+            raise OrderLogError(f"order log write failed: {self.error}") from self.error
+
+
+class OrderLog:
+    """Append-only log of JSON lines, each prefixed with its CRC32, written by one thread with group commit.
+
+    append() queues a record and returns at once. The writer thread writes everything queued
+    with one write() and one fsync, then completes every Commit in that batch, so throughput
+    grows with the number of concurrent checkouts instead of being capped at one fsync each.
+    `linger` optionally holds a batch open a little longer to gather more. A torn tail left by
+    a crash is cut off on open; no caller was ever told those records were saved. Compaction
+    keeps the last record in `<log>.last`, so `last_record` survives the log being emptied.
+    """
+
+    def __init__(self, path: str, fsync: bool = True, linger: float = 0.0, max_batch: int = 1024):
+        self.path, self.fsync, self.linger, self.max_batch = path, fsync, linger, max_batch
+        self.last_path = path + '.last'
+        self.durable_size, self.last_record = self._recover()
+        self._last_line = _encode(self.last_record) if self.last_record else None
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._queue: List[Tuple[bytes, Commit]] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self.records = self.batches = 0
+        self.fsync_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='order-log', daemon=True)
+        self._thread.start()
+
+    def _recover(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        offset, last = 0, None
+        if os.path.exists(self.path):
+            for offset, last in read_records(self.path):
+                pass
+            if offset < os.path.getsize(self.path):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(offset)
+        if last is None and os.path.exists(self.last_path):
+            for _, last in read_records(self.last_path):  # emptied by compact()
+                pass
+        return offset, last
+
+    def append(self, record: Dict[str, Any]) -> Commit:
+        commit = Commit()
+        line = _encode(record)
+        with self._cond:
+            if self._closed:
+                raise OrderLogError("order log is closed")
+            self._queue.append((line, commit))
+            self._cond.notify()
+        return commit
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+            if self.linger:
+                time.sleep(self.linger)
+            with self._cond:
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            self._write([line for line, _ in batch], [commit for _, commit in batch])
+
+    def _write(self, lines: List[bytes], commits: List[Commit]):
+        data = b''.join(lines)
+        error = None
+        with self._write_lock:
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(self._fd, view):]
+                started = time.perf_counter()
+                if self.fsync:
+                    (getattr(os, 'fdatasync', None) or os.fsync)(self._fd)
+                self.fsync_seconds += time.perf_counter() - started
+                self.durable_size += len(data)
+                self._last_line = lines[-1]
+                self.records += len(lines)
+                self.batches += 1
+            except OSError as e:
+                error = e
+                try:
+                    os.ftruncate(self._fd, self.durable_size)  # drop the partial batch so later records follow intact ones
+                except OSError:
+                    pass
+        for commit in commits:
+            commit._done(error)
+
+    def compact(self, drained: int, before: Optional[Callable[[], None]] = None) -> bool:
+        """Empties the log once everything in it has been shipped (`drained` == its durable size).
+
+        `before` runs first, with appends held off, e.g. to reset the reader's saved offset: a crash
+        in between then ships records twice rather than skipping the ones written after it.
+        """
+        with self._write_lock:
+            if drained != self.durable_size or self._queue:
+                return False
+            if before:
+                before()
+            if self._last_line:
+                self._save_last()
+            os.ftruncate(self._fd, 0)
+            self.durable_size = 0
+            return True
+
+    def _save_last(self):
+        # Written before the log is emptied: the order ids it held must never be issued again after a restart
+        tmp = f"{self.last_path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(self._last_line)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self.last_path)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        os.close(self._fd)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'path': self.path, 'durable_bytes': self.durable_size, 'pending': self.pending, 'records': self.records,
+                'batches': self.batches, 'mean_batch': round(self.records / self.batches, 2) if self.batches else None,
+                'mean_fsync_ms': round(self.fsync_seconds / self.batches * 1000, 3) if self.batches else None}
+
+
+class FileSink:
+    """Appends each order as one JSON line: a local stand-in for a downstream consumer, easy to tail."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, records: List[Dict[str, Any]]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class SQLiteSink:
+    """An orders table keyed by order_id, so a record shipped twice is stored once."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute("CREATE TABLE IF NOT EXISTS orders (order_id TEXT PRIMARY KEY, placed_at TEXT NOT NULL, "
+                             "session_id TEXT, location_id TEXT, total REAL, record TEXT NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def write(self, records: List[Dict[str, Any]]):
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO orders (order_id, placed_at, session_id, location_id, total, record) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             [(r['order_id'], r['placed_at'], r.get('session_id'), r.get('location_id'), r.get('total'),
+                               json.dumps(r, separators=(',', ':'), ensure_ascii=False)) for r in records])
+
+
+def create_order_sink(spec: Optional[str]):
+    """'file:<path>' or 'sqlite:<path>'; empty for none."""
+    if not spec:
+        return None
+    kind, _, path = spec.partition(':')
+    if kind == 'file' and path:
+        return FileSink(path)
+    if kind == 'sqlite' and path:
+        return SQLiteSink(path)
+    raise ValueError(f"ORDER_SINK must be file:<path> or sqlite:<path>, not {spec!r}")
+
+
+class OrderDrain:
+    """Ships durable records from an OrderLog to a sink in the background, keeping its offset in `<log>.offset`.
+
+    Delivery is at least once: a record shipped just before a crash is shipped again after it,
+    so consumers should dedupe on order_id. A failing sink is retried with backoff. Once the
+    log is fully shipped and larger than `compact_bytes`, it is emptied.
+    """
+
+    def __init__(self, log: OrderLog, sink, interval: float = 0.5, batch: int = 500, compact_bytes: int = 64 * 1024 * 1024):
+        self.log, self.sink = log, sink
+        self.interval, self.batch, self.compact_bytes = interval, batch, compact_bytes
+        self.offset_path = log.path + '.offset'
+        self.offset = self._load_offset()
+        self.shipped = self.failures = 0
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_offset(self) -> int:
+        try:
+            with open(self.offset_path, encoding='utf-8') as f:
+                offset = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+        return offset if offset <= self.log.durable_size else 0  # the log was replaced or cut back
+
+    def _rewind(self):
+        self.offset = 0
+        self._save_offset()
+
+    def _save_offset(self):
+        tmp = f"{self.offset_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(self.offset))
+        os.replace(tmp, self.offset_path)
+
+    def drain_once(self) -> int:
+        """Ships up to `batch` records; returns how many."""
+        end = self.log.durable_size
+        if self.offset >= end:
+            if end >= self.compact_bytes:
+                self.log.compact(self.offset, before=self._rewind)
+            return 0
+        shipped = list(read_records(self.log.path, self.offset, end, self.batch))
+        if not shipped:
+            return 0
+        self.sink.write([record for _, record in shipped])
+        self.offset = shipped[-1][0]
+        self._save_offset()
+        self.shipped += len(shipped)
+        return len(shipped)
+
+    def _run(self):
+        backoff = self.interval
+        while not self._stop.is_set():
+            try:
+                if self.drain_once():
+                    backoff = self.interval
+                    continue
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = min(backoff * 2, 30.0)
+                self._stop.wait(backoff)
+                continue
+            self.last_error = None
+            self._stop.wait(self.interval)
+
+    def start(self) -> 'OrderDrain':
+        self._thread = threading.Thread(target=self._run, name='order-drain', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'sink': type(self.sink).__name__, 'offset': self.offset, 'backlog_bytes': self.log.durable_size - self.offset,
+                'shipped': self.shipped, 'failures': self.failures, 'last_error': self.last_error}
+
+
+class IdempotencyKeys:
+    """Idempotency keys in a SQLite table that every worker sharing ORDER_DIR sees.
+
+    A checkout claims its (session_id, key) with one INSERT before its order is logged. The
+    primary key makes that claim atomic across threads and processes, so of two racing retries
+    only one places an order. A claim names the order id and the slot whose log will hold it,
+    and is completed with the order once that log append is durable. Keys are kept for
+    `retention` seconds, independent of any session TTL.
+    """
+
+    def __init__(self, path: str, retention: float = 7 * 86400, fsync: bool = True, purge_every: int = 1000):
+        self.path, self.retention, self.fsync, self.purge_every = path, retention, fsync, purge_every
+        self._local = threading.local()
+        self._write_lock = threading.Lock()  # threads queue here rather than in SQLite's sleeping busy handler
+        self._claims = 0
+        self._conn().execute("CREATE TABLE IF NOT EXISTS idempotency_keys (session_id TEXT NOT NULL, key TEXT NOT NULL, "
+                             "order_id TEXT NOT NULL, slot INTEGER NOT NULL, record TEXT, created_at REAL NOT NULL, "
+                             "PRIMARY KEY (session_id, key))")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def claim(self, session_id: str, key: str, order_id: str, slot: int) -> bool:
+        """True when this call now owns the key; False when it was claimed before."""
+        with self._write_lock:
+            claimed = self._conn().execute("INSERT OR IGNORE INTO idempotency_keys (session_id, key, order_id, slot, created_at) "
+                                           "VALUES (?, ?, ?, ?, ?)", (session_id, key, order_id, slot, time.time())).rowcount == 1
+        self._claims += claimed
+        if claimed and self._claims % self.purge_every == 0:
+            self.purge()
+        return claimed
+
+    def get(self, session_id: str, key: str) -> Optional[Tuple[str, int, Optional[Dict[str, Any]]]]:
+        """(order_id, slot, order or None while it is still being placed) for a claimed key."""
+        row = self._conn().execute("SELECT order_id, slot, record FROM idempotency_keys WHERE session_id = ? AND key = ?",
+                                   (session_id, key)).fetchone()
+        return (row[0], row[1], json.loads(row[2]) if row[2] else None) if row else None
+
+    def complete(self, order: Dict[str, Any]):
+        conn = self._conn()
+        with self._write_lock:
+            if self.fsync:  # once the customer is told, the key must outlive a power cut as the order does
+                conn.execute("PRAGMA synchronous=FULL")
+            try:
+                conn.execute("UPDATE idempotency_keys SET record = ? WHERE session_id = ? AND key = ? AND order_id = ?",
+                             (json.dumps(order, separators=(',', ':'), ensure_ascii=False), order['session_id'],
+                              order['idempotency_key'], order['order_id']))
+            finally:
+                if self.fsync:
+                    conn.execute("PRAGMA synchronous=NORMAL")
+
+    def release(self, session_id: str, key: str, order_id: str):
+        """Drops a claim whose order was never logged, so a retry can place it."""
+        with self._write_lock:
+            self._conn().execute("DELETE FROM idempotency_keys WHERE session_id = ? AND key = ? AND order_id = ? AND record IS NULL",
+                                 (session_id, key, order_id))
+
+    def pending(self, slot: int) -> List[Tuple[str, str, str]]:
+        return self._conn().execute("SELECT session_id, key, order_id FROM idempotency_keys WHERE slot = ? AND record IS NULL",
+                                    (slot,)).fetchall()
+
+    def settle(self, directory: str, slot: int, claims: List[Tuple[str, str, str]]):
+        """Resolves claims a dead process left on `slot` from its log: completed if the order is there, else released."""
+        if not claims:
+            return
+        wanted = {order_id: (session_id, key) for session_id, key, order_id in claims}
+        path = _slot_log_path(directory, slot)
+        if os.path.exists(path):
+            for _, record in read_records(path):
+                if record.get('order_id') in wanted and record.get('idempotency_key'):
+                    self.complete(record)
+        for session_id, key, order_id in claims:
+            self.release(session_id, key, order_id)
+
+    def purge(self):
+        self._conn().execute("DELETE FROM idempotency_keys WHERE created_at < ? AND record IS NOT NULL",
+                             (time.time() - self.retention,))
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0]
+
+
+class OrderBook:
+    """Places orders: a new id, an idempotency claim, and a durable log append before anyone is told it worked.
+
+    The key also goes into the logged record, so downstream can still dedupe the rare retry that
+    races a power cut.
+    """
+
+    def __init__(self, directory: str, fsync: bool = True, linger: float = 0.0, commit_timeout: float = 5.0, sink=None,
+                 drain_interval: float = 0.5, compact_bytes: int = 64 * 1024 * 1024, key_retention: float = 7 * 86400):
+        self.directory, self.commit_timeout = directory, commit_timeout
+        self.slot, self._slot_lock = claim_worker_slot(directory)
+        self.log = OrderLog(_slot_log_path(directory, self.slot), fsync=fsync, linger=linger)
+        self.ids = OrderIdGenerator(self.slot)
+        if self.log.last_record:
+            self.ids.advance_past(self.log.last_record.get('order_id', ''))
+        self.keys = IdempotencyKeys(os.path.join(directory, 'idempotency.db'), retention=key_retention, fsync=fsync)
+        self.keys.settle(directory, self.slot, self.keys.pending(self.slot))  # claims the previous holder of this slot left
+        self.drain = OrderDrain(self.log, sink, drain_interval, compact_bytes=compact_bytes).start() if sink else None
+        self.placed = self.replayed = 0
+
+    def replay(self, session_id: str, idempotency_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The order already placed under this key, if any; a key whose order is still being placed waits for it."""
+        if not idempotency_key:
+            return None
+        deadline = time.monotonic() + self.commit_timeout
+        while True:
+            claim = self.keys.get(session_id, idempotency_key)
+            if claim is None:
+                return None
+            order_id, slot, order = claim
+            if order is not None:
+                self.replayed += 1
+                return order
+            if slot != self.slot and not slot_is_held(self.directory, slot):
+                self.keys.settle(self.directory, slot, [(session_id, idempotency_key, order_id)])
+                continue
+            if time.monotonic() > deadline:
+                raise OrderLogError("an order with this idempotency key is still being placed")
+            time.sleep(0.01)
+
+    def place(self, session_id: str, idempotency_key: Optional[str], fields: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Logs a new order and waits until it is durable; returns (order, replayed).
+
+        When the key was claimed first, by this or another worker, that order is returned instead
+        and nothing is logged. Raises OrderLogError when the order could not be saved.
+        """
+        order = {'order_id': self.ids.next(), 'placed_at': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                 'session_id': session_id, 'idempotency_key': idempotency_key, **fields}
+        while idempotency_key and not self.keys.claim(session_id, idempotency_key, order['order_id'], self.slot):
+            existing = self.replay(session_id, idempotency_key)
+            if existing is not None:
+                return existing, True
+        try:
+            commit = self.log.append(order)
+        except OrderLogError:
+            if idempotency_key:
+                self.keys.release(session_id, idempotency_key, order['order_id'])
+            raise
+        try:
+            commit.wait(self.commit_timeout)
+        except OrderLogError:
+            if idempotency_key:  # a timed-out append may still land, so the claim is settled once the write has
+                threading.Thread(target=self._settle_claim, args=(commit, order), name='order-claim', daemon=True).start()
+            raise
+        if idempotency_key:
+            self.keys.complete(order)
+        self.placed += 1
+        return order, False
+
+    def _settle_claim(self, commit: Commit, order: Dict[str, Any]):
+        try:
+            commit.wait()
+        except OrderLogError:
+            self.keys.release(order['session_id'], order['idempotency_key'], order['order_id'])
+        else:
+            self.keys.complete(order)
+
+    def close(self):
+        if self.drain:
+            self.drain.stop()
+        self.log.close()
+        if self._slot_lock:
+            self._slot_lock.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'slot': self.slot, 'placed': self.placed, 'replayed': self.replayed, 'log': self.log.stats(),
+                'drain': self.drain.stats() if self.drain else None}
+
+
+def create_order_book() -> OrderBook:
+    return OrderBook(os.getenv("ORDER_DIR", "orders"), fsync=os.getenv("ORDER_FSYNC", "1") != "0",
+                     linger=float(os.getenv("ORDER_COMMIT_LINGER_MS", "0")) / 1000,
+                     commit_timeout=float(os.getenv("ORDER_COMMIT_TIMEOUT", "5")),
+                     sink=create_order_sink(os.getenv("ORDER_SINK", "")),
+                     drain_interval=float(os.getenv("ORDER_DRAIN_INTERVAL", "0.5")),
+                     compact_bytes=int(float(os.getenv("ORDER_COMPACT_MB", "64")) * 1024 * 1024),
+                     key_retention=float(os.getenv("ORDER_KEY_RETENTION_HOURS", "168")) * 3600)
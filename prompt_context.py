@@ -0,0 +1,142 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from session_store import History
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+_MESSAGE_TOKENS = 4       # per-message framing the chat format adds around each role/content pair
+_SUMMARY_SNIPPET = 60     # characters kept from each dropped customer message
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken when its encoding is available, otherwise estimates ~4 characters per token."""
+
+    def __init__(self, encoding: str = os.getenv("PROMPT_TOKEN_ENCODING", "o200k_base")):
+        self.encoding_name = encoding
+        self._encoding = None
+        self._loaded = False
+
+    @property
+    def exact(self) -> bool:
+        return self._load() is not None
+
+    def _load(self):
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception:
+                self._encoding = None  # not installed, or the encoding file cannot be downloaded
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        encoding = self._load()
+        if encoding is not None:
+            return len(encoding.encode(text))
+        return (len(text) + 3) // 4
+
+    def count_messages(self, messages: History) -> int:
+        return sum(self.count(content) + _MESSAGE_TOKENS for _, content in messages)
+
+
+def summarize_cart(cart_items: Optional[List[Dict[str, Any]]]) -> str:
+    """One short line instead of the cart JSON: quantities, names and the running total."""
+    if not cart_items:
+        return "Cart is empty."
+    parts, total = [], 0.0
+    for item in cart_items:
+        quantity = int(item.get('quantity', 1) or 1)
+        parts.append(f"{quantity}x {item.get('name', 'item')}")
+        try:
+            total += float(item.get('price', 0) or 0) * quantity
+        except (TypeError, ValueError):
+            pass
+    return f"Cart: {', '.join(parts)}" + (f" (total ${total:.2f})." if total else ".")
+
+
+@dataclass
+class PromptContext:
+    messages: History                  # what is sent to the model: system prompt, kept history, this turn
+    history: History                   # full history plus this turn's raw user message, for the session store
+    tokens: int
+    system_tokens: int
+    dropped_messages: int = 0
+    summarized: bool = False
+    budget: int = PROMPT_TOKEN_BUDGET
+    details: Dict[str, Any] = field(default_factory=dict)
+    cache_key: Optional[tuple] = None  # response-cache key, set by the caller when the turn is cacheable
+    cache_store: bool = False          # whether this turn's answer may be stored under cache_key
+
+    def report(self) -> Dict[str, Any]:
+        return {'prompt_tokens': self.tokens, 'system_tokens': self.system_tokens, 'budget': self.budget,
+                'history_messages': len(self.messages) - 2 - self.summarized,
+                'dropped_messages': self.dropped_messages, 'summarized': self.summarized, **self.details}
+
+
+class PromptBuilder:
+    """Assembles the model input under a token budget.
+
+    The system prompt is rendered once per menu version. History is kept newest-first in
+    human/ai pairs; turns that no longer fit are folded into a one-line summary if there is
+    room for it, and dropped otherwise.
+    """
+
+    def __init__(self, budget: int = PROMPT_TOKEN_BUDGET, counter: Optional[TokenCounter] = None, max_prompts: int = 4):
+        self.budget = budget
+        self.counter = counter or TokenCounter()
+        self.max_prompts = max_prompts
+        self._prompts: Dict[Any, Tuple[str, int]] = {}
+
+    def measure(self, prompt: str) -> Tuple[str, int]:
+        """(prompt, tokens) as system_prompt returns it, for callers that cache prompts themselves."""
+        return prompt, self.counter.count(prompt) + _MESSAGE_TOKENS
+
+    def system_prompt(self, version: Any, render: Callable[[], str]) -> Tuple[str, int]:
+        cached = self._prompts.get(version)
+        if cached is None:
+            cached = self.measure(render())
+            if len(self._prompts) >= self.max_prompts:
+                self._prompts.pop(next(iter(self._prompts)))
+            self._prompts[version] = cached
+        return cached
+
+    def build(self, system: Tuple[str, int], history: History, user_message: str, cart_items=None) -> PromptContext:
+        prompt, system_tokens = system
+        turn = ['human', f"{user_message}\n{summarize_cart(cart_items)}"]
+        used = system_tokens + self.counter.count_messages([turn])
+
+        kept: History = []
+        i = len(history)
+        while i > 0:
+            start = i - 2 if i >= 2 and history[i - 2][0] == 'human' else i - 1
+            cost = self.counter.count_messages(history[start:i])
+            if used + cost > self.budget:
+                break
+            kept[:0] = history[start:i]
+            used += cost
+            i = start
+
+        messages: History = [['system', prompt]]
+        summarized = False
+        if i > 0:
+            summary = self._summary(history[:i], self.budget - used)
+            if summary:
+                messages.append(['system', summary])
+                used += self.counter.count_messages([messages[-1]])
+                summarized = True
+        messages += kept + [turn]
+        return PromptContext(messages, history + [['human', user_message]], used, system_tokens, i, summarized, self.budget,
+                             {'exact_count': self.counter.exact})
+
+    def _summary(self, dropped: History, room: int) -> Optional[str]:
+        said = [content[:_SUMMARY_SNIPPET].strip() for role, content in dropped if role == 'human' and content.strip()]
+        while said:
+            summary = "Earlier in this conversation the customer said: " + '; '.join(f'"{s}"' for s in said)
+            if self.counter.count(summary) + _MESSAGE_TOKENS <= room:
+                return summary
+            said.pop(0)  # keep the most recent ones
+        return None
@@ -0,0 +1,98 @@
+import copy, hashlib, os, threading, time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from intent_engine import ParsedMessage
+
+# Words that tie a message to this customer or to earlier turns; such messages are never cached
+PERSONAL_WORDS = frozenset(['my', 'me', 'mine', 'myself', 'im', 'name', 'called', 'it', 'that', 'this', 'those',
+                            'them', 'again', 'earlier', 'previous', 'before', 'last', 'same', 'instead', 'yes', 'no'])
+# Words that make the answer depend on the cart, so the cart becomes part of the key
+CART_WORDS = frozenset(['cart', 'total', 'bill', 'order', 'ordered', 'checkout', 'pay', 'much', 'cost', 'costs'])
+FILLER_WORDS = frozenset(['please', 'pls', 'hey', 'hi', 'hello', 'thanks', 'thank', 'you', 'the', 'a', 'an', 'do', 'does'])
+MAX_CACHEABLE_LENGTH = 200
+
+
+def normalize_query(tokens: Iterable[str]) -> str:
+    return ' '.join(token for token in tokens if token not in FILLER_WORDS)
+
+
+def cart_fingerprint(cart_items: Optional[List[Dict[str, Any]]]) -> str:
+    if not cart_items:
+        return 'empty'
+    lines = sorted(f"{item.get('name', '')}:{item.get('quantity', 1)}" for item in cart_items)
+    return hashlib.sha1('|'.join(lines).encode('utf-8')).hexdigest()[:12]
+
+
+class ResponseCache:
+    """LRU + TTL cache of finished LLM payloads for self-contained, impersonal questions.
+
+    Keys combine the normalized message, the menu version and, when the question is about
+    the cart, a cart fingerprint. Entries are only stored from turns the model answered
+    without any session history, so nothing learned about one customer is served to another.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 600):
+        self.max_entries, self.ttl = max_entries, ttl
+        self.hits = self.misses = self.stores = self.evictions = 0
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()  # key -> (payload, stored_at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key_for(self, parsed: ParsedMessage, emotional_state: Dict[str, str], menu_version: Any, cart_items=None) -> Optional[tuple]:
+        """The cache key for a message, or None when the message must go to the model."""
+        if len(parsed.text) > MAX_CACHEABLE_LENGTH or emotional_state.get('emotion', 'neutral') != 'neutral':
+            return None
+        tokens = set(parsed.tokens)
+        if tokens & PERSONAL_WORDS or any(intent.name for intent in parsed.intents):
+            return None
+        query = normalize_query(parsed.tokens)
+        if not query:
+            return None
+        cart = cart_fingerprint(cart_items) if tokens & CART_WORDS else None
+        return (query, menu_version, cart)
+
+    def get(self, key: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[0])
+
+    def put(self, key: Optional[tuple], payload: Dict[str, Any]):
+        if key is None or not payload.get('success'):
+            return
+        with self._lock:
+            self._entries[key] = (copy.deepcopy(payload), time.time())
+            self._entries.move_to_end(key)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {'entries': len(self), 'max_entries': self.max_entries, 'ttl_seconds': self.ttl, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'stores': self.stores, 'evictions': self.evictions}
+
+
+def create_response_cache() -> ResponseCache:
+    return ResponseCache(max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "2048")),
+                         ttl=float(os.getenv("RESPONSE_CACHE_TTL", "600")))
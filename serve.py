@@ -0,0 +1,62 @@
+"""Production serving: several uvicorn workers sharing one menu snapshot.
+
+    python serve.py --workers 4 --port 5000
+
+This process fetches the menu from GraphQL and publishes it, with its indexes, to a
+memory-mapped file (see shared_menu.py), starting from the copy saved on disk by the last
+run. The workers run chatbot_asgi:app with MENU_SHARED_PATH set, attach to that file instead
+of fetching the menu themselves, and pick up each new version as it is published.
+
+LLM_RPM, LLM_TPM, LLM_MAX_CONCURRENCY and LLM_MAX_QUEUE are totals for the whole server: each
+worker is started with its share, so adding workers does not multiply what reaches the model.
+"""
+import argparse, logging, os
+
+import uvicorn
+from dotenv import load_dotenv
+
+from admission import worker_budgets
+from graphql_client import GraphQLError, create_graphql_client
+from shared_menu import MenuPublisher, default_snapshot_path
+from structured_log import get_logger, log_event, start_logging
+
+LOG = get_logger('serve')
+
+
+def main():
+    load_dotenv()
+    start_logging()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument('--port', type=int, default=int(os.getenv("PORT", "5000")))
+    parser.add_argument('--workers', type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument('--snapshot-path', default=os.getenv("MENU_SHARED_PATH"),
+                        help="where to publish the menu snapshot (default: /dev/shm, else the temp dir)")
+    args = parser.parse_args()
+
+    path = args.snapshot_path or default_snapshot_path(args.port)
+    graphql_url = os.getenv("GRAPHQL_URL", "http://localhost:4000/graphql")
+    client = create_graphql_client(graphql_url)
+
+    def fetch():
+        try:
+            return client.fetch_menu()
+        except GraphQLError as e:
+            log_event(LOG, 'menu_fetch_failed', logging.WARNING, error=str(e), circuit=client.breaker.state)
+            raise
+
+    publisher = MenuPublisher(fetch, path, max_age=int(os.getenv("MENU_CACHE_DURATION", "300")),
+                              persist_path=os.getenv("MENU_SNAPSHOT_PATH", "menu_snapshot.snap") or None).start()
+    # Workers are spawned after this and inherit it, so they follow the file instead of fetching
+    os.environ['MENU_SHARED_PATH'] = path
+    budgets = worker_budgets(max(1, args.workers))
+    os.environ.update(budgets)  # each worker's share of the server-wide model budgets
+    log_event(LOG, 'serving', workers=args.workers, port=args.port, snapshot=path, graphql_url=graphql_url, worker_budgets=budgets)
+    try:
+        uvicorn.run('chatbot_asgi:app', host=args.host, port=args.port, workers=args.workers)
+    finally:
+        publisher.stop()
+
+
+if __name__ == '__main__':
+    main()
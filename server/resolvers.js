@@ -1,8 +1,13 @@
+import { createHash } from 'crypto';
 import { menuItems, restaurantData, reservations, contactMessages } from './data.js';
 
+// Content hash of the menu so clients can skip re-downloading an unchanged menu
+const menuVersion = () => createHash('sha1').update(JSON.stringify(menuItems)).digest('hex').slice(0, 12);
+
 export const resolvers = {
   Query: {
     menuItems: () => menuItems,
+    menuVersion: () => menuVersion(),
     menuItem: (parent, { id }) => menuItems.find(item => item.id === id),
     menuItemsByCategory: (parent, { category }) => 
       menuItems.filter(item => item.category.toLowerCase() === category.toLowerCase()),
@@ -69,6 +69,7 @@ export const typeDefs = gql`
 
   type Query {
     menuItems: [MenuItem!]!
+    menuVersion: String!
     menuItem(id: ID!): MenuItem
     menuItemsByCategory(category: String!): [MenuItem!]!
     restaurant: Restaurant!
@@ -0,0 +1,212 @@
+import json, os, re, sqlite3, threading, time, zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# A conversation is a list of [role, content] pairs, role being 'system', 'human' or 'ai'.
+# The pairs are a message-like format the chat model accepts directly.
+History = List[List[str]]
+
+_MESSAGE_OVERHEAD = 64  # rough per-message bookkeeping cost when estimating memory use
+
+
+def encode_history(history: History) -> bytes:
+    return zlib.compress(json.dumps(history, separators=(',', ':'), ensure_ascii=False).encode('utf-8'), 6)
+
+
+def decode_history(blob: bytes) -> History:
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def history_size(history: History) -> int:
+    return sum(len(content) + _MESSAGE_OVERHEAD for _, content in history)
+
+
+class SessionStore(ABC):
+    """Conversation storage keyed by session_id, with LRU and idle-TTL eviction."""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 3600):
+        self.max_sessions, self.ttl = max_sessions, ttl
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[History]: ...
+
+    @abstractmethod
+    def put(self, session_id: str, history: History): ...
+
+    @abstractmethod
+    def compare_and_put(self, session_id: str, expected: Optional[History], history: History) -> bool:
+        """Writes `history` only if the stored entry is still `expected` (None: no entry); False otherwise."""
+
+    @abstractmethod
+    def delete(self, session_id: str): ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': type(self).__name__, 'sessions': len(self), 'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl, 'evictions': self.evictions}
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store bounded by session count, idle time and an estimated memory budget."""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 3600, memory_budget: int = 64 * 1024 * 1024):
+        super().__init__(max_sessions, ttl)
+        self.memory_budget = memory_budget
+        self.bytes_used = 0
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # session_id -> (history, size, last_access)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, session_id: str) -> Optional[History]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            history, size, last_access = entry
+            if time.time() - last_access > self.ttl:
+                self._drop(session_id)
+                return None
+            self._entries[session_id] = (history, size, time.time())
+            self._entries.move_to_end(session_id)
+            return history
+
+    def put(self, session_id: str, history: History):
+        with self._lock:
+            self._put(session_id, history)
+
+    def compare_and_put(self, session_id: str, expected: Optional[History], history: History) -> bool:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            current = entry[0] if entry and time.time() - entry[2] <= self.ttl else None
+            if current != expected:
+                return False
+            self._put(session_id, history)
+            return True
+
+    def _put(self, session_id: str, history: History):
+        size = history_size(history)
+        if session_id in self._entries:
+            self._drop(session_id, evicted=False)
+        self._entries[session_id] = (history, size, time.time())
+        self.bytes_used += size
+        self._evict()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._entries:
+                self._drop(session_id, evicted=False)
+
+    def _drop(self, session_id: str, evicted: bool = True):
+        _, size, _ = self._entries.pop(session_id)
+        self.bytes_used -= size
+        self.evictions += evicted
+
+    def _evict(self):
+        now = time.time()
+        while len(self._entries) > 1:  # the session just written always stays
+            oldest_id, (_, _, last_access) = next(iter(self._entries.items()))
+            over = len(self._entries) > self.max_sessions or self.bytes_used > self.memory_budget
+            if not over and now - last_access <= self.ttl:
+                break
+            self._drop(oldest_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), 'bytes_used': self.bytes_used, 'memory_budget': self.memory_budget}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Local SQLite store that several worker processes on one host can share.
+
+    Each store keeps its rows in a table of its own, named by `table`, so stores sharing one
+    database file cannot read or overwrite each other's entries whatever the session_id.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 100000, ttl: float = 3600, purge_every: int = 200, table: str = 'sessions'):
+        super().__init__(max_sessions, ttl)
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', table):
+            raise ValueError(f"table must be a plain SQL identifier, not {table!r}")
+        self.path, self.purge_every, self.table = path, purge_every, table
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (session_id TEXT PRIMARY KEY, history BLOB NOT NULL, "
+                         "updated_at REAL NOT NULL)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_updated_at ON {table} (updated_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get(self, session_id: str) -> Optional[History]:
+        row = self._conn().execute(f"SELECT history, updated_at FROM {self.table} WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.ttl:
+            self.delete(session_id)
+            return None
+        return decode_history(row[0])
+
+    def put(self, session_id: str, history: History):
+        self._conn().execute(f"INSERT OR REPLACE INTO {self.table} (session_id, history, updated_at) VALUES (?, ?, ?)",
+                             (session_id, encode_history(history), time.time()))
+        self._wrote()
+
+    def compare_and_put(self, session_id: str, expected: Optional[History], history: History) -> bool:
+        # One statement each way, so the check and the write are atomic across processes. The stored blob
+        # is compared with `expected` re-encoded, which encode_history reproduces byte for byte.
+        if expected is None:
+            written = self._conn().execute(f"INSERT OR IGNORE INTO {self.table} (session_id, history, updated_at) VALUES (?, ?, ?)",
+                                           (session_id, encode_history(history), time.time())).rowcount
+        else:
+            written = self._conn().execute(f"UPDATE {self.table} SET history = ?, updated_at = ? WHERE session_id = ? AND history = ?",
+                                           (encode_history(history), time.time(), session_id, encode_history(expected))).rowcount
+        if written != 1:
+            return False
+        self._wrote()
+        return True
+
+    def _wrote(self):
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def delete(self, session_id: str):
+        self._conn().execute(f"DELETE FROM {self.table} WHERE session_id = ?", (session_id,))
+
+    def purge(self):
+        conn = self._conn()
+        removed = conn.execute(f"DELETE FROM {self.table} WHERE updated_at < ?", (time.time() - self.ttl,)).rowcount
+        removed += conn.execute(f"DELETE FROM {self.table} WHERE session_id IN (SELECT session_id FROM {self.table} "
+                                "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)", (self.max_sessions,)).rowcount
+        self.evictions += max(removed, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), 'path': self.path, 'table': self.table}
+
+
+def create_session_store(namespace: str = 'sessions') -> SessionStore:
+    """A store for one kind of record; with the SQLite backend `namespace` names its table in SESSION_DB_PATH."""
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    ttl = float(os.getenv("SESSION_TTL", "3600"))
+    if backend == 'sqlite':
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "chat_sessions.db"),
+                                  max_sessions=int(os.getenv("SESSION_MAX", "100000")), ttl=ttl, table=namespace)
+    return MemorySessionStore(max_sessions=int(os.getenv("SESSION_MAX", "10000")), ttl=ttl,
+                              memory_budget=int(float(os.getenv("SESSION_MEMORY_BUDGET_MB", "64")) * 1024 * 1024))
@@ -0,0 +1,260 @@
+"""Menu snapshots in a compact memory-mapped file format: shared between worker processes, and kept on disk for restarts.
+
+One process (serve.py's supervisor) fetches the menu and writes it, together with its trigram
+index, to a file, normally on /dev/shm. Workers map the file read-only. Only the trigram posting
+lists, the largest table, are used in place from the shared pages. Each worker still decodes
+the item records and builds the rest of MenuIndex (name, key and token tables, and the entity
+scanner when warmed) in its own memory, as a plain fetch would. What sharing saves is one
+GraphQL fetch per worker and the trigram build. A new
+version is written beside the old one and renamed over it, so a worker sees either the old
+file or the new one, never a partial write, and keeps its mapping of the old one until it
+has attached the new.
+
+The same format is what a single process persists after every successful fetch and loads on
+startup or during a GraphQL outage (load_snapshot), so a cold start can serve the real menu
+before the network answers.
+"""
+import json, logging, mmap, os, struct, tempfile, threading, time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fuzzy_match import TrigramMatcher
+from menu_index import MenuIndex
+from menu_refresher import MenuRefresher, MenuSnapshot
+from structured_log import get_logger, log_event
+
+LOG = get_logger('shared_menu')
+
+MAGIC = b'CHMENU01'
+# magic, menu version, fetched_at, then (offset, length) of the items, the index metadata and the postings
+_HEADER = struct.Struct('<8s16sd6Q')
+
+
+def default_snapshot_path(port: int = 5000) -> str:
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, f"chatbot-menu-{port}.snap")
+
+
+def encode_snapshot(snapshot: MenuSnapshot) -> bytes:
+    items = snapshot.items
+    position = {id(item): i for i, item in enumerate(items)}
+    aliases, postings = snapshot.index.matcher.tables()
+    ids, grams = array('I'), {}
+    for gram, alias_ids in postings.items():
+        grams[gram] = (len(ids), len(alias_ids))
+        ids.extend(alias_ids)
+    meta = {'aliases': [(alias, position[id(item)], size) for alias, item, size in aliases], 'grams': grams}
+
+    items_blob = json.dumps(items, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    meta_blob = json.dumps(meta, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    items_off = _HEADER.size
+    meta_off = items_off + len(items_blob)
+    postings_off = -(-(meta_off + len(meta_blob)) // 8) * 8  # aligned, so the ids can be cast in place
+    postings_blob = ids.tobytes()
+    header = _HEADER.pack(MAGIC, snapshot.version.encode('ascii')[:16], snapshot.fetched_at, items_off, len(items_blob),
+                          meta_off, len(meta_blob), postings_off, len(postings_blob))
+    return b''.join([header, items_blob, meta_blob, b'\0' * (postings_off - meta_off - len(meta_blob)), postings_blob])
+
+
+def publish_snapshot(path: str, snapshot: MenuSnapshot) -> bool:
+    """Writes the snapshot next to `path` and renames it into place in one step; False when the rename was refused."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(encode_snapshot(snapshot))
+    try:
+        os.replace(tmp, path)
+    except PermissionError as e:
+        # Windows will not replace a file another process still has mapped; the old snapshot
+        # is served until a later publish gets through
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        log_event(LOG, 'menu_snapshot_replace_failed', logging.WARNING, path=path, error=str(e))
+        return False
+    return True
+
+
+class MappedPostings:
+    """gram -> alias ids, read straight out of the mapped file."""
+
+    def __init__(self, ids: memoryview, grams: Dict[str, List[int]]):
+        self._ids, self._grams = ids, grams
+
+    def get(self, gram: str, default=()):
+        span = self._grams.get(gram)
+        return self._ids[span[0]:span[0] + span[1]] if span else default
+
+    def rebind(self, ids: memoryview) -> bool:
+        """Reads from `ids`, the same postings in a newer file, so the old file's mapping can be released."""
+        if len(ids) != len(self._ids):
+            return False
+        self._ids = ids  # the old mapping closes once no lookup still holds a slice of it
+        return True
+
+    def __len__(self):
+        return len(self._grams)
+
+
+def attach_snapshot(path: str, reuse: Optional[MenuSnapshot] = None) -> MenuSnapshot:
+    """Maps `path` read-only. When `reuse` holds the same version only the fetch time is taken from the file."""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, fetched_at, items_off, items_len, meta_off, meta_len, postings_off, postings_len = _HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a menu snapshot")
+    version = version.rstrip(b'\0').decode('ascii')
+    view = memoryview(mapped)
+    if reuse is not None and reuse.version == version:
+        # Same menu republished: keep the built index, but move its postings onto the new file. Holding
+        # the old mapping would keep the old file open, and Windows then refuses every later publish.
+        postings = getattr(reuse.index._matcher, '_postings', None)
+        if not isinstance(postings, MappedPostings) or postings.rebind(view[postings_off:postings_off + postings_len].cast('I')):
+            return MenuSnapshot(reuse.items, version, reuse.index, fetched_at)
+    items = json.loads(bytes(view[items_off:items_off + items_len]))
+    meta = json.loads(bytes(view[meta_off:meta_off + meta_len]))
+    aliases = [(alias, items[i], size) for alias, i, size in meta['aliases']]
+    # Only the postings stay in the mapping; MenuIndex builds its other tables from the decoded items
+    postings = MappedPostings(view[postings_off:postings_off + postings_len].cast('I'), meta['grams'])
+    return MenuSnapshot(items, version, MenuIndex(items, matcher=TrigramMatcher.from_tables(aliases, postings)), fetched_at)
+
+
+def load_snapshot(path: Optional[str]) -> Optional[MenuSnapshot]:
+    """The snapshot saved at `path`, or None when there is none or it cannot be read."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return attach_snapshot(path)
+    except (OSError, ValueError, TypeError, struct.error, KeyError, IndexError):
+        return None
+
+
+class MenuPublisher:
+    """Keeps the snapshot file current: a MenuRefresher whose every fetch, revalidations included, is published."""
+
+    def __init__(self, fetch: Callable[[], Any], path: str, max_age: float = 300, retry_after: float = 15,
+                 persist_path: Optional[str] = None):
+        self.path, self.persist_path = path, persist_path
+        self.refresher = MenuRefresher(fetch, max_age=max_age, retry_after=retry_after, on_update=self._publish)
+        self.published = 0
+        self.persist_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _publish(self, snapshot: MenuSnapshot):
+        self.published += publish_snapshot(self.path, snapshot)
+        if self.persist_path:
+            try:
+                publish_snapshot(self.persist_path, snapshot)
+                self.persist_error = None
+            except OSError as e:
+                self.persist_error = str(e)  # the shared file is what workers need; the disk copy is a convenience
+
+    def _loop(self):
+        # Workers get the menu saved by the last run at once, rather than after the first fetch
+        saved = load_snapshot(self.persist_path)
+        if saved is not None and self.refresher.seed(saved):
+            self.published += publish_snapshot(self.path, saved)
+        while not self._stop.is_set():
+            ok = self.refresher.refresh()
+            self._stop.wait(self.refresher.max_age if ok else self.refresher.retry_after)
+
+    def start(self) -> 'MenuPublisher':
+        self._thread = threading.Thread(target=self._loop, name='menu-publisher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+class SharedMenuFollower:
+    """Stands in for MenuRefresher in worker processes, following the file a MenuPublisher keeps current.
+
+    get() never blocks: at most every `poll` seconds it stats the file, and a changed file is
+    attached on a background thread while the current snapshot keeps being served. `age` is
+    measured from the publisher's fetch, so a stalled publisher still shows up as a stale menu.
+    """
+
+    def __init__(self, path: str, poll: float = 1.0, on_update: Optional[Callable[[MenuSnapshot], None]] = None):
+        self.path, self.poll, self.on_update = path, poll, on_update
+        self.snapshot: Optional[MenuSnapshot] = None
+        self.last_error: Optional[str] = None
+        self.attaches = 0
+        self._seen: Optional[Tuple[int, int, int]] = None  # (inode, mtime_ns, size) of the attached file
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._attaching = False
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.snapshot.version if self.snapshot else None
+
+    @property
+    def age(self) -> Optional[float]:
+        return self.snapshot.age if self.snapshot else None
+
+    @property
+    def refreshing(self) -> bool:
+        return self._attaching
+
+    def get(self) -> Optional[MenuSnapshot]:
+        now = time.time()
+        if now >= self._next_check:
+            self._next_check = now + self.poll
+            if self._changed():
+                self.refresh_async()
+        return self.snapshot
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _changed(self) -> bool:
+        stat = self._stat()
+        return stat is not None and stat != self._seen
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self._attaching:
+                return False
+            self._attaching = True
+            return True
+
+    def refresh_async(self) -> bool:
+        if not self._claim():
+            return False
+        threading.Thread(target=self._attach, name='menu-attach', daemon=True).start()
+        return True
+
+    def refresh(self, timeout: Optional[float] = None) -> bool:
+        """Attaches the current file, waiting up to `timeout` seconds for the publisher to write one."""
+        deadline = time.time() + (timeout if timeout is not None else 0)
+        while self._stat() is None and time.time() < deadline:
+            time.sleep(0.05)
+        if self._claim():
+            self._attach()
+        return self.last_error is None and self.snapshot is not None
+
+    def _attach(self):
+        try:
+            stat = self._stat()
+            if stat is None:
+                self.last_error = f"{self.path} not published yet"
+                return
+            self.snapshot = attach_snapshot(self.path, reuse=self.snapshot)
+            self._seen, self.last_error = stat, None
+            self.attaches += 1
+            if self.on_update:
+                self.on_update(self.snapshot)
+        except Exception as e:
+            self.last_error = str(e)
+        finally:
+            with self._lock:
+                self._attaching = False
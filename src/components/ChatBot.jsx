@@ -5,6 +5,7 @@ import { useQuery } from '@apollo/client';
 import { GET_MENU_ITEMS } from '../apollo/queries';
 import ReceiptMessage from './chatbot/ReceiptMessage';
 import CartMessage from './chatbot/CartMessage';
+import AlternativesMessage from './chatbot/AlternativesMessage';
 
 // AI Chatbot Service Configuration
 const CHATBOT_SERVICE_URL = 'http://localhost:5000';
@@ -36,6 +37,8 @@ const ChatBot = ({ isOpen, onClose }) => {
   const dispatch = useDispatch();
   const { data: menuData } = useQuery(GET_MENU_ITEMS);
   const { items: cartItems } = useSelector((state) => state.cart);
+  // Last cart the server reported; while ours matches it we only send its version
+  const serverCartRef = useRef({ version: null, key: null });
   const recognitionRef = useRef(null);
   const chatContainerRef = useRef(null);
   const textInputRef = useRef(null);
@@ -603,13 +606,13 @@ const ChatBot = ({ isOpen, onClose }) => {
     }
 
     try {
-      // Prepare cart data for AI context
-      const cartData = cartItems.map(item => ({
-        name: item.name,
-        quantity: item.quantity,
-        price: item.price,
-        total: item.totalPrice || (item.price * item.quantity)
-      }));
+      // The server keeps the cart per session: send the whole cart only when ours has drifted from it
+      const cartKey = (items) => items.map(it => `${it.name.toLowerCase()}:${it.quantity}`).sort().join('|');
+      const cartSync = serverCartRef.current.version !== null && serverCartRef.current.key === cartKey(cartItems)
+        ? { cart_version: serverCartRef.current.version }
+        : { cart_items: cartItems.map(item => ({ name: item.name, quantity: item.quantity })) };
+      // One key per message: if this request is retried, a checkout it triggers is placed only once
+      const idempotencyKey = window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`;
       
       // Use AbortController for timeout
       const controller = new AbortController();
@@ -626,7 +629,8 @@ const ChatBot = ({ isOpen, onClose }) => {
         body: JSON.stringify({
           message: userText,
           session_id: SESSION_ID,
-          cart_items: cartData,
+          ...cartSync,
+          idempotency_key: idempotencyKey,
           user_mood: userMood,
           empathy_level: empathyLevel
         })
@@ -642,6 +646,12 @@ const ChatBot = ({ isOpen, onClose }) => {
       
       const data = await response.json();
       console.log('📥 Received AI response:', data);
+
+      if (data.cart) {
+        serverCartRef.current = data.cart.conflict
+          ? { version: null, key: null }
+          : { version: data.cart.version, key: cartKey(data.cart.items) };
+      }
       
       if (!data.success) {
         throw new Error(data.error || 'AI response error');
@@ -906,6 +916,27 @@ const ChatBot = ({ isOpen, onClose }) => {
         }
         break;
         
+      case 'alternatives':
+        // Add whatever did resolve, then offer the closest menu items for the name that didn't
+        for (const item of actionData.items || []) {
+          const menuItem = findMenuItemByName(item.name);
+          dispatch(addToCart({
+            id: menuItem ? menuItem.id : item.id,
+            name: menuItem ? menuItem.name : item.name,
+            price: (menuItem ? menuItem.price : Number(item.price)) || 0,
+            quantity: Number(item.quantity || 1)
+          }));
+        }
+        if (actionData.alternatives && actionData.alternatives.length > 0) {
+          addMessage('assistant', null, {
+            title: 'Did you mean...',
+            unavailableItem: actionData.unavailable_item,
+            quantity: Number(actionData.quantity || 1),
+            items: actionData.alternatives
+          }, delay, 'alternatives');
+        }
+        break;
+
       case 'item_not_found': {
         // Handle when requested items are not found
         break;
@@ -1550,6 +1581,19 @@ const ChatBot = ({ isOpen, onClose }) => {
                          <div className="text-sm text-gray-700">Receipt unavailable. Please try again or contact support.</div>
                        )}
                     </div>
+                  ) : message.messageType === 'alternatives' ? (
+                    <AlternativesMessage
+                      content={message.menuItem}
+                      onItemClick={(item) => {
+                        dispatch(addToCart({
+                          id: item.id,
+                          name: item.name,
+                          price: item.price || 0,
+                          quantity: message.menuItem.quantity || 1
+                        }));
+                        addMessage('assistant', `Added ${message.menuItem.quantity || 1} ${item.name} to your cart.`);
+                      }}
+                    />
                   ) : message.messageType === 'cart_confirm' ? (
                     <div>
                       {(() => {
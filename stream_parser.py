@@ -0,0 +1,129 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+FENCE = '```'
+
+
+class ActionStreamParser:
+    """Splits a streamed completion into user-visible text and the JSON action block.
+
+    Text is released as soon as it cannot be part of a ```json fence or an inline {...}
+    object; those are held back, and the first one that parses becomes the action.
+    """
+
+    def __init__(self):
+        self.action: Optional[Dict[str, Any]] = None
+        self._visible: List[str] = []
+        self._pending = ''      # text not yet classified (possible start of a fence)
+        self._block = ''        # held-back fence or brace block
+        self._mode = 'text'     # 'text' | 'fence' | 'brace'
+        self._depth, self._in_string, self._escape = 0, False, False
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._visible)
+
+    def feed(self, chunk: str) -> str:
+        out: List[str] = []
+        data, self._pending = self._pending + (chunk or ''), ''
+        i = 0
+        while i < len(data):
+            if self._mode == 'text':
+                j = _next_special(data, i)
+                out.append(data[i:j])
+                if j == len(data):
+                    break
+                if data[j] == '{':
+                    self._start('brace', '{')
+                    self._depth = 1
+                    i = j + 1
+                elif data.startswith(FENCE, j):
+                    self._start('fence', FENCE)
+                    i = j + 3
+                elif FENCE.startswith(data[j:]):
+                    self._pending = data[j:]  # a fence may be split across chunks
+                    break
+                else:
+                    out.append('`')
+                    i = j + 1
+            elif self._mode == 'fence':
+                end = (self._block + data[i:]).find(FENCE, 3)
+                if end == -1:
+                    self._block += data[i:]
+                    break
+                consumed = end + 3 - len(self._block)
+                self._block += data[i:i + consumed]
+                self._close_fence()
+                i += consumed
+            else:
+                i = self._scan_brace(data, i, out)
+        return self._emit(out)
+
+    def finish(self) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Flushes anything still held back; returns (action, trailing visible text)."""
+        tail = self._pending
+        if self._mode == 'brace':
+            tail += self._block
+        self._pending, self._block, self._mode = '', '', 'text'
+        return self.action, self._emit([tail])
+
+    def _start(self, mode: str, opener: str):
+        self._mode, self._block = mode, opener
+        self._in_string = self._escape = False
+
+    def _close_fence(self):
+        body = self._block[3:-3].strip()
+        if body[:4].lower() == 'json':
+            body = body[4:]
+        self._take_action(body)
+        self._mode, self._block = 'text', ''
+
+    def _scan_brace(self, data: str, i: int, out: List[str]) -> int:
+        while i < len(data):
+            ch = data[i]
+            self._block += ch
+            i += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    block, self._block, self._mode = self._block, '', 'text'
+                    if not self._take_action(block):
+                        out.append(block)
+                    break
+        return i
+
+    def _take_action(self, body: str) -> bool:
+        if self.action is not None:
+            return False
+        try:
+            obj = json.loads(body)
+        except ValueError:
+            return False
+        if not isinstance(obj, dict):
+            return False
+        self.action = obj
+        return True
+
+    def _emit(self, parts: List[str]) -> str:
+        # Passed through as written: markup split across chunks cannot be told from a literal '*' or '#'
+        # here, so only the finished response is cleaned (clean_response_formatting)
+        text = ''.join(parts)
+        if text:
+            self._visible.append(text)
+        return text
+
+
+def _next_special(data: str, start: int) -> int:
+    positions = [p for p in (data.find('{', start), data.find('`', start)) if p != -1]
+    return min(positions) if positions else len(data)
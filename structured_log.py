@@ -0,0 +1,76 @@
+"""JSON-lines logging that never blocks a request: records go through a queue to a background writer."""
+import atexit, json, logging, os, queue, random, sys, threading
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))  # share of per-request events that are written
+
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'ts': round(record.created, 3), 'level': record.levelname.lower(), 'logger': record.name, 'event': record.getMessage()}
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RESERVED and k != 'sampled')
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps every record except those logged with sampled=True, of which only `rate` pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not getattr(record, 'sampled', False) or random.random() < self.rate
+
+
+_queue: 'queue.SimpleQueue' = queue.SimpleQueue()
+_writer = logging.StreamHandler(sys.stdout)
+_writer.setFormatter(JsonFormatter())
+_listener = QueueListener(_queue, _writer)
+_listener_lock = threading.Lock()
+_listening = False
+
+_handler = QueueHandler(_queue)
+_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))  # drop before enqueueing, so skipped events cost nothing more
+
+
+def get_logger(name: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    if _handler not in logger.handlers:
+        logger.addHandler(_handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, sample: bool = False, **fields):
+    """Logs `event` with `fields` as JSON keys; sample=True marks high-volume per-request events."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={**fields, 'sampled': sample})
+
+
+def start_logging():
+    """Starts the background writer, and stops it at exit; create_app and serve.py call it.
+
+    Importing this module starts no thread. Records logged before this is called wait in the queue.
+    """
+    global _listening
+    with _listener_lock:
+        if not _listening:
+            _listener.start()
+            _listening = True
+            atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Writes out whatever is queued and stops the background writer."""
+    global _listening
+    with _listener_lock:
+        if _listening:
+            _listener.stop()
+            _listening = False
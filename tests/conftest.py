@@ -0,0 +1,18 @@
+import os, tempfile
+
+import pytest
+
+# chatbot_service reads these at import; keep its files out of the working tree
+_STATE = tempfile.mkdtemp(prefix='chatbot-tests-')
+os.environ.setdefault('ORDER_DIR', os.path.join(_STATE, 'orders'))
+os.environ.setdefault('MENU_SNAPSHOT_PATH', os.path.join(_STATE, 'menu_snapshot.snap'))
+os.environ.setdefault('LOCATION_SNAPSHOT_DIR', os.path.join(_STATE, 'menu_snapshots'))
+
+
+@pytest.fixture
+def served_menu():
+    """A real menu in place of the fallback one, which orders are refused against."""
+    import chatbot_service
+    from graphql_stub import synthetic_menu
+    from menu_refresher import MenuSnapshot
+    chatbot_service._apply_menu_snapshot(MenuSnapshot(synthetic_menu()), persist=False)
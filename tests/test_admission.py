@@ -0,0 +1,72 @@
+import pytest
+
+import admission
+from admission import HIGH, LLM_BUDGETS, NORMAL, AdmissionController, worker_budgets
+
+
+def test_worker_budgets_split_the_server_totals():
+    shares = worker_budgets(4, {'LLM_RPM': '500', 'LLM_TPM': '200000', 'LLM_MAX_CONCURRENCY': '16', 'LLM_MAX_QUEUE': '64'})
+    assert shares == {'LLM_RPM': '125.0', 'LLM_TPM': '50000.0', 'LLM_MAX_CONCURRENCY': '4', 'LLM_MAX_QUEUE': '16'}
+
+
+def test_worker_budgets_use_defaults_keep_unlimited_and_floor_at_one():
+    shares = worker_budgets(32, {'LLM_RPM': '0'})
+    assert shares['LLM_RPM'] == '0.0'
+    assert float(shares['LLM_TPM']) * 32 == float(LLM_BUDGETS['LLM_TPM'])
+    assert shares['LLM_MAX_CONCURRENCY'] == '1'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(admission.time, 'sleep', lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+def test_requests_over_budget_queue_then_shed_with_normal_priority_first(clock):
+    controller = AdmissionController(rpm=60, tpm=0, max_queue=4, deadline=60, expected_latency=1)
+    controller.requests.tokens = 0  # the minute's budget is spent: each request waits a second more than the last
+    waits = [controller.admit(100, NORMAL) for _ in range(3)]
+    assert [(t.admitted, t.delay) for t in waits] == [(True, 1.0), (True, 2.0), (False, 0.0)]
+    assert waits[2].reason == 'queue_full' and controller.queue_depth == 2
+    urgent = [controller.admit(100, HIGH) for _ in range(3)]
+    assert [t.admitted for t in urgent] == [True, True, False] and controller.queue_depth == 4
+    assert controller.shed == {'queue_full': 2, 'deadline': 0} and controller.admitted == 4
+
+
+def test_a_request_that_cannot_finish_before_its_deadline_is_shed(clock):
+    controller = AdmissionController(rpm=60, tpm=0, max_queue=64, deadline=20, expected_latency=3)
+    controller.requests.tokens = 0
+    assert not controller.admit(100, HIGH, deadline=3.5).admitted  # 1s wait + 3s typical latency
+    assert controller.admit(100, HIGH, deadline=4.5).admitted
+    assert controller.shed['deadline'] == 1 and controller.queue_depth == 1
+
+
+def test_a_token_heavy_prompt_waits_on_the_tokens_per_minute_bucket(clock):
+    controller = AdmissionController(rpm=0, tpm=6000, completion_tokens=0)
+    assert controller.admit(6000).delay == 0
+    assert controller.admit(600).delay == pytest.approx(6.0)
+
+
+def test_done_settles_a_ticket_exactly_once(clock):
+    controller = AdmissionController(rpm=60, tpm=0, expected_latency=3)
+    controller.requests.tokens = 0
+    ticket = controller.admit(100, HIGH)
+    assert controller.queue_depth == 1
+    ticket.wait()
+    assert controller.queue_depth == 0
+    clock[0] += 1
+    ticket.done()
+    ticket.done()
+    ticket.done(ok=False)
+    assert controller.queue_depth == 0 and controller.latency == pytest.approx(3 + 0.2 * (1 - 3))
+
+
+def test_done_on_a_ticket_that_never_waited_leaves_the_queue_once(clock):
+    controller = AdmissionController(rpm=60, tpm=0, expected_latency=3)
+    controller.requests.tokens = 0
+    tickets = [controller.admit(100, HIGH) for _ in range(2)]
+    tickets[0].done(ok=False)  # its client went away before the wait was over
+    tickets[0].done(ok=False)
+    assert controller.queue_depth == 1 and controller.latency == 3
@@ -0,0 +1,79 @@
+from cart_state import Cart, CartEditor
+from menu_index import MenuIndex
+
+MENU = [{'id': '1', 'name': 'Margherita Pizza', 'price': 18.99, 'category': 'Pizza', 'available': True},
+        {'id': '16', 'name': 'Coca Cola', 'price': 2.99, 'category': 'Drinks', 'available': True}]
+INDEX = MenuIndex(MENU)
+
+
+def quantities(cart):
+    return {item['name']: item['quantity'] for item in cart.items}
+
+
+def test_deltas_add_remove_set_and_clear():
+    editor = CartEditor(Cart(), INDEX)
+    editor.apply_delta([{'op': 'add', 'name': 'margherita pizza', 'quantity': 2}, {'name': 'Coca Cola'}])
+    assert quantities(editor.cart) == {'Margherita Pizza': 2, 'Coca Cola': 1} and editor.changed
+    editor.apply_delta([{'op': 'remove', 'name': 'Margherita Pizza', 'quantity': 1}, {'op': 'set', 'name': 'Coca Cola', 'quantity': 4}])
+    assert quantities(editor.cart) == {'Margherita Pizza': 1, 'Coca Cola': 4}
+    editor.apply_delta([{'op': 'set', 'name': 'Coca Cola', 'quantity': 0}, {'op': 'remove', 'name': 'Margherita Pizza'}])
+    assert editor.cart.items == []
+    editor.apply_delta([{'op': 'add', 'name': 'Coca Cola'}, {'op': 'clear'}])
+    assert editor.cart.items == []
+
+
+def test_delta_prices_come_from_the_menu_and_unknown_names_are_rejected():
+    editor = CartEditor(Cart(), INDEX)
+    editor.apply_delta([{'op': 'add', 'name': 'Coca Cola', 'price': 0.01}, {'op': 'add', 'name': 'Unicorn Steak'}, 'junk'])
+    assert editor.cart.items[0]['price'] == 2.99
+    assert editor.rejected == ['Unicorn Steak']
+
+
+def test_a_no_op_delta_leaves_the_cart_unchanged():
+    editor = CartEditor(Cart(), INDEX)
+    editor.apply_delta([{'op': 'remove', 'name': 'Coca Cola'}, {'op': 'add', 'name': 'Coca Cola', 'quantity': 0}, {'op': 'clear'}])
+    assert not editor.changed
+
+
+def test_reprice_follows_a_menu_change_and_drops_items_no_longer_on_it():
+    cart = Cart(items=[{'id': '1', 'name': 'Margherita Pizza', 'price': 15.0, 'quantity': 1},
+                       {'id': '9', 'name': 'Old Special', 'price': 5.0, 'quantity': 1}], menu_version='old')
+    editor = CartEditor(cart, INDEX)
+    assert editor.reprice('new') == ['Margherita Pizza']
+    assert cart.items == [{'id': '1', 'name': 'Margherita Pizza', 'price': 18.99, 'quantity': 1}]
+    assert editor.rejected == ['Old Special'] and editor.changed
+    assert editor.reprice('new') == [] and cart.menu_version == 'new'
+
+
+def test_a_delta_against_a_stale_version_is_reported_not_applied():
+    import chatbot_service
+    client = chatbot_service.create_app().test_client()
+
+    def chat(**body):
+        return client.post('/chat', json={'session_id': 'cart-version', 'message': 'hello', **body}).get_json()['cart']
+
+    cart = chat(cart_delta=[{'op': 'add', 'name': 'Margherita Pizza'}])
+    assert cart['version'] == 1 and not cart.get('conflict')
+    cart = chat(cart_version=1, cart_delta=[{'op': 'add', 'name': 'Margherita Pizza'}])
+    assert cart['version'] == 2 and cart['items'][0]['quantity'] == 2
+    cart = chat(cart_version=1, cart_delta=[{'op': 'clear'}])
+    assert cart['conflict'] and cart['version'] == 2 and cart['items'][0]['quantity'] == 2
+
+
+def test_carts_on_one_database_do_not_overwrite_each_others_writes(tmp_path):
+    from cart_state import CartStore
+    from session_store import SQLiteSessionStore
+
+    path = str(tmp_path / 'sessions.db')
+    first, second = CartStore(SQLiteSessionStore(path, table='carts')), CartStore(SQLiteSessionStore(path, table='carts'))
+    first.put('s1', Cart(items=[{'id': '1', 'name': 'Margherita Pizza', 'price': 18.99, 'quantity': 1}], version=1))
+    mine, mine_loaded = first.load('s1')
+    theirs, theirs_loaded = second.load('s1')
+    mine.items[0]['quantity'], mine.version = 2, 2
+    theirs.items, theirs.version = [], 2
+
+    assert first.put_if('s1', mine, mine_loaded)
+    assert not second.put_if('s1', theirs, theirs_loaded)
+    assert second.get('s1').items[0]['quantity'] == 2
+    assert not second.put_if('s2', Cart(), theirs_loaded) and second.put_if('s2', Cart(), None)
+    assert not first.put_if('s2', Cart(version=1), None)
@@ -0,0 +1,60 @@
+import pytest
+
+from entity_scanner import EntityScanner
+
+MENU = [{'id': '1', 'name': 'Margherita Pizza'}, {'id': '2', 'name': 'Caesar Salad'}, {'id': '3', 'name': 'Chicken Caesar Salad'},
+        {'id': '4', 'name': 'Garlic Bread'}, {'id': '5', 'name': 'Tiramisu'}, {'id': '6', 'name': 'Coca Cola'},
+        {'id': '7', 'name': 'Fish and Chips'}, {'id': '8', 'name': 'Chicken Wings'}]
+SCANNER = EntityScanner(MENU, synonyms={'coke': MENU[5], 'chicken': MENU[7]})
+
+
+def mentions(text):
+    return [(m.item['name'], m.quantity) for m in SCANNER.scan(text).items]
+
+
+@pytest.mark.parametrize('text, found', [  # the add/remove/quantity messages of benchmarks/bench_intent.py
+    ('add 2 margherita pizza', [('Margherita Pizza', 2)]),
+    ('i want 3 garlic bread', [('Garlic Bread', 3)]),
+    ('remove 2 tiramisu', [('Tiramisu', 2)]),
+    ('can I get two caesar salad and a coke', [('Caesar Salad', 2), ('Coca Cola', 1)]),
+    ("I'd like a tiramisu", [('Tiramisu', 1)]),
+    ('increase 2 more garlic bread', [('Garlic Bread', 2)]),
+    ('delete the 1 coca cola from cart', [('Coca Cola', 1)]),
+    ('two margherita pizzas', [('Margherita Pizza', 2)]),  # plural alias
+    ('a tiramisu, then 2 tiramisu', [('Tiramisu', 1), ('Tiramisu', 2)]),
+])
+def test_item_mentions_and_their_quantities(text, found):
+    assert mentions(text) == found
+
+
+@pytest.mark.parametrize('text, found', [
+    # Leftmost-longest: the longer name wins over the names and synonyms inside it
+    ('1 chicken caesar salad', [('Chicken Caesar Salad', 1)]),
+    ('chicken wings and a caesar salad', [('Chicken Wings', 1), ('Caesar Salad', 1)]),
+    ('fish and chips', [('Fish and Chips', 1)]),
+    ('some chicken', [('Chicken Wings', 1)]),
+    # Whole words only
+    ('garlic breadsticks', []),
+    ('a tiramisus', [('Tiramisu', 1)]),
+    ('cokes', []),
+    ('cocacola', []),
+])
+def test_mentions_are_whole_words_and_leftmost_longest(text, found):
+    assert mentions(text) == found
+
+
+def test_spans_and_aliases_point_back_into_the_text():
+    text = 'Two Margherita Pizzas and a Coke'
+    found = SCANNER.scan(text).items
+    assert [(m.alias, text.lower()[m.span[0]:m.span[1]]) for m in found] == [('margherita pizzas', 'margherita pizzas'), ('coke', 'coke')]
+
+
+@pytest.mark.parametrize('text, emotion', [
+    ('i am so sad, 3 more tiramisu', 'negative'),
+    ('happy birthday to me', 'positive'),  # equal intensity: the category listed first wins
+    ('worst day ever but I am happy now', 'very_negative'),
+    ('I feel hopeless and sad', 'crisis'),
+    ('saddle up', 'neutral'),
+])
+def test_the_strongest_emotion_wins(text, emotion):
+    assert SCANNER.scan(text).emotional_state['emotion'] == emotion
@@ -0,0 +1,105 @@
+import pytest
+import requests
+
+import graphql_client
+from graphql_client import CircuitBreaker, CircuitOpenError, GraphQLClient, GraphQLError
+
+
+class Reply:
+    def __init__(self, status_code=200, body=None):
+        self.status_code, self.body = status_code, body if body is not None else {'data': {'ok': True}}
+
+    def json(self):
+        return self.body
+
+
+class Session:
+    """Plays back `outcomes` in order: a Reply is returned, an exception raised."""
+
+    def __init__(self, *outcomes):
+        self.outcomes, self.posts = list(outcomes), 0
+
+    def post(self, url, json, timeout):
+        self.posts += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(graphql_client.time, 'time', lambda: now[0])
+    monkeypatch.setattr(graphql_client.time, 'sleep', lambda seconds: None)
+    return now
+
+
+def client(*outcomes, retries=0, threshold=2):
+    return GraphQLClient('http://menu.test/graphql', retries=retries, breaker=CircuitBreaker(threshold, reset_timeout=30),
+                         session=Session(*outcomes))
+
+
+def test_the_breaker_opens_after_consecutive_failures_and_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    clock[0] += 30
+    assert breaker.state == 'half_open'
+    assert breaker.allow() and not breaker.allow()  # one probe at a time
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_a_failed_probe_opens_the_breaker_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+
+def test_an_open_breaker_fails_fast_without_a_request(clock):
+    graphql = client(requests.ConnectionError('refused'), requests.ConnectionError('refused'), threshold=2)
+    for _ in range(2):
+        with pytest.raises(GraphQLError):
+            graphql.execute('query { ok }')
+    with pytest.raises(CircuitOpenError):
+        graphql.execute('query { ok }')
+    assert graphql.session.posts == 2
+
+
+def test_a_probe_that_raises_something_unexpected_does_not_wedge_the_breaker(clock):
+    graphql = client(requests.ConnectionError('refused'), RuntimeError('bug in a transport adapter'), Reply(), threshold=1)
+    with pytest.raises(GraphQLError):
+        graphql.execute('query { ok }')
+    clock[0] += 30
+    with pytest.raises(RuntimeError):
+        graphql.execute('query { ok }')
+    assert graphql.breaker.state == 'open'
+    clock[0] += 30
+    assert graphql.execute('query { ok }') == {'ok': True}
+    assert graphql.breaker.state == 'closed'
+
+
+def test_retries_cover_transient_failures_and_count_once(clock):
+    graphql = client(requests.Timeout('slow'), Reply(503), Reply(), retries=2, threshold=1)
+    assert graphql.execute('query { ok }') == {'ok': True}
+    assert graphql.session.posts == 3 and graphql.breaker.failures == 0
+
+
+def test_exhausted_retries_record_one_failure(clock):
+    graphql = client(Reply(502), Reply(502), Reply(502), retries=2, threshold=2)
+    with pytest.raises(GraphQLError, match='HTTP 502'):
+        graphql.execute('query { ok }')
+    assert graphql.session.posts == 3 and graphql.breaker.failures == 1
+
+
+def test_graphql_errors_are_raised_but_do_not_count_against_the_endpoint(clock):
+    graphql = client(Reply(body={'errors': [{'message': 'Cannot query field "menuVersion"'}]}), threshold=1)
+    with pytest.raises(GraphQLError, match='menuVersion'):
+        graphql.execute('query { menuVersion }')
+    assert graphql.breaker.state == 'closed'
@@ -0,0 +1,69 @@
+import pytest
+
+from intent_engine import Intent, parse_message
+
+
+@pytest.mark.parametrize('message, intents', [  # the add/remove/quantity messages of benchmarks/bench_intent.py
+    ('add 2 margherita pizza', [Intent('add', 'margherita pizza', 2)]),
+    ('i want 3 garlic bread', [Intent('add', 'garlic bread', 3)]),
+    ('order 2 lasagna', [Intent('add', 'lasagna', 2)]),
+    ('remove 2 tiramisu', [Intent('decrease', 'tiramisu', 2)]),
+    ('remove all pizzas', [Intent('remove_all', 'pizzas')]),
+    ('remove all of the chicken wings please', [Intent('remove_all', 'chicken wings')]),
+    ('Remove 2 quantity of Coca Cola', [Intent('decrease', 'coca cola', 2)]),
+    ('place order', [Intent('place_order')]),
+    ('checkout now', [Intent('place_order')]),
+    ('show my cart', [Intent('show_cart')]),
+    ('clear chat', [Intent('clear_chat')]),
+    ("Hello, I'm Sam", [Intent('greeting', name='Sam')]),
+])
+def test_structured_intents(message, intents):
+    assert list(parse_message(message).intents) == intents
+
+
+@pytest.mark.parametrize('message, items', [
+    ('can I get two greek salad and a coke', [{'name': 'greek salad', 'quantity': 2}, {'name': 'coke', 'quantity': 1}]),
+    ("I'd like a tiramisu", [{'name': 'tiramisu', 'quantity': 1}]),
+    ('add 2 margherita pizza', [{'name': 'margherita pizza', 'quantity': 2}]),
+    ('three garlic bread & 1 water bottle', [{'name': 'garlic bread', 'quantity': 3}, {'name': 'water bottle', 'quantity': 1}]),
+    ('remove 2 tiramisu', []),  # never read as items to add
+])
+def test_quantities_of_items_to_add(message, items):
+    assert parse_message(message).add_items == items
+
+
+@pytest.mark.parametrize('message, items', [
+    ('remove 2 tiramisu', [{'name': 'tiramisu', 'quantity': 2, 'operation': 'remove'}]),
+    ('decrease pizza by 1', [{'name': 'pizza', 'quantity': 1, 'operation': 'decrease'}]),
+    ('increase 2 more garlic bread', [{'name': 'garlic bread', 'quantity': 2, 'operation': 'increase'}]),
+    ('delete one lasagna', [{'name': 'lasagna', 'quantity': 1, 'operation': 'remove'}]),
+    ('add 2 lasagna', []),
+])
+def test_quantities_of_items_to_remove_or_change(message, items):
+    assert parse_message(message).remove_items == items
+
+
+@pytest.mark.parametrize('message, cues', [
+    ('hi there', {'greeting'}),
+    ('good morning!', {'greeting'}),
+    ('view cart please', {'show_cart'}),
+    ('reset chat', {'clear_chat'}),
+    ("I'll take a tiramisu", {'order_request'}),
+    ('could I get a coke', {'order_request'}),
+    ('add more garlic bread', {'increase'}),  # the longer phrase wins over 'add'
+    ('cancel the pizza and order now', {'remove', 'place_order'}),
+    # Cue phrases only match whole words
+    ('this shipping address', set()),
+    ('which reorders are chilled', set()),
+    ('I wanted a recommendation', set()),
+])
+def test_cue_phrases_match_whole_words(message, cues):
+    assert parse_message(message).cues == cues
+
+
+def test_punctuation_and_case_are_normalized_once():
+    parsed = parse_message('Add 2 Margherita Pizza, please!')
+    assert parsed.clean == 'add 2 margherita pizza please'
+    assert parsed.tokens == ('add', '2', 'margherita', 'pizza', 'please')
+    assert parsed.numbered == 'Add 2 Margherita Pizza, please!'
+    assert parse_message('a coke and two tiramisu').numbered == '1 coke and 2 tiramisu'
@@ -0,0 +1,112 @@
+import os
+
+from location_catalog import LocationCatalogs
+
+
+def menu(location_id):
+    return [{'id': '1', 'name': f'{location_id} Pizza', 'price': 10.0, 'category': 'Pizza', 'available': True}]
+
+
+def catalogs(tmp_path, fetch=menu, **kwargs):
+    return LocationCatalogs(lambda location_id: lambda: fetch(location_id), snapshot_dir=str(tmp_path), **kwargs)
+
+
+def snapshots(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name.endswith('.snap'))
+
+
+def test_empty_menus_are_not_saved(tmp_path):
+    held = catalogs(tmp_path, fetch=lambda location_id: [])
+    held.get('no-such-place')
+    assert snapshots(tmp_path) == []
+
+
+def test_snapshots_beyond_max_locations_are_pruned_oldest_first(tmp_path):
+    held = catalogs(tmp_path, max_locations=2)
+    for i, location_id in enumerate(['a', 'b', 'c', 'd']):
+        held.get(location_id)
+        os.utime(os.path.join(tmp_path, f'{location_id}.snap'), (1000 + i, 1000 + i))
+    held.get('e')
+    assert snapshots(tmp_path) == ['d.snap', 'e.snap']
+    assert held.snapshots_pruned == 3 and held.stats()['snapshots_pruned'] == 3
+
+
+def test_a_location_loaded_from_disk_counts_as_recently_used(tmp_path):
+    catalogs(tmp_path).get('a')
+    catalogs(tmp_path).get('b')
+    os.utime(os.path.join(tmp_path, 'a.snap'), (1000, 1000))
+    os.utime(os.path.join(tmp_path, 'b.snap'), (2000, 2000))
+    loader = catalogs(tmp_path)
+    assert loader.get('a') is not None and loader.disk_loads == 1
+    catalogs(tmp_path, max_locations=2).get('c')
+    assert snapshots(tmp_path) == ['a.snap', 'c.snap']
+
+
+def held_bytes(held):
+    return sum(entry.accounted for entry in held._entries.values())
+
+
+def test_eviction_keeps_the_byte_count_in_step_with_the_locations_held(tmp_path):
+    held = catalogs(tmp_path, max_locations=3)
+    for location_id in ['a', 'b', 'c', 'd', 'e']:
+        held.get(location_id)
+        assert held.bytes_used == held_bytes(held)
+    assert list(held._entries) == ['c', 'd', 'e'] and held.evictions == 2
+    held.get('c')  # a hit moves it to the most recently used end
+    held.get('f')
+    assert list(held._entries) == ['e', 'c', 'f'] and (held.hits, held.misses) == (1, 6)
+    assert held.bytes_used == held_bytes(held)
+
+
+def test_the_memory_budget_evicts_least_recently_used_first(tmp_path):
+    one = catalogs(tmp_path / 'probe')
+    one.get('a')
+    size = one.bytes_used
+    held = catalogs(tmp_path, memory_budget=int(size * 2.5))
+    for location_id in ['a', 'b', 'c']:
+        held.get(location_id)
+    assert list(held._entries) == ['b', 'c'] and held.bytes_used == held_bytes(held) <= held.memory_budget
+
+
+def test_a_menu_that_lands_after_its_location_was_evicted_is_not_counted(tmp_path):
+    held = catalogs(tmp_path, max_locations=1)
+    first = held.get('a')
+    held.get('b')
+    assert held.peek('a') is None
+    first.size += 1000  # e.g. a refresh of the evicted entry finishing late
+    held.resized(first)
+    assert held.bytes_used == held_bytes(held) == held.peek('b').accounted
+
+
+def test_an_id_with_no_menu_is_dropped_and_not_fetched_again_for_a_while(tmp_path):
+    fetches = []
+
+    def fetch(location_id):
+        fetches.append(location_id)
+        return [] if location_id.startswith('fake') else menu(location_id)
+
+    held = catalogs(tmp_path, fetch=fetch, max_locations=2)
+    held.get('a')
+    held.get('b')
+    for _ in range(3):
+        assert held.get('fake-1') is None
+    assert fetches.count('fake-1') == 1 and held.missing_hits == 2
+    assert list(held._entries) == ['a', 'b'] and held.evictions == 0
+    assert held.bytes_used == held_bytes(held)
+
+
+def test_a_missing_id_is_tried_again_once_its_ttl_has_passed(tmp_path):
+    available = set()
+    held = catalogs(tmp_path, fetch=lambda location_id: menu(location_id) if location_id in available else [], missing_ttl=0)
+    assert held.get('new') is None
+    available.add('new')
+    assert held.get('new').menu_data['index'].names == ['new Pizza']
+
+
+def test_location_ids_are_refused_while_locations_are_off(monkeypatch):
+    import chatbot_service
+    monkeypatch.setattr(chatbot_service, 'LOCATION_GRAPHQL_URL', None)
+    client = chatbot_service.create_app().test_client()
+    response = client.post('/chat', json={'session_id': 'no-locations', 'message': 'hi', 'location_id': 'store-1'})
+    assert response.status_code == 400
+    assert client.get('/menu?location_id=store-1').status_code == 400
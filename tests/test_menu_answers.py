@@ -0,0 +1,64 @@
+import pytest
+
+from graphql_stub import synthetic_menu
+from intent_engine import parse_message
+from menu_answers import answer_menu_question
+from menu_index import MenuIndex
+
+SOLD_OUT = {'id': '99', 'name': 'Seafood Risotto', 'category': 'Seafood', 'price': 22.5, 'available': False, 'ingredients': ['Rice']}
+INDEX = MenuIndex(synthetic_menu() + [SOLD_OUT])
+
+
+def answer(message):
+    return answer_menu_question(parse_message(message), INDEX)
+
+
+def category(name):
+    return {'action': 'show_category', 'category': name}
+
+
+@pytest.mark.parametrize('message, kind, response, action', [
+    ('is the margherita pizza vegetarian', 'diet',
+     'Yes - the Margherita Pizza is vegetarian (mozzarella, tomato sauce, fresh basil and olive oil).', category('Pizza')),
+    ('is the lasagna vegetarian', 'diet', "No - the Lasagna isn't vegetarian: it has beef ragu.", category('Pasta')),
+    ('what vegetarian pasta do you have', 'diet', 'Our vegetarian Pasta options: Penne Arrabbiata ($14.99).', category('Pasta')),
+    ('any vegan desserts', 'diet', "I'm afraid nothing in our Desserts is vegan, going by the listed ingredients.", category('Desserts')),
+    ("what's in the tiramisu", 'ingredients', 'The Tiramisu is made with mascarpone, espresso, ladyfingers and cocoa.', category('Desserts')),
+    ('how much is the greek salad', 'price', 'The Greek Salad is $12.99.', category('Salads')),
+    ('how much are the beef burger and the garlic bread', 'price', 'The Beef Burger is $15.99 and Garlic Bread is $6.99.',
+     category('Main Courses')),
+    ('is the grilled salmon available', 'availability', 'Yes, the Grilled Salmon is available - $24.99.', category('Seafood')),
+    ('do you have seafood risotto', 'availability',
+     "Sorry, the Seafood Risotto isn't available right now. You could try the Grilled Salmon and Fish and Chips.", category('Seafood')),
+    ('what desserts do you have', 'browse', 'Our Desserts: Tiramisu ($8.99) and Chocolate Cake ($7.99).', category('Desserts')),
+    ('how much are your drinks', 'browse',
+     'Our Beverages: Coca Cola ($2.99), Fresh Orange Juice ($4.99), Apple Juice Can ($3.49) and Water Bottle ($1.99).',
+     category('Beverages')),
+    ('show me the menu', 'browse',
+     "Here's our menu - we have Pizza, Pasta, Salads, Seafood, Main Courses, Appetizers, Desserts and Beverages.",
+     {'action': 'show_menu'}),
+])
+def test_catalog_questions_are_answered_from_the_menu(message, kind, response, action):
+    found = answer(message)
+    assert (found.kind, found.response, found.action_data) == (kind, response, action)
+    payload = found.payload()
+    assert payload['menu_answer'] == kind and payload['success']
+    assert payload['action_data'] == {**action, 'message_type': 'text', 'response_delay': 800}
+
+
+@pytest.mark.parametrize('message', [
+    'is coca cola vegan',  # no ingredients listed, so nothing to go on
+    'what is in the coca cola',
+    'what do you recommend',  # advice
+    'add a tiramisu',  # ordering
+    'do you have anything spicy',  # not a dish or category
+    'what is the meaning of life',
+])
+def test_other_messages_are_left_to_the_model(message):
+    assert answer(message) is None
+
+
+def test_a_long_category_is_listed_in_part():
+    items = [{'id': str(i), 'name': f'Soup {i}', 'category': 'Soups', 'price': 5.0, 'available': True} for i in range(10)]
+    found = answer_menu_question(parse_message('what soups do you have'), MenuIndex(items))
+    assert found.response.endswith('Soup 7 ($5.00) and 2 more in the menu.')
@@ -0,0 +1,21 @@
+from menu_index import MenuIndex
+
+MENU = [{'id': '1', 'name': 'Margherita Pizza', 'price': 18.99, 'category': 'Pizza', 'available': True},
+        {'id': '2', 'name': 'Pepperoni Pizza', 'price': 20.99, 'category': 'Pizza', 'available': True},
+        {'id': '3', 'name': 'Caesar Salad', 'price': 11.99, 'category': 'Salads', 'available': True},
+        {'id': '4', 'name': 'Chicken Caesar Salad', 'price': 13.99, 'category': 'Salads', 'available': True},
+        {'id': '5', 'name': 'Coca Cola', 'price': 2.99, 'category': 'Drinks', 'available': True}]
+INDEX = MenuIndex(MENU)
+
+
+def test_words_that_fit_several_items_offer_them_instead_of_picking_one():
+    item, alternatives = INDEX.resolve('pizza')
+    assert item is None
+    assert [candidate.item['name'] for candidate in alternatives] == ['Margherita Pizza', 'Pepperoni Pizza']
+    assert INDEX.find('pizza') is None
+
+
+def test_words_that_fit_one_item_resolve_to_it():
+    assert INDEX.find('2 margherita pizza')['id'] == '1'
+    assert INDEX.find('cola')['id'] == '5'
+    assert INDEX.find('2 chicken caesar salad')['id'] == '4'  # not the Caesar Salad it contains
@@ -0,0 +1,8 @@
+from metrics import Registry
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    errors = registry.counter('errors_total', 'Errors, by message.')
+    errors.inc(error='bad "quote"\nat C:\\menu')
+    assert 'errors_total{error="bad \\"quote\\"\\nat C:\\\\menu"} 1' in registry.render().splitlines()
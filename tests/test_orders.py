@@ -0,0 +1,165 @@
+import os, threading
+
+import pytest
+
+from orders import FileSink, OrderBook, OrderDrain, OrderIdGenerator, OrderLog, _encode, _slot_log_path, read_records
+
+FIELDS = {'items': [{'id': '1', 'name': 'Margherita Pizza', 'price': 18.99, 'quantity': 1}], 'subtotal': 18.99, 'tax': 1.52, 'total': 20.51}
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / 'orders')
+
+
+def test_a_retried_key_gets_the_first_order_back(directory):
+    book = OrderBook(directory, fsync=False)
+    first, replayed = book.place('s1', 'k1', FIELDS)
+    assert not replayed
+    again, replayed = book.place('s1', 'k1', {**FIELDS, 'total': 99.0})
+    assert replayed and again == first
+    assert book.replay('s1', 'k1') == first
+    assert book.replay('s2', 'k1') is None and book.replay('s1', None) is None
+    assert book.log.records == 1
+    book.close()
+
+
+def test_racing_retries_on_two_workers_place_one_order(directory):
+    books = [OrderBook(directory, fsync=False) for _ in range(2)]
+    assert books[0].slot != books[1].slot
+    results, barrier = [], threading.Barrier(8)
+
+    def checkout(book):
+        barrier.wait()
+        results.append(book.place('s1', 'same-key', FIELDS))
+
+    threads = [threading.Thread(target=checkout, args=(books[i % 2],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({order['order_id'] for order, _ in results}) == 1
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 7
+    assert sum(book.log.records for book in books) == 1
+    for book in books:
+        book.close()
+
+
+def test_a_claim_left_by_a_dead_worker_is_settled_from_its_log(directory):
+    book = OrderBook(directory, fsync=False)
+    dead = book.slot + 1  # no process holds this slot
+    logged = {'order_id': 'ORD-0000000000000001', 'placed_at': '2026-01-01T00:00:00.000+00:00', 'session_id': 's1',
+              'idempotency_key': 'logged', **FIELDS}
+    with open(_slot_log_path(directory, dead), 'wb') as f:
+        f.write(_encode(logged))
+    book.keys.claim('s1', 'logged', logged['order_id'], dead)
+    book.keys.claim('s1', 'lost', 'ORD-0000000000000002', dead)
+
+    assert book.replay('s1', 'logged') == logged
+    assert book.replay('s1', 'lost') is None
+    order, replayed = book.place('s1', 'lost', FIELDS)
+    assert not replayed and order['order_id'] != 'ORD-0000000000000002'
+    book.close()
+
+
+def test_a_restarted_worker_settles_its_slot_claims(directory):
+    book = OrderBook(directory, fsync=False)
+    slot = book.slot
+    book.keys.claim('s1', 'in-flight', 'ORD-00000000000000FF', slot)
+    book.close()
+    book = OrderBook(directory, fsync=False)
+    assert book.slot == slot and book.keys.get('s1', 'in-flight') is None
+    book.close()
+
+
+def test_keys_are_shared_through_the_directory(directory):
+    book = OrderBook(directory, fsync=False)
+    order, _ = book.place('s1', 'k1', FIELDS)
+    book.close()
+    book = OrderBook(directory, fsync=False)
+    assert book.replay('s1', 'k1') == order
+    book.close()
+
+
+def test_a_replayed_checkout_leaves_the_cart_alone(served_menu):
+    import chatbot_service
+    client = chatbot_service.create_app().test_client()
+
+    def chat(message, **body):
+        return client.post('/chat', json={'session_id': 'replay-cart', 'message': message, **body}).get_json()
+
+    chat('add 1 margherita pizza')
+    placed = chat('place order', idempotency_key='checkout-1')
+    assert placed['cart']['items'] == []
+    chat('add 1 tiramisu')
+    retried = chat('place order', idempotency_key='checkout-1')
+    assert retried['action_data']['order']['replayed']
+    assert retried['action_data']['order_id'] == placed['action_data']['order_id']
+    assert [item['name'] for item in retried['cart']['items']] == ['Tiramisu']
+
+
+def test_no_order_is_placed_against_the_fallback_menu(monkeypatch):
+    import chatbot_service
+    monkeypatch.setattr(chatbot_service, 'fetch_menu_data_from_graphql', lambda: None)
+    client = chatbot_service.create_app().test_client()
+
+    def chat(message, **body):
+        return client.post('/chat', json={'session_id': 'fallback-cart', 'message': message, **body}).get_json()
+
+    chat('add 1 margherita pizza')
+    answer = chat('place order', idempotency_key='fallback-1')
+    assert answer['action_data']['action'] == 'none' and 'order_id' not in answer['action_data']
+    assert [item['name'] for item in answer['cart']['items']] == ['Margherita Pizza']
+
+
+def test_order_log_records_carry_a_crc_and_corrupt_lines_end_the_read(tmp_path):
+    path = str(tmp_path / 'orders.wal')
+    with open(path, 'wb') as f:
+        f.write(_encode({'order_id': 'ORD-1'}) + _encode({'order_id': 'ORD-2'}))
+    assert [record['order_id'] for _, record in read_records(path)] == ['ORD-1', 'ORD-2']
+    with open(path, 'r+b') as f:
+        data = f.read()
+        f.seek(data.index(b'ORD-2'))
+        f.write(b'ORD-3')  # same length, so only the checksum can tell
+    assert [record['order_id'] for _, record in read_records(path)] == ['ORD-1']
+
+
+def test_order_log_cuts_a_torn_tail_on_open_and_appends_after_it(tmp_path):
+    path = str(tmp_path / 'orders.wal')
+    log = OrderLog(path, fsync=False)
+    for i in range(3):
+        log.append({'order_id': f'ORD-{i}'}).wait(5)
+    durable = log.durable_size
+    log.close()
+    with open(path, 'ab') as f:
+        f.write(b'0badc0de {"order_id":"ORD-')  # a crash halfway through a write
+
+    log = OrderLog(path, fsync=False)
+    assert log.durable_size == durable == os.path.getsize(path)
+    assert log.last_record == {'order_id': 'ORD-2'}
+    log.append({'order_id': 'ORD-3'}).wait(5)
+    log.close()
+    assert [record['order_id'] for _, record in read_records(path)] == ['ORD-0', 'ORD-1', 'ORD-2', 'ORD-3']
+
+
+def test_order_ids_stay_unique_and_increasing_when_the_clock_steps_back():
+    ids = OrderIdGenerator(3, clock=lambda: 1.8e9)
+    before = [ids.next_int() for _ in range(5000)]  # more than one millisecond's worth of sequence numbers
+    ids.clock = lambda: 1.7e9
+    assert all(a < b for a, b in zip(before, before[1:])) and ids.next_int() > before[-1]
+
+
+def test_ids_keep_increasing_after_the_log_is_compacted_and_the_worker_restarts(directory, tmp_path):
+    book = OrderBook(directory, fsync=False)
+    book.ids.clock = lambda: 1.8e9
+    placed = [book.place('s1', None, FIELDS)[0]['order_id'] for _ in range(3)]
+    drain = OrderDrain(book.log, FileSink(str(tmp_path / 'shipped.jsonl')), compact_bytes=1)
+    assert drain.drain_once() == 3 and drain.drain_once() == 0
+    assert book.log.durable_size == 0 and os.path.getsize(book.log.path) == 0
+    book.close()
+
+    restarted = OrderBook(directory, fsync=False)
+    assert restarted.log.last_record['order_id'] == placed[-1]
+    restarted.ids.clock = lambda: 1.7e9  # the clock stepped back across the restart
+    assert restarted.ids.next() > placed[-1]
+    restarted.close()
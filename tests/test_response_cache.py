@@ -0,0 +1,90 @@
+import pytest
+
+from intent_engine import parse_message
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A /chat client whose model numbers its answers, with an empty response cache."""
+    import chatbot_service
+
+    class Model:
+        calls = 0
+
+        def invoke(self, messages):
+            Model.calls += 1
+            return type('Reply', (), {'content': f"answer {Model.calls}"})()
+
+    monkeypatch.setattr(chatbot_service, 'get_llm', lambda: Model())
+    monkeypatch.setattr(chatbot_service, 'RESPONSE_CACHE', ResponseCache())
+    return chatbot_service.create_app().test_client()
+
+
+def ask(client, session_id, message, **body):
+    return client.post('/chat', json={'session_id': session_id, 'message': message, **body}).get_json()
+
+
+def test_an_impersonal_question_is_answered_from_another_sessions_entry(client):
+    first = ask(client, 'cache-a', 'what are your opening hours')
+    second = ask(client, 'cache-b', 'what are your opening hours')
+    assert second['cached'] and second['response'] == first['response'] == 'answer 1'
+
+
+@pytest.mark.parametrize('message', [
+    'my name is Sam',  # personal
+    'i am called Sam',  # named
+    'i am so angry, what are your opening hours',  # emotional
+])
+def test_personal_named_and_emotional_messages_always_reach_the_model(client, message):
+    first = ask(client, f'first {message}', message)
+    second = ask(client, f'second {message}', message)
+    assert not second.get('cached') and second['response'] != first['response']
+
+
+def test_a_cart_question_is_only_shared_between_identical_carts(client):
+    tiramisu = [{'op': 'add', 'name': 'Tiramisu'}]
+    ask(client, 'cart-a', 'hello', cart_delta=tiramisu)
+    ask(client, 'cart-b', 'hello', cart_delta=[{'op': 'add', 'name': 'Margherita Pizza'}])
+    ask(client, 'cart-c', 'hello', cart_delta=tiramisu)
+    first = ask(client, 'cart-a', 'what does the total come to')
+    other_cart = ask(client, 'cart-b', 'what does the total come to')
+    same_cart = ask(client, 'cart-c', 'what does the total come to')
+    assert not other_cart.get('cached') and other_cart['response'] != first['response']
+    assert same_cart['cached'] and same_cart['response'] == first['response']
+
+
+def key(cache, message, version='v1'):
+    return cache.key_for(parse_message(message), {'emotion': 'neutral'}, version)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    import response_cache
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    cache = ResponseCache(ttl=60)
+    k = key(cache, 'what are your opening hours')
+    cache.put(k, {'response': 'nine to five', 'success': True})
+    now[0] += 59
+    assert cache.get(k)['response'] == 'nine to five'
+    now[0] += 2
+    assert cache.get(k) is None and len(cache) == 0 and cache.evictions == 1
+
+
+def test_the_least_recently_used_entry_is_evicted_first():
+    cache = ResponseCache(max_entries=2)
+    hours, parking, wifi = (key(cache, message) for message in ['opening hours', 'is there parking', 'is there wifi'])
+    cache.put(hours, {'response': 'hours', 'success': True})
+    cache.put(parking, {'response': 'parking', 'success': True})
+    assert cache.get(hours)  # now the most recently used
+    cache.put(wifi, {'response': 'wifi', 'success': True})
+    assert cache.get(parking) is None and cache.get(hours) and cache.get(wifi)
+    assert cache.evictions == 1
+
+
+def test_a_served_entry_is_a_copy():
+    cache = ResponseCache()
+    k = key(cache, 'opening hours')
+    cache.put(k, {'response': 'hours', 'success': True, 'action_data': {'action': 'none'}})
+    cache.get(k)['action_data']['action'] = 'add_to_cart'
+    assert cache.get(k)['action_data'] == {'action': 'none'}
@@ -0,0 +1,57 @@
+import pytest
+
+from cart_state import Cart, CartStore
+from session_store import MemorySessionStore, SQLiteSessionStore, create_session_store
+
+
+def test_sqlite_stores_sharing_a_file_keep_their_own_rows(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    sessions = SQLiteSessionStore(path, table='sessions')
+    carts = CartStore(SQLiteSessionStore(path, table='carts'))
+    sessions.put('s1', [['human', 'hi']])
+    carts.put('s1', Cart(items=[{'id': '1', 'name': 'Margherita Pizza', 'price': 18.99, 'quantity': 1}], version=3))
+
+    assert sessions.get('s1') == [['human', 'hi']]
+    assert carts.get('s1').version == 3
+    assert len(sessions) == 1 and len(carts.sessions) == 1
+    carts.delete('s1')
+    assert sessions.get('s1') == [['human', 'hi']]
+
+
+def test_a_crafted_session_id_cannot_reach_another_store(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    sessions = SQLiteSessionStore(path, table='sessions')
+    carts = CartStore(SQLiteSessionStore(path, table='carts'))
+    carts.put('victim', Cart(items=[{'id': '1', 'name': 'Margherita Pizza', 'price': 18.99, 'quantity': 2}], version=1))
+    assert sessions.get('cart:victim') is None
+    sessions.put('victim', [['human', 'overwrite?']])
+    assert carts.get('victim').items[0]['quantity'] == 2
+
+
+def test_table_name_must_be_an_identifier(tmp_path):
+    with pytest.raises(ValueError):
+        SQLiteSessionStore(str(tmp_path / 'sessions.db'), table='carts; DROP TABLE sessions')
+
+
+def test_create_session_store_namespaces(tmp_path, monkeypatch):
+    monkeypatch.setenv('SESSION_BACKEND', 'sqlite')
+    monkeypatch.setenv('SESSION_DB_PATH', str(tmp_path / 'sessions.db'))
+    first, second = create_session_store('sessions'), create_session_store('carts')
+    first.put('s1', [['human', 'a']])
+    assert second.get('s1') is None and first.stats()['table'] == 'sessions'
+
+    monkeypatch.setenv('SESSION_BACKEND', 'memory')
+    first, second = create_session_store('sessions'), create_session_store('carts')
+    first.put('s1', [['human', 'a']])
+    assert isinstance(second, MemorySessionStore) and second.get('s1') is None
+
+
+@pytest.mark.parametrize('session_id', ['cart:victim', 'a:b', '', 42, None])
+def test_chat_rejects_session_ids_that_are_not_plain_strings(session_id):
+    import chatbot_service
+    client = chatbot_service.create_app().test_client()
+    for route in ('/chat', '/chat/stream', '/clear_session'):
+        response = client.post(route, json={'session_id': session_id, 'message': 'show my cart'})
+        assert response.status_code == 400, route
+    results = client.post('/chat/batch', json={'requests': [{'session_id': session_id, 'message': 'hi'}]}).get_json()['results']
+    assert results[0]['status'] == 400
@@ -0,0 +1,45 @@
+import os
+
+from graphql_stub import synthetic_menu
+from menu_refresher import MenuSnapshot
+from shared_menu import _HEADER, attach_snapshot, load_snapshot, publish_snapshot
+
+
+def test_a_refused_replace_keeps_the_old_snapshot_and_leaves_no_temp_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'menu.snap')
+    first = MenuSnapshot(synthetic_menu())
+    assert publish_snapshot(path, first)
+
+    def refuse(src, dst):
+        raise PermissionError(13, 'The process cannot access the file because it is being used by another process', dst)
+
+    monkeypatch.setattr(os, 'replace', refuse)  # what Windows does while a worker has the file mapped
+    assert not publish_snapshot(path, MenuSnapshot(synthetic_menu(40)))
+    assert os.listdir(tmp_path) == ['menu.snap']
+    assert load_snapshot(path).version == first.version
+
+
+def test_a_postings_block_cut_short_reads_as_no_snapshot(tmp_path):
+    path = str(tmp_path / 'menu.snap')
+    publish_snapshot(path, MenuSnapshot(synthetic_menu()))
+    with open(path, 'r+b') as f:
+        header = list(_HEADER.unpack(f.read(_HEADER.size)))
+        header[-1] -= 1  # the postings length is no longer a whole number of ids
+        f.seek(0)
+        f.write(_HEADER.pack(*header))
+    assert load_snapshot(path) is None
+
+
+def test_reusing_a_republished_version_moves_its_postings_to_the_new_file(tmp_path):
+    path = str(tmp_path / 'menu.snap')
+    snapshot = MenuSnapshot(synthetic_menu())
+    publish_snapshot(path, snapshot)
+    first = attach_snapshot(path)
+    postings = first.index.matcher.tables()[1]
+    old_ids = postings._ids
+    publish_snapshot(path, snapshot.revalidated())
+    second = attach_snapshot(path, reuse=first)
+    assert second.index is first.index and second.fetched_at >= first.fetched_at
+    assert postings._ids is not old_ids and postings._ids.obj is not old_ids.obj
+    name = second.items[0]['name']
+    assert second.index.matcher.resolve(name[:-1])[0].item is second.items[0]  # fuzzy lookups now read the new file
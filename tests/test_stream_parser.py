@@ -0,0 +1,59 @@
+import pytest
+
+from stream_parser import ActionStreamParser
+
+ACTION = '{"action": "add_to_cart", "items": [{"name": "Tiramisu", "quantity": 1}]}'
+
+
+def stream(chunks):
+    parser = ActionStreamParser()
+    shown = [parser.feed(chunk) for chunk in chunks]
+    action, tail = parser.finish()
+    return action, ''.join(shown) + tail
+
+
+def every_split(text):
+    return [[text[:i], text[i:j], text[j:]] for i in range(len(text) + 1) for j in range(i, len(text) + 1)]
+
+
+@pytest.mark.parametrize('completion', [
+    f"Adding a tiramisu.\n```json\n{ACTION}\n```\nAnything else?",
+    f"Adding a tiramisu. {ACTION} Anything else?",
+])
+def test_the_action_is_found_wherever_the_chunks_split_it(completion):
+    for chunks in every_split(completion):
+        action, shown = stream(chunks)
+        assert action == {'action': 'add_to_cart', 'items': [{'name': 'Tiramisu', 'quantity': 1}]}, chunks
+        assert '{' not in shown and '```' not in shown and shown.startswith('Adding a tiramisu.'), chunks
+        assert shown.endswith('Anything else?'), chunks
+
+
+def test_a_brace_inside_a_json_string_does_not_end_the_block():
+    action, shown = stream(['Sure! {"action": "none", "note": "a } and a \\"', ' quote"} Done.'])
+    assert action == {'action': 'none', 'note': 'a } and a " quote'} and shown == 'Sure!  Done.'
+
+
+def test_only_the_first_action_is_taken_and_later_braces_are_shown():
+    action, shown = stream(['{"action": "none"}', ' then {"action": "clear_cart"}'])
+    assert action == {'action': 'none'} and shown == ' then {"action": "clear_cart"}'
+
+
+def test_braces_that_are_not_json_are_shown_as_text():
+    action, shown = stream(['Use code {SAVE10}', ' at checkout'])
+    assert action is None and shown == 'Use code {SAVE10} at checkout'
+
+
+def test_single_backticks_and_an_unclosed_brace_come_through_at_the_end():
+    action, shown = stream(['Try the `house` special', ' {unfinished'])
+    assert action is None and shown == 'Try the `house` special {unfinished'
+
+
+@pytest.mark.parametrize('prose', ['Our #1 pick is the Margherita Pizza', '5 * 2 slices', 'Rated 4.5* by #regulars'])
+def test_literal_stars_and_hashes_in_prose_are_kept(prose):
+    for chunks in every_split(prose):
+        assert stream(chunks) == (None, prose)
+
+
+def test_the_finished_response_keeps_literal_hashes_but_drops_headings():
+    from chatbot_service import clean_response_formatting
+    assert clean_response_formatting('## Today\nOur #1 pick is **Tiramisu**') == 'Today Our #1 pick is Tiramisu'